@@ -0,0 +1,60 @@
+import argparse
+import logging
+import numpy as np
+import subprocess
+import sys
+
+
+# resolves a single configuration space, as done by a short-lived bot job
+LAZY_STATEMENT = 'import sklearnbot; sklearnbot.config_spaces.get_config_space(%r, 0)'
+
+# imports all subpackages and configuration spaces, as done by `import sklearnbot` before it was lazy
+EAGER_STATEMENT = 'import sklearnbot, sklearnbot.bot, sklearnbot.sklearn; ' \
+                  '[sklearnbot.config_spaces.get_config_space(name, 0) ' \
+                  'for name in sklearnbot.config_spaces.get_available_config_spaces(False)]'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measures the cold start time of the sklearn-bot')
+    parser.add_argument('--classifier_name', type=str, default='decision_tree',
+                        help='the config space that is resolved by the lazy start')
+    parser.add_argument('--repeats', type=int, default=10,
+                        help='number of fresh interpreters per measurement')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='if set, fails if the median lazy start time exceeds this number of seconds')
+    return parser.parse_args()
+
+
+def measure(statement: str, repeats: int) -> np.ndarray:
+    """
+    Measures the time it takes to execute a statement in a fresh interpreter
+    (excluding the start of the interpreter itself).
+    """
+    program = 'import time; start = time.perf_counter(); %s; print(time.perf_counter() - start)' % statement
+    timings = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, '-c', program])
+        timings.append(float(output.decode('utf-8').strip().split('\n')[-1]))
+    return np.array(timings)
+
+
+def run():
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    args = parse_args()
+
+    # warm up the filesystem cache, so that the first measurement is not penalized
+    measure(EAGER_STATEMENT, 1)
+    eager = measure(EAGER_STATEMENT, args.repeats)
+    lazy = measure(LAZY_STATEMENT % args.classifier_name, args.repeats)
+    logging.info('Eager start: median %0.3fs (min %0.3fs)' % (np.median(eager), np.min(eager)))
+    logging.info('Lazy start (%s): median %0.3fs (min %0.3fs)' % (args.classifier_name, np.median(lazy),
+                                                                   np.min(lazy)))
+    logging.info('Speedup: %0.1fx' % (np.median(eager) / np.median(lazy)))
+    if args.budget is not None and np.median(lazy) > args.budget:
+        logging.error('Lazy start exceeds budget of %0.3fs' % args.budget)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
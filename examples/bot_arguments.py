@@ -0,0 +1,108 @@
+import argparse
+import contextlib
+import sklearnbot
+import typing
+
+
+# the arguments (and setup) that are shared by run_on_task.py and run_on_study.py
+def add_bot_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='number of configurations that are executed per task load')
+    parser.add_argument('--n_jobs', type=int, default=1,
+                        help='number of folds that are evaluated in parallel (-1 for all cores)')
+    parser.add_argument('--backend', type=str, choices=['loky', 'multiprocessing', 'threading'], default='loky',
+                        help='backend used to evaluate the folds in parallel')
+    parser.add_argument('--async_upload', action='store_true',
+                        help='if true (and upload_result is set), runs are uploaded by a background upload queue')
+    parser.add_argument('--upload_threads', type=int, default=4,
+                        help='number of concurrent uploads of the upload queue')
+    parser.add_argument('--run_index_dir', type=str, default=None,
+                        help='if set, configurations that were already executed (according to the run index in '
+                             'this directory, shared by all jobs) are skipped')
+    parser.add_argument('--cpu_time_limit', type=int, default=None,
+                        help='if set, runs are isolated in a child process with this cpu time limit (seconds)')
+    parser.add_argument('--wall_clock_limit', type=int, default=None,
+                        help='if set, runs are isolated in a child process with this wall clock limit (seconds)')
+    parser.add_argument('--memory_limit', type=int, default=None,
+                        help='if set, runs are isolated in a child process with this memory limit (megabytes)')
+    parser.add_argument('--run_store_dir', type=str, default=None,
+                        help='if set (and upload_result is not set), runs are stored in a compact run store in this '
+                             'directory, rather than as a directory per run')
+    parser.add_argument('--resource_store_dir', type=str, default=None,
+                        help='if set, the resources consumed by every run are recorded in this directory')
+    parser.add_argument('--results_db', type=str, default=None,
+                        help='if set, the outcome of every run is recorded in this (SQLite) database file')
+    parser.add_argument('--cost_budget', type=float, default=None,
+                        help='if set (requires resource_store_dir), only configurations of which the predicted '
+                             'cpu time (in seconds) is within this budget are sampled')
+    parser.add_argument('--cost_policy', type=str, choices=['resample', 'skip'], default='resample',
+                        help='what to do with configurations that exceed the cost budget: sample a new one, or '
+                             'skip the run (which is not retried)')
+    parser.add_argument('--cost_audit_file', type=str, default=None,
+                        help='if set, configurations that were rejected by the cost budget are appended to this file')
+    parser.add_argument('--warm_start_file', type=str, default=None,
+                        help='if set, a results file of the classifier with meta-features (see obtain_results), of '
+                             'which the best configurations of the most similar tasks are run first')
+    parser.add_argument('--warm_start_neighbours', type=int, default=5,
+                        help='number of most similar tasks of which configurations are run first')
+    parser.add_argument('--preprocessing_cache', action='store_true',
+                        help='if set, the preprocessing of the fixed pipeline is fitted once per split and stored in '
+                             'the task cache. Reported run times then include the originally measured preprocessing')
+    parser.add_argument('--timing_file', type=str, default=None,
+                        help='if set, the time spent per phase of every run is appended to this file (JSON lines)')
+
+
+def check_bot_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    if args.batch_size < 1:
+        parser.error('--batch_size should be at least 1')
+    if args.cost_budget is not None and args.resource_store_dir is None:
+        parser.error('--cost_budget requires --resource_store_dir')
+    if args.warm_start_file is not None and args.classifier_name == 'all':
+        parser.error('--warm_start_file applies to a single classifier')
+
+
+@contextlib.contextmanager
+def bot_options(args: argparse.Namespace, output_dir: str) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """
+    Sets up the options of run_bot_on_task_batch from the arguments (see
+    add_bot_arguments), and closes the queues, stores and databases
+    afterwards
+    """
+    options = {'n_jobs': args.n_jobs, 'backend': args.backend, 'upload_queue': None, 'run_index': None,
+               'resource_limits': None, 'run_store': None, 'resource_store': None, 'results_db': None,
+               'cost_budget': None, 'warm_start': None, 'use_preprocessing_cache': args.preprocessing_cache,
+               'timing_callback': None}
+    try:
+        if args.upload_result and args.async_upload:
+            options['upload_queue'] = sklearnbot.bot.UploadQueue(output_dir, args.upload_threads)
+        if args.run_index_dir is not None:
+            options['run_index'] = sklearnbot.bot.RunIndex(args.run_index_dir)
+        if args.cpu_time_limit is not None or args.wall_clock_limit is not None or args.memory_limit is not None:
+            options['resource_limits'] = sklearnbot.bot.ResourceLimits(args.cpu_time_limit, args.wall_clock_limit,
+                                                                       args.memory_limit)
+        if args.run_store_dir is not None:
+            options['run_store'] = sklearnbot.bot.RunStore(args.run_store_dir)
+        if args.resource_store_dir is not None:
+            options['resource_store'] = sklearnbot.bot.ResourceStore(args.resource_store_dir)
+        if args.results_db is not None:
+            options['results_db'] = sklearnbot.bot.ResultsDatabase(args.results_db)
+        if args.cost_budget is not None:
+            classifier_names = [args.classifier_name]
+            if args.classifier_name == 'all':
+                classifier_names = sklearnbot.config_spaces.get_available_config_spaces(False)
+            options['cost_budget'] = sklearnbot.bot.create_cost_budget(
+                options['resource_store'], classifier_names, args.cost_budget, policy=args.cost_policy,
+                audit_file=args.cost_audit_file)
+        if args.warm_start_file is not None:
+            warm_start_wrapper = sklearnbot.config_spaces.get_config_space(args.classifier_name, 0)
+            if not args.vanilla_estimator:
+                warm_start_wrapper.wrap_in_fixed_pipeline()
+            options['warm_start'] = sklearnbot.bot.WarmStartSampler.from_file(
+                warm_start_wrapper, args.warm_start_file, n_neighbours=args.warm_start_neighbours)
+        if args.timing_file is not None:
+            options['timing_callback'] = sklearnbot.timing.TimingFile(args.timing_file)
+        yield options
+    finally:
+        for name in ['upload_queue', 'run_store', 'results_db']:
+            if options[name] is not None:
+                options[name].close()
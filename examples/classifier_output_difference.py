@@ -1,5 +1,4 @@
 import argparse
-import arff
 import logging
 import matplotlib.pyplot as plt
 import numpy as np
@@ -8,8 +7,8 @@ import os
 import pandas as pd
 import scipy.cluster.hierarchy
 import scipy.spatial.distance
+import sklearnbot
 import typing
-import urllib.request
 
 
 # runs after obtain_results_defaults
@@ -18,6 +17,8 @@ def parse_args():
     parser.add_argument('--input_file', type=str, default=os.path.expanduser('~/run_results_all.csv'))
     parser.add_argument('--output_directory', type=str, default=os.path.expanduser('~/experiments/sklearn-bot'))
     parser.add_argument('--extension', type=str, default='pdf')
+    parser.add_argument('--n_threads', type=int, default=8,
+                        help='number of concurrent downloads of predictions that are not cached')
     return parser.parse_args()
 
 
@@ -49,54 +50,28 @@ def run():
     df_runids = pd.read_csv(args.input_file)
     df_runids = df_runids.pivot(index='task_id', columns='flow_id', values='run_id')
 
-    os.makedirs(os.path.join(args.output_directory, 'cod'), exist_ok=True)
-    task_data = openml.tasks.list_tasks(task_id=df_runids.index)
+    # the predictions of all runs, downloaded once (concurrently)
+    run_ids = [int(run_id) for run_id in df_runids.values.flatten() if not np.isnan(run_id)]
+    predictions = sklearnbot.results.get_run_predictions(run_ids, os.path.join(args.output_directory, 'cod'),
+                                                         args.n_threads)
     flow_data = openml.flows.list_flows()
 
-    result = None
-    labels = None
-
+    accumulator = sklearnbot.results.CODAccumulator()
     for idx, (task_id, row) in enumerate(df_runids.iterrows()):
-        task_n = task_data[task_id]['NumberOfInstances']
-        logging.info('(%d/%d) Task %d: %d observations' % (idx+1, len(df_runids), task_id, task_n))
-        result_list = list()
-        for flow_id1, run_id1 in row.iteritems():
-            result_list.append({'flow_id': flow_id1, 'B': flow_id1, 'cod': 0})
-            for flow_id2, run_id2 in row.iteritems():
-                if flow_id2 <= flow_id1:
-                    continue
-                path = '%s/%d_%d_%d.arff' % (os.path.join(args.output_directory, 'cod'), task_id, flow_id1, flow_id2)
-                if not os.path.exists(path):
-                    url = 'https://www.openml.org/api_splits/different_predictions/%d,%d' % (run_id1, run_id2)
-                    urllib.request.urlretrieve(url, path)
-
-                with open(path, 'r') as fp:
-                    try:
-                        data = arff.load(fp)
-                        cod = len(data['data']) / task_n
-                    except arff.BadDataFormat:
-                        cod = 0
-
-                result_list.append({'flow_id': flow_id1, 'B': flow_id2, 'cod': cod})
-                result_list.append({'flow_id': flow_id2, 'B': flow_id1, 'cod': cod})
-        df_results = pd.DataFrame(result_list)
-        df_results = df_results.pivot(index='flow_id', columns='B', values='cod')
-        df_results = df_results.reindex(sorted(df_results.columns), axis=1)
-        labels_current = [flow_name_neat(flow_data[flow_id]['name']) for flow_id in df_results.columns.values]
-
-        if result is None:
-            result = df_results.values
-            labels = labels_current
-        else:
-            result += df_results.values
-            if labels != labels_current:
-                raise ValueError()
+        row = row.dropna().sort_index()
+        logging.info('(%d/%d) Task %d: %d flows' % (idx+1, len(df_runids), task_id, len(row)))
+        flow_ids = [int(flow_id) for flow_id in row.index]
+        cod = sklearnbot.results.compute_cod_matrix([predictions[int(run_id)] for run_id in row.values])
+        accumulator.add(flow_ids, cod)
 
+        labels = [flow_name_neat(flow_data[flow_id]['name']) for flow_id in flow_ids]
         output_file = os.path.join(args.output_directory, 'task_%d.%s' % (task_id, args.extension))
-        plot(df_results.values, labels, output_file)
+        plot(cod, labels, output_file)
 
+    order = np.argsort(accumulator.flow_ids)
+    labels = [flow_name_neat(flow_data[accumulator.flow_ids[idx]]['name']) for idx in order]
     output_file = os.path.join(args.output_directory, 'all.%s' % args.extension)
-    plot(result / len(df_runids), labels, output_file)
+    plot(accumulator.mean()[np.ix_(order, order)], labels, output_file)
 
 
 if __name__ == '__main__':
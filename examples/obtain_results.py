@@ -1,11 +1,13 @@
 import arff
 import argparse
+import contextlib
 import json
 import logging
 import openml
 import openmlcontrib
 import os
 import sklearnbot
+import typing
 
 IMPUTE_NA = -99999  # Placeholder for nan values
 
@@ -15,7 +17,8 @@ def parse_args():
     parser = argparse.ArgumentParser(description='Generate data for openml-pimp project')
     parser.add_argument('--output_directory', type=str, default=os.path.expanduser('~') + '/experiments/sklearn-bot',
                         help='directory to store output')
-    parser.add_argument('--extension', type=str, choices=['arff', 'csv'], default='csv')
+    parser.add_argument('--extension', type=str, choices=['arff', 'csv'] + sklearnbot.results.FILE_FORMATS,
+                        default='csv', help='the output format. feather and parquet are written per task')
     parser.add_argument('--num_runs', type=int, default=500, help='max results per task to obtain, to limit time')
     parser.add_argument('--study_id', type=str, default=14, help='the tag to obtain the tasks from')
     parser.add_argument('--scoring', type=str, nargs='+', default=['predictive_accuracy'],
@@ -40,6 +43,40 @@ def parse_args():
     return args_
 
 
+def store_results_streaming(args, task_ids: typing.List[int], flow_id: int, config_space, cache_directory: str,
+                            filename: str, json_meta: typing.Dict):
+    # the results are obtained and written per task, and joined with the meta-features per task
+    # the column types are fixed up front, rather than by the results of the first task
+    column_types = sklearnbot.results.get_column_types(config_space, args.scoring)
+    with contextlib.ExitStack() as stack:
+        writer = stack.enter_context(sklearnbot.results.ResultsWriter(filename, json_meta, args.extension,
+                                                                      column_types=column_types))
+        meta_writer = None
+        if args.meta_features:
+            meta_features = openmlcontrib.meta.get_tasks_qualities_as_dataframe(task_ids, False, IMPUTE_NA, True)
+            meta_filename = os.path.join(os.path.dirname(filename),
+                                         'metafeatures__%d__%s__%s.%s' % (args.num_runs, args.classifier_name,
+                                                                          '__'.join(args.scoring), args.extension))
+            meta_writer = stack.enter_context(sklearnbot.results.ResultsWriter(
+                meta_filename, json_meta, args.extension, meta_features, column_types))
+        for idx, task_id in enumerate(task_ids):
+            logging.info('(%d/%d) Obtaining results of task %d' % (idx + 1, len(task_ids), task_id))
+            performance_data = openmlcontrib.meta.get_tasks_result_as_dataframe(
+                task_ids=[task_id],
+                flow_id=flow_id,
+                num_runs=args.num_runs,
+                per_fold=args.per_fold,
+                raise_few_runs=args.raise_few_runs,
+                configuration_space=config_space,
+                evaluation_measures=args.scoring,
+                normalize=args.normalize,
+                cache_directory=cache_directory
+            )
+            writer.write(performance_data)
+            if meta_writer is not None:
+                meta_writer.write(performance_data)
+
+
 def run():
     args = parse_args()
     openml.config.apikey = args.openml_apikey
@@ -89,18 +126,6 @@ def run():
     if flow_id is False:
         raise ValueError('Flow not recognized, this means that it does not exist on the OpenML server yet.')
 
-    performance_data = openmlcontrib.meta.get_tasks_result_as_dataframe(
-        task_ids=study.tasks,
-        flow_id=flow_id,
-        num_runs=args.num_runs,
-        per_fold=args.per_fold,
-        raise_few_runs=args.raise_few_runs,
-        configuration_space=config_space,
-        evaluation_measures=args.scoring,
-        normalize=args.normalize,
-        cache_directory=cache_directory
-    )
-
     # if len(setup_data_all) < args.num_runs * len(relevant_tasks) * 0.25:
     #     raise ValueError('Num results suspiciously low. Please check.')
 
@@ -120,6 +145,22 @@ def run():
         'study_id': args.study_id,
         'max_runs_per_task': args.num_runs
     }
+    if args.extension in sklearnbot.results.FILE_FORMATS:
+        store_results_streaming(args, study.tasks, flow_id, config_space, cache_directory, filename, json_meta)
+        return
+
+    performance_data = openmlcontrib.meta.get_tasks_result_as_dataframe(
+        task_ids=study.tasks,
+        flow_id=flow_id,
+        num_runs=args.num_runs,
+        per_fold=args.per_fold,
+        raise_few_runs=args.raise_few_runs,
+        configuration_space=config_space,
+        evaluation_measures=args.scoring,
+        normalize=args.normalize,
+        cache_directory=cache_directory
+    )
+
     with open(filename, 'w') as fp:
         if args.extension == 'arff':
             arff.dump(openmlcontrib.meta.dataframe_to_arff(performance_data,
@@ -19,37 +19,20 @@ def parse_args():
     parser.add_argument('--classifier_name', type=str, choices=all_classifiers, default='adaboost',
                         help='the classifier to run')
     parser.add_argument('--output_directory', type=str, default=os.path.expanduser('~/experiments/sklearn-bot'))
+    parser.add_argument('--n_threads', type=int, default=8,
+                        help='number of concurrent lookups on the server')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only obtain the results that are newer than those of the previous invocation')
     return parser.parse_args()
 
 
-def get_setup_ids(tasks: typing.List[int], classifier_name: str) -> typing.Set[int]:
+def get_setup_ids(tasks: typing.List[int], classifier_name: str, n_threads: int) -> typing.Set[int]:
     configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(classifier_name, None)
     configuration_space_wrapper.wrap_in_fixed_pipeline()
 
-    setup_ids = set()
-    for idx, task_id in enumerate(tasks):
-        logging.info('(%d/%d) Getting task %d' % (idx+1, len(tasks), task_id))
-        task = openml.tasks.get_task(task_id)
-        classifier = sklearnbot.bot.prepare_classifier(configuration_space_wrapper, task, True)
-        extension = openml.extensions.get_extension_by_model(classifier)
-        flow = extension.model_to_flow(classifier)
-        flow_id = openml.flows.flow_exists(flow.name, flow.external_version)
-
-        if flow_id is False:
-            logging.info('Task %d: Can not find flow for classifier %s' % (task_id, classifier_name))
-            continue
-        server_flow = openml.flows.get_flow(flow_id)
-        openml.flows.flow._copy_server_fields(server_flow, flow)
-        try:
-            setup_id = openml.setups.setup_exists(flow)
-            if setup_id is False:
-                logging.info('Task %d: Can not find setup for classifier %s' % (task_id, classifier_name))
-            else:
-                logging.info('Task %d, classifier %s: Setup id %d' % (task_id, classifier_name, setup_id))
-                setup_ids.add(setup_id)
-        except openml.exceptions.OpenMLServerException:
-            pass
-    return setup_ids
+    resolver = sklearnbot.results.SetupResolver(n_threads)
+    setup_ids = resolver.get_setup_ids(configuration_space_wrapper, tasks)
+    return set(setup_id for setup_id in setup_ids.values() if setup_id is not None)
 
 
 def run():
@@ -67,26 +50,26 @@ def run():
     os.makedirs(args.output_directory, exist_ok=True)
 
     memory = joblib.memory.Memory(os.path.join(args.output_directory, '.cache'), verbose=0)
-    get_setup_ids_cached = memory.cache(get_setup_ids)
+    get_setup_ids_cached = memory.cache(get_setup_ids, ignore=['n_threads'])
     if args.classifier_name == 'all':
         classifiers = sklearnbot.config_spaces.get_available_config_spaces(False)
     else:
         classifiers = [args.classifier_name]
 
-    results = pd.DataFrame()
+    suffix = 'runs' if args.evaluation_measure is None else args.evaluation_measure
+    if args.incremental:
+        store_directory = os.path.join(args.output_directory, 'results_%s_%s' % (args.classifier_name, suffix))
+        store = sklearnbot.results.IncrementalResults(store_directory, args.evaluation_measure)
+    frames = []
     for idx, classifier in enumerate(classifiers):
-        setup_ids = get_setup_ids_cached(tasks, classifier)
+        setup_ids = get_setup_ids_cached(tasks, classifier, args.n_threads)
         logging.info('(%d/%d) %s: %s (%d)' % (idx+1, len(classifiers), classifier, setup_ids, len(setup_ids)))
-        if args.evaluation_measure is None:
-            result_frame = openml.runs.list_runs(task=tasks, setup=list(setup_ids), output_format='dataframe')
+        if args.incremental:
+            store.refresh(tasks, setup_ids=list(setup_ids), n_threads=args.n_threads)
         else:
-            result_frame = openml.evaluations.list_evaluations(
-                function=args.evaluation_measure, task=tasks, setup=list(setup_ids), output_format='dataframe')
-        if len(results) == 0:
-            results = result_frame
-        else:
-            results = results.append(result_frame)
-    suffix = 'runs' if args.evaluation_measure is None else args.evaluation_measure
+            frames.append(sklearnbot.results.list_setup_results(tasks, list(setup_ids), args.evaluation_measure,
+                                                                args.n_threads))
+    results = store.read() if args.incremental else pd.concat(frames, ignore_index=True)
     result_file = os.path.join(args.output_directory, 'results_%s_%s.csv' % (args.classifier_name, suffix))
     results.to_csv(result_file)
     logging.info('stored result to: %s' % result_file)
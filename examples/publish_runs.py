@@ -0,0 +1,51 @@
+import argparse
+import logging
+import openml
+import os
+import sklearnbot
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Publishes the runs that the sklearn-bot stored on disk. '
+                                                 'Can be invoked concurrently on the same directory')
+    default_output_dir = os.path.join(os.path.expanduser('~'), 'experiments/sklearn-bot')
+    parser.add_argument('--output_dir', type=str, default=default_output_dir,
+                        help='directory that contains the stored runs (scanned recursively)')
+    parser.add_argument('--openml_server', type=str, default=None, help='the openml server location')
+    parser.add_argument('--openml_apikey', type=str, default=None, help='the apikey to authenticate to OpenML')
+    parser.add_argument('--run_tag', type=str, help='Tag to add to the runs')
+    parser.add_argument('--upload_threads', type=int, default=8,
+                        help='number of concurrent uploads')
+    parser.add_argument('--keep_runs', action='store_true',
+                        help='if true, published runs are marked as published rather than deleted')
+    parser.add_argument('--retry_failed', action='store_true',
+                        help='if true, runs that failed to upload in a previous invocation are retried')
+    parser.add_argument('--report_interval', type=float, default=30.0,
+                        help='number of seconds between progress reports')
+    parser.add_argument('--min_age', type=float, default=60.0,
+                        help='runs that were written less than this number of seconds ago are skipped')
+    return parser.parse_args()
+
+
+def run():
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+
+    args = parse_args()
+    if args.openml_apikey:
+        openml.config.apikey = args.openml_apikey
+    if args.openml_server:
+        openml.config.server = args.openml_server
+    else:
+        openml.config.server = 'https://test.openml.org/api/v1/'
+
+    n_uploaded, n_failed = sklearnbot.bot.publish_stored_runs(args.output_dir, args.run_tag, args.upload_threads,
+                                                              delete=not args.keep_runs,
+                                                              retry_failed=args.retry_failed,
+                                                              report_interval=args.report_interval,
+                                                              min_age=args.min_age)
+    logging.info('Published %d runs; %d failed' % (n_uploaded, n_failed))
+
+
+if __name__ == '__main__':
+    run()
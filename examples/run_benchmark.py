@@ -0,0 +1,40 @@
+import argparse
+import json
+import logging
+import os
+import sklearnbot
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measures the throughput of the sklearn-bot on synthetic tasks, '
+                                                 'without an OpenML server')
+    parser.add_argument('--work_dir', type=str, default=os.path.expanduser('~') + '/experiments/sklearn-bot/benchmark',
+                        help='directory in which the synthetic tasks are stored')
+    parser.add_argument('--output_file', type=str, default='benchmark.json',
+                        help='the file to which the results are written (JSON)')
+    parser.add_argument('--classifier_name', type=str, nargs='+', default=None,
+                        help='the config spaces to benchmark (default: all)')
+    parser.add_argument('--n_runs', type=int, default=10,
+                        help='number of runs per config space and task')
+    parser.add_argument('--vanilla_estimator', action='store_true',
+                        help='if true, will run the classifiers without the fixed pipeline')
+    parser.add_argument('--wall_clock_limit', type=int, default=None,
+                        help='if set, stops benchmarking a config space on a task after this number of seconds')
+    return parser.parse_args()
+
+
+def run():
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    args = parse_args()
+
+    results = sklearnbot.benchmark.run_benchmark(args.work_dir, classifier_names=args.classifier_name,
+                                                 n_runs=args.n_runs, vanilla_estimator=args.vanilla_estimator,
+                                                 wall_clock_limit=args.wall_clock_limit)
+    with open(args.output_file, 'w') as fp:
+        json.dump(results, fp, indent=2)
+    logging.info('Results written to %s' % args.output_file)
+
+
+if __name__ == '__main__':
+    run()
@@ -1,4 +1,5 @@
 import argparse
+import bot_arguments
 import logging
 import openml
 import os
@@ -30,10 +31,29 @@ def parse_args():
                         help='if true, will run default configuration')
     parser.add_argument('--config_space_random_state', type=int,
                         help='random state for config space')
+    parser.add_argument('--n_workers', type=int, default=1,
+                        help='if larger than 1, runs are executed in parallel by this number of worker processes')
     parser.add_argument('--run_tag', type=str, 
                         help='Tag to add to the runs')
+    parser.add_argument('--max_runs_per_worker', type=int, default=None,
+                        help='if set (and n_workers is larger than 1), workers are recycled after this number of runs')
+    parser.add_argument('--max_worker_rss', type=int, default=None,
+                        help='if set (and n_workers is larger than 1), workers are recycled once their resident '
+                             'memory exceeds this number of megabytes')
+    parser.add_argument('--max_resident_tasks', type=int, default=None,
+                        help='if set (and n_workers is larger than 1), workers keep at most this number of tasks '
+                             'opened')
+    bot_arguments.add_bot_arguments(parser)
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    bot_arguments.check_bot_arguments(parser, args)
+    if args.n_workers > 1:
+        # the workers keep the data of their tasks warm, rather than batching the runs per task, and evaluate the
+        # folds sequentially
+        for name, default in [('batch_size', 1), ('n_jobs', 1), ('backend', 'loky')]:
+            if getattr(args, name) != default:
+                parser.error('--%s can not be combined with --n_workers' % name)
+    return args
 
 
 def run():
@@ -50,28 +70,52 @@ def run():
     tasks = openml.study.get_suite(args.study_id).tasks
 
     output_dir = os.path.join(args.output_dir, args.classifier_name)
+    with bot_arguments.bot_options(args, output_dir) as options:
+        if args.n_workers > 1:
+            jobs = []
+            for i in range(args.n_executions):
+                task_id = random.choice(tasks) if args.random_tasks else tasks[i % len(tasks)]
+                jobs.append(sklearnbot.bot.BotJob(task_id, args.classifier_name, args.config_space_random_state + i))
+            sklearnbot.bot.run_bot_parallel(jobs, args.n_workers, args.run_defaults, args.vanilla_estimator,
+                                            output_dir, args.upload_result, args.run_tag,
+                                            upload_queue=options['upload_queue'],
+                                            run_index_directory=args.run_index_dir,
+                                            resource_limits=options['resource_limits'],
+                                            max_runs_per_worker=args.max_runs_per_worker,
+                                            max_worker_rss=args.max_worker_rss,
+                                            max_resident_tasks=args.max_resident_tasks,
+                                            resource_store_directory=args.resource_store_dir,
+                                            cost_budget=options['cost_budget'], run_store=options['run_store'],
+                                            results_db=options['results_db'], warm_start=options['warm_start'],
+                                            use_preprocessing_cache=options['use_preprocessing_cache'],
+                                            timing_callback=options['timing_callback'])
+            return
 
-    for i in range(args.n_executions):
-        if args.random_tasks:
-            task_id = random.choice(tasks)
-        else:
-            task_id = tasks[i % len(tasks)]
-        configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(args.classifier_name,
-                                                                                args.config_space_random_state + i)
-        if not args.vanilla_estimator:
-            configuration_space_wrapper.wrap_in_fixed_pipeline()
-
-        success, run_id, folder = sklearnbot.bot.run_bot_on_task(task_id,
-                                                                 configuration_space_wrapper,
-                                                                 args.run_defaults,
-                                                                 output_dir,
-                                                                 args.upload_result,
-                                                                 args.run_tag)
-        if success:
-            logging.info('Run was executed successfully. Run id=%s; folder=%s' % (run_id, folder))
-        else:
-            logging.warning('A problem occurred. Run id=%s; folder=%s' % (run_id, folder))
+        for batch_start in range(0, args.n_executions, args.batch_size):
+            if args.random_tasks:
+                task_id = random.choice(tasks)
+            else:
+                task_id = tasks[(batch_start // args.batch_size) % len(tasks)]
+            configuration_space_wrappers = []
+            for i in range(batch_start, min(batch_start + args.batch_size, args.n_executions)):
+                configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(
+                    args.classifier_name, args.config_space_random_state + i)
+                if not args.vanilla_estimator:
+                    configuration_space_wrapper.wrap_in_fixed_pipeline()
+                configuration_space_wrappers.append(configuration_space_wrapper)
 
+            results = sklearnbot.bot.run_bot_on_task_batch(task_id,
+                                                           configuration_space_wrappers,
+                                                           args.run_defaults,
+                                                           output_dir,
+                                                           args.upload_result,
+                                                           args.run_tag,
+                                                           **options)
+            for success, run_id, folder in results:
+                if success:
+                    logging.info('Run was executed successfully. Run id=%s; folder=%s' % (run_id, folder))
+                else:
+                    logging.warning('A problem occurred. Run id=%s; folder=%s' % (run_id, folder))
 
 if __name__ == '__main__':
     run()
@@ -1,4 +1,5 @@
 import argparse
+import bot_arguments
 import logging
 import openml
 import os
@@ -29,8 +30,11 @@ def parse_args():
                         help='random state for config space')
     parser.add_argument('--run_tag', type=str,
                         help='Tag to add to the runs')
+    bot_arguments.add_bot_arguments(parser)
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    bot_arguments.check_bot_arguments(parser, args)
+    return args
 
 
 def run():
@@ -46,25 +50,30 @@ def run():
         openml.config.server = 'https://test.openml.org/api/v1/'
 
     output_dir = os.path.join(args.output_dir, args.classifier_name)
+    with bot_arguments.bot_options(args, output_dir) as options:
+        for batch_start in range(0, args.n_executions, args.batch_size):
+            # note that the config space random state is reset every round.
+            # therefore, we utilize the iterator of the range for this
+            configuration_space_wrappers = []
+            for i in range(batch_start, min(batch_start + args.batch_size, args.n_executions)):
+                configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(
+                    args.classifier_name, args.config_space_random_state + i)
+                if not args.vanilla_estimator:
+                    configuration_space_wrapper.wrap_in_fixed_pipeline()
+                configuration_space_wrappers.append(configuration_space_wrapper)
 
-    for i in range(args.n_executions):
-        # note that the config space random state is reset every round.
-        # therefore, we utilize the iterator of the range for this
-        configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(args.classifier_name,
-                                                                                args.config_space_random_state + i)
-        if not args.vanilla_estimator:
-            configuration_space_wrapper.wrap_in_fixed_pipeline()
-        success, run_id, folder = sklearnbot.bot.run_bot_on_task(args.task_id,
-                                                                 configuration_space_wrapper,
-                                                                 args.run_defaults,
-                                                                 output_dir,
-                                                                 args.upload_result,
-                                                                 args.run_tag)
-        if success:
-            logging.info('Run was executed successfully. Run id=%s; folder=%s' % (run_id, folder))
-        else:
-            logging.warning('A problem occurred. Run id=%s; folder=%s' % (run_id, folder))
-
+            results = sklearnbot.bot.run_bot_on_task_batch(args.task_id,
+                                                           configuration_space_wrappers,
+                                                           args.run_defaults,
+                                                           output_dir,
+                                                           args.upload_result,
+                                                           args.run_tag,
+                                                           **options)
+            for success, run_id, folder in results:
+                if success:
+                    logging.info('Run was executed successfully. Run id=%s; folder=%s' % (run_id, folder))
+                else:
+                    logging.warning('A problem occurred. Run id=%s; folder=%s' % (run_id, folder))
 
 if __name__ == '__main__':
     run()
@@ -20,6 +20,27 @@ def parse_args():
     parser.add_argument('--upload_result', action='store_true',
                         help='if true, results will be immediately uploaded to OpenML.'
                              'Otherwise they will be stored on disk. ')
+    parser.add_argument('--run_tag', type=str,
+                        help='Tag to add to the runs')
+    parser.add_argument('--n_jobs', type=int, default=1,
+                        help='number of folds that are evaluated in parallel (-1 for all cores)')
+    parser.add_argument('--backend', type=str, choices=['loky', 'multiprocessing', 'threading'], default='loky',
+                        help='backend used to evaluate the folds in parallel')
+    parser.add_argument('--async_upload', action='store_true',
+                        help='if true (and upload_result is set), runs are uploaded by a background upload queue')
+    parser.add_argument('--upload_threads', type=int, default=4,
+                        help='number of concurrent uploads of the upload queue')
+    parser.add_argument('--optimizer', type=str, choices=['random_search', 'successive_halving'],
+                        default='random_search', help='the hyperparameter optimization procedure')
+    parser.add_argument('--resource', type=str, default='n_samples',
+                        help='budget of successive halving: n_samples or an integer hyperparameter of the '
+                             'pipeline, e.g., randomforestclassifier__n_estimators')
+    parser.add_argument('--timing_file', type=str, default=None,
+                        help='if set, the time spent per phase of every run is appended to this file (JSON lines)')
+    parser.add_argument('--resource_store_dir', type=str, default=None,
+                        help='if set, the resources consumed by every run are recorded in this directory')
+    parser.add_argument('--results_db', type=str, default=None,
+                        help='if set, the outcome of the run is recorded in this (SQLite) database file')
 
     return parser.parse_args()
 
@@ -40,15 +61,38 @@ def run():
     configuration_space_wrapper.wrap_in_fixed_pipeline()
 
     output_dir = os.path.join(args.output_dir, args.classifier_name)
+    upload_queue = None
+    if args.upload_result and args.async_upload:
+        upload_queue = sklearnbot.bot.UploadQueue(output_dir, args.upload_threads)
+    resource_store = None
+    if args.resource_store_dir is not None:
+        resource_store = sklearnbot.bot.ResourceStore(args.resource_store_dir)
+    results_db = None
+    if args.results_db is not None:
+        results_db = sklearnbot.bot.ResultsDatabase(args.results_db)
+    timing_callback = sklearnbot.timing.TimingFile(args.timing_file) if args.timing_file is not None else None
 
     success, run_id, folder = sklearnbot.bot.run_optimizer_on_task(args.task_id,
                                                                    configuration_space_wrapper,
                                                                    output_dir,
-                                                                   args.upload_result)
+                                                                   args.upload_result,
+                                                                   n_jobs=args.n_jobs,
+                                                                   backend=args.backend,
+                                                                   upload_queue=upload_queue,
+                                                                   optimizer=args.optimizer,
+                                                                   resource=args.resource,
+                                                                   timing_callback=timing_callback,
+                                                                   resource_store=resource_store,
+                                                                   results_db=results_db,
+                                                                   tag=args.run_tag)
     if success:
         logging.info('Run was executed successfully. Run id=%s; folder=%s' % (run_id, folder))
     else:
         logging.warning('A problem occurred. Run id=%s; folder=%s' % (run_id, folder))
+    if upload_queue is not None:
+        upload_queue.close()
+    if results_db is not None:
+        results_db.close()
 
 
 if __name__ == '__main__':
@@ -1,4 +1,15 @@
-from . import bot
-from . import config_spaces
-from . import sklearn
+import importlib
 
+# subpackages (and modules) are imported upon first access, as importing
+# sklearnbot.bot (openml, scikit-learn) is expensive for short-lived jobs
+_SUBPACKAGES = ['benchmark', 'bot', 'config_spaces', 'results', 'sklearn', 'timing']
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + _SUBPACKAGES)
@@ -0,0 +1,2 @@
+from .suite import DEFAULT_TASK_SPECS, get_environment, run_benchmark
+from .synthetic import TaskSpec, make_synthetic_task
@@ -0,0 +1,220 @@
+import collections
+import logging
+import numpy as np
+import openml
+import os
+import platform
+import resource
+import sklearn
+import sklearnbot
+import time
+import traceback
+import typing
+
+from sklearnbot.__version__ import __version__
+from sklearnbot.benchmark.synthetic import TaskSpec, get_task_name, make_synthetic_task
+from sklearnbot.bot.isolation import ResourceLimits, RunLimitExceededError, run_isolated
+from sklearnbot.bot.run import run_bot_on_task
+from sklearnbot.bot.run_store import RunStore
+from sklearnbot.bot.task_cache import CachedTask
+
+
+# small, medium and wide tasks, with and without nominal features
+DEFAULT_TASK_SPECS = [
+    TaskSpec(n_instances=500, n_features=10, nominal_ratio=0.0, n_classes=2, n_folds=10),
+    TaskSpec(n_instances=2000, n_features=20, nominal_ratio=0.5, n_classes=5, n_folds=10),
+    TaskSpec(n_instances=1000, n_features=100, nominal_ratio=0.2, n_classes=3, n_folds=3),
+]
+
+# the phases of a single benchmark run, in order of execution. `run_bot` is
+# a complete bot run (run_bot_on_task: preparing the classifier, running it
+# and storing the run in a run store, as formatting a run for the filesystem
+# requires the task on the server); `as_search_cv` is measured separately,
+# as the bot only uses it for optimizer runs
+PHASES = ['get_config_space', 'as_search_cv', 'run_bot']
+
+# the phases that are part of the run loop of the bot, used for the throughput
+RUN_LOOP_PHASES = ['get_config_space', 'run_bot']
+
+
+def _summarize(timings: typing.List[float]) -> typing.Dict[str, float]:
+    if len(timings) == 0:
+        return {'n': 0}
+    timings = np.array(timings)
+    return {
+        'n': len(timings),
+        'mean': float(np.mean(timings)),
+        'median': float(np.median(timings)),
+        'p95': float(np.percentile(timings, 95)),
+        'max': float(np.max(timings)),
+    }
+
+
+def _benchmark_config_space(classifier_name: str, task: CachedTask, run_store_directory: str, n_runs: int,
+                            vanilla_estimator: bool, random_state: int) -> typing.Dict[str, typing.Any]:
+    """
+    Executes a number of bot runs of a configuration space on a (synthetic)
+    task, and measures the duration of each phase, including the phases that
+    the bot records itself (see sklearnbot.timing). Failing runs are counted,
+    but do not stop the benchmark.
+    """
+    # the task is opened in the task cache of this process (see CachedTask.__reduce_ex__)
+    cache_directory = os.path.dirname(task.directory)
+    run_store = RunStore(run_store_directory)
+    timings = collections.OrderedDict((phase, []) for phase in PHASES)
+    records = []
+    errors = []
+    n_successful = 0
+    for seed in range(random_state, random_state + n_runs):
+        phase = PHASES[0]
+        try:
+            start = time.perf_counter()
+            configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(classifier_name, seed)
+            if not vanilla_estimator:
+                configuration_space_wrapper.wrap_in_fixed_pipeline()
+            timings[phase].append(time.perf_counter() - start)
+
+            phase = 'as_search_cv'
+            start = time.perf_counter()
+            sklearnbot.sklearn.as_search_cv(configuration_space_wrapper.assemble(), task.numeric_indices,
+                                            task.nominal_indices, random_state=seed)
+            timings[phase].append(time.perf_counter() - start)
+
+            phase = 'run_bot'
+            start = time.perf_counter()
+            # the synthetic task does not exist on a server
+            success, _, _ = run_bot_on_task(task.task_id, configuration_space_wrapper, False, run_store_directory,
+                                            False, task_cache_directory=cache_directory, run_store=run_store,
+                                            timing_callback=records.append, avoid_duplicate_runs=False)
+            timings[phase].append(time.perf_counter() - start)
+            if not success:
+                raise ValueError('Run was not successful')
+            n_successful += 1
+        except Exception as e:
+            logging.warning('Benchmark run %s (seed %d) failed in phase %s: %s' % (classifier_name, seed, phase,
+                                                                                   traceback.format_exc()))
+            errors.append({'seed': seed, 'phase': phase, 'error': '%s: %s' % (type(e).__name__, str(e))})
+    run_store.close()
+
+    bot_phases = collections.OrderedDict()
+    for record in records:
+        for name, seconds in record['phases'].items():
+            bot_phases.setdefault(name, []).append(seconds)
+    run_loop_time = sum(sum(timings[phase]) for phase in RUN_LOOP_PHASES)
+    return {
+        'n_runs': n_runs,
+        'n_successful': n_successful,
+        'runs_per_hour': n_successful / run_loop_time * 3600 if run_loop_time > 0 else None,
+        'phases': collections.OrderedDict((phase, _summarize(values)) for phase, values in timings.items()),
+        'bot_phases': collections.OrderedDict((phase, _summarize(values)) for phase, values in bot_phases.items()),
+        # peak resident set size of the (forked) benchmark process (kilobytes on linux)
+        'peak_memory_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'errors': errors,
+    }
+
+
+def get_environment() -> typing.Dict[str, str]:
+    """
+    Returns the versions of the software that determines the performance of
+    the bot, so that benchmark results can be compared across versions.
+    """
+    return {
+        'sklearnbot': __version__,
+        'sklearn': sklearn.__version__,
+        'openml': openml.__version__,
+        'numpy': np.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_benchmark(work_directory: str,
+                  task_specs: typing.Optional[typing.List[TaskSpec]] = None,
+                  classifier_names: typing.Optional[typing.List[str]] = None,
+                  n_runs: int = 10,
+                  vanilla_estimator: bool = False,
+                  random_state: int = 0,
+                  wall_clock_limit: typing.Optional[float] = None) -> typing.Dict[str, typing.Any]:
+    """
+    Measures the throughput and overhead of the bot, without an OpenML
+    server. Synthetic tasks are created locally, after which the bot runs
+    (random configurations) of every configuration space on every task. Every
+    combination of configuration space and task is executed in a separate,
+    forked process, so that its peak memory can be measured and a single
+    pathological configuration space can not stop the benchmark.
+
+    Parameters
+    ----------
+    work_directory: str
+        A writable directory in which the synthetic tasks (and their
+        preprocessed folds) are stored. Tasks are reused across benchmarks.
+        The runs are stored in a run store in a subdirectory
+
+    task_specs: list[TaskSpec] or None
+        The shapes of the synthetic tasks. Leave to None to use the
+        DEFAULT_TASK_SPECS
+
+    classifier_names: list[str] or None
+        The configuration spaces to benchmark. Leave to None to use all
+        configuration spaces
+
+    n_runs: int
+        The number of runs per configuration space and task
+
+    vanilla_estimator: bool
+        If set to true, vanilla classifiers are ran rather than the fixed pipeline
+
+    random_state: int
+        The seed of the first run (and of the synthetic data)
+
+    wall_clock_limit: float or None
+        If set, the runs of a configuration space on a task are stopped after
+        this number of seconds
+
+    Returns
+    -------
+    results: dict
+        A JSON serializable dict with the environment, the tasks, and per
+        configuration space and task the number of (successful) runs, the
+        runs per hour, latency statistics per phase and per phase that the bot
+        records itself (in seconds), peak memory and errors
+    """
+    if task_specs is None:
+        task_specs = DEFAULT_TASK_SPECS
+    if classifier_names is None:
+        classifier_names = sklearnbot.config_spaces.get_available_config_spaces(False)
+    limits = ResourceLimits(wall_clock_time=wall_clock_limit)
+
+    results = {
+        'environment': get_environment(),
+        'settings': {'n_runs': n_runs, 'vanilla_estimator': vanilla_estimator, 'random_state': random_state},
+        'tasks': [],
+        'results': [],
+    }
+    cache_directory = os.path.join(work_directory, 'tasks')
+    run_store_directory = os.path.join(work_directory, 'runs')
+    for task_id, spec in enumerate(task_specs, start=1):
+        start = time.perf_counter()
+        task = make_synthetic_task(spec, task_id, cache_directory, random_state)
+        results['tasks'].append(dict(spec._asdict(), task_id=task_id, name=get_task_name(spec),
+                                     load_time=time.perf_counter() - start))
+        for classifier_name in classifier_names:
+            logging.info('Benchmarking %s on %s' % (classifier_name, get_task_name(spec)))
+            start = time.perf_counter()
+            try:
+                result = run_isolated(_benchmark_config_space,
+                                      (classifier_name, task, run_store_directory, n_runs, vanilla_estimator,
+                                       random_state),
+                                      {}, limits)
+            except RunLimitExceededError as e:
+                result = {'n_runs': n_runs, 'n_successful': None, 'errors': [{'error': str(e)}]}
+            result['classifier_name'] = classifier_name
+            result['task_id'] = task_id
+            result['total_time'] = time.perf_counter() - start
+            results['results'].append(result)
+            logging.info('%s on %s: %s/%d runs; %s runs/hour' % (classifier_name, get_task_name(spec),
+                                                                 result['n_successful'], n_runs,
+                                                                 result.get('runs_per_hour')))
+    return results
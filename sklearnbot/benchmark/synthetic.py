@@ -0,0 +1,112 @@
+import collections
+import numpy as np
+import openml
+import os
+import sklearn.datasets
+import sklearn.model_selection
+import typing
+
+from sklearnbot.bot.task_cache import CachedTask, get_task_cache
+
+
+# The shape of a synthetic task: the number of instances, features and
+# classes, the fraction of nominal features and the number of folds
+TaskSpec = collections.namedtuple('TaskSpec', ['n_instances', 'n_features', 'nominal_ratio', 'n_classes',
+                                               'n_folds'])
+
+# number of distinct values of the synthetic nominal features
+NOMINAL_CARDINALITY = 8
+
+
+def get_task_name(spec: TaskSpec) -> str:
+    return 'synthetic_i%d_f%d_n%0.2f_c%d_k%d' % (spec.n_instances, spec.n_features, spec.nominal_ratio,
+                                                 spec.n_classes, spec.n_folds)
+
+
+def _generate_data(spec: TaskSpec, random_state: np.random.RandomState) \
+        -> typing.Tuple[np.ndarray, np.ndarray, typing.List[int], typing.List[int]]:
+    n_nominal = int(round(spec.n_features * spec.nominal_ratio))
+    n_informative = max(1, min(spec.n_features, int(np.ceil(np.log2(spec.n_classes * 2)) + 2)))
+    X, y = sklearn.datasets.make_classification(n_samples=spec.n_instances, n_features=spec.n_features,
+                                                n_informative=n_informative, n_redundant=0,
+                                                n_classes=spec.n_classes, n_clusters_per_class=1,
+                                                random_state=random_state)
+    nominal_indices = sorted(random_state.choice(spec.n_features, n_nominal, replace=False).tolist())
+    numeric_indices = [i for i in range(spec.n_features) if i not in nominal_indices]
+    # nominal features are encoded as category index, as in the array format of OpenML
+    for idx in nominal_indices:
+        bins = np.quantile(X[:, idx], np.linspace(0, 1, NOMINAL_CARDINALITY + 1)[1:-1])
+        X[:, idx] = np.digitize(X[:, idx], bins)
+    return X, y.astype(np.int64), nominal_indices, numeric_indices
+
+
+def make_synthetic_task(spec: TaskSpec, task_id: int, cache_directory: str, random_state: int = 0) -> CachedTask:
+    """
+    Creates an OpenML-like classification task locally, so that the bot can
+    be exercised without an OpenML server. The task is stored in a task cache,
+    and opened memory-mapped, exactly like tasks that were resolved through
+    OpenML. The OpenML task object (used for formatting predictions) is
+    created locally as well. The task is opened in the task cache that is
+    shared within the process, so that the bot (e.g., run_bot_on_task with
+    the same `task_cache_directory`, and avoid_duplicate_runs set to false)
+    can run on it.
+
+    Parameters
+    ----------
+    spec: TaskSpec
+        The shape of the task
+
+    task_id: int
+        The (local) task id. Should be unique within the cache directory
+
+    cache_directory: str
+        A writable directory in which the task will be stored
+
+    random_state: int
+        The random seed used to generate the data and the folds
+
+    Returns
+    -------
+    task: CachedTask
+        The task, with memory-mapped data and splits
+    """
+    cache = get_task_cache(cache_directory)
+    if not os.path.isfile(os.path.join(cache_directory, str(task_id), 'meta.json')):
+        rng = np.random.RandomState(random_state)
+        X, y, nominal_indices, numeric_indices = _generate_data(spec, rng)
+        folds = sklearn.model_selection.StratifiedKFold(n_splits=spec.n_folds, shuffle=True, random_state=rng)
+        train_splits = []
+        test_splits = []
+        for train, test in folds.split(X, y):
+            train_splits.append(train.astype(np.int64))
+            test_splits.append(test.astype(np.int64))
+        meta = {
+            'task_id': task_id,
+            'dataset_id': task_id,
+            'name': get_task_name(spec),
+            'target_name': 'class',
+            'class_labels': ['c%d' % label for label in range(spec.n_classes)],
+            'nominal_indices': nominal_indices,
+            'numeric_indices': numeric_indices,
+            'qualities': {
+                'NumberOfInstances': float(spec.n_instances),
+                'NumberOfFeatures': float(spec.n_features + 1),
+                'NumberOfClasses': float(spec.n_classes),
+                'NumberOfSymbolicFeatures': float(len(nominal_indices) + 1),
+                'NumberOfNumericFeatures': float(len(numeric_indices)),
+                'NumberOfMissingValues': 0.0,
+            },
+            'split_dimensions': [1, spec.n_folds, 1],
+        }
+        cache.store(meta, X, y, train_splits, test_splits)
+    task = cache.get(task_id)
+    # the task does not exist on a server, so it can not be resolved lazily
+    task._task = openml.tasks.OpenMLClassificationTask(
+        task_type_id=openml.tasks.TaskType.SUPERVISED_CLASSIFICATION,
+        task_type='Supervised Classification',
+        data_set_id=task.dataset_id,
+        target_name=task.target_name,
+        task_id=task_id,
+        class_labels=task.class_labels,
+    )
+    return task
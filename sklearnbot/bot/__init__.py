@@ -1 +1,51 @@
-from .run import prepare_classifier, run_bot_on_task, run_optimizer_on_task
+import importlib
+
+# the modules of the bot (and openml, scikit-learn) are imported upon first
+# access, so that a job only imports the parts of the stack it uses
+_LAZY_ATTRIBUTES = {
+    'ConfigurationOverBudgetError': 'sklearnbot.bot.cost_model',
+    'CostBudget': 'sklearnbot.bot.cost_model',
+    'CostModel': 'sklearnbot.bot.cost_model',
+    'create_cost_budget': 'sklearnbot.bot.cost_model',
+    'run_model_on_cached_task': 'sklearnbot.bot.evaluation',
+    'ResourceLimits': 'sklearnbot.bot.isolation',
+    'RunLimitExceededError': 'sklearnbot.bot.isolation',
+    'run_isolated': 'sklearnbot.bot.isolation',
+    'BotJob': 'sklearnbot.bot.parallel',
+    'JobResult': 'sklearnbot.bot.parallel',
+    'run_bot_parallel': 'sklearnbot.bot.parallel',
+    'ResourceStore': 'sklearnbot.bot.resource_store',
+    'ResultsDatabase': 'sklearnbot.bot.results_db',
+    'get_configuration': 'sklearnbot.bot.results_db',
+    'prepare_classifier': 'sklearnbot.bot.run',
+    'run_bot_on_task': 'sklearnbot.bot.run',
+    'run_bot_on_task_batch': 'sklearnbot.bot.run',
+    'run_optimizer_on_task': 'sklearnbot.bot.run',
+    'RunExistsLocallyError': 'sklearnbot.bot.run_index',
+    'RunIndex': 'sklearnbot.bot.run_index',
+    'get_run_key': 'sklearnbot.bot.run_index',
+    'RunStore': 'sklearnbot.bot.run_store',
+    'CachedTask': 'sklearnbot.bot.task_cache',
+    'get_cached_task': 'sklearnbot.bot.task_cache',
+    'get_task_cache': 'sklearnbot.bot.task_cache',
+    'UploadQueue': 'sklearnbot.bot.upload',
+    'find_stored_runs': 'sklearnbot.bot.upload',
+    'publish_stored_runs': 'sklearnbot.bot.upload',
+    'WarmStartSampler': 'sklearnbot.bot.warm_start',
+    'load_results_frame': 'sklearnbot.bot.warm_start',
+}
+
+_SUBMODULES = ['cost_model', 'evaluation', 'isolation', 'parallel', 'preprocessing_cache', 'resource_store',
+               'results_db', 'run', 'run_index', 'run_store', 'task_cache', 'upload', 'warm_start']
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRIBUTES.keys()) + _SUBMODULES)
@@ -0,0 +1,280 @@
+import fcntl
+import json
+import logging
+import numpy as np
+import os
+import pandas as pd
+import sklearn.ensemble
+import sklearnbot
+import time
+import typing
+
+from sklearnbot.bot.resource_store import ResourceStore
+from sklearnbot.config_spaces import ConfigSpaceWrapper
+from sklearnbot.config_spaces.sampling import _get_choices, _is_categorical, _is_constant
+
+
+class ConfigurationOverBudgetError(Exception):
+    """
+    Raised when no configuration could be sampled of which the predicted
+    cost is within the budget
+    """
+    pass
+
+
+class CostModel(object):
+    """
+    Predicts the cost of a configuration of a configuration space on a task
+    (e.g., its cpu time), based on the costs of earlier runs as recorded in a
+    ResourceStore. A random forest is trained on the logarithm of the cost,
+    with the hyperparameters and the number of instances and features of the
+    task as features. The runs are described by their active hyperparameters
+    (as sampled), so inactive hyperparameters are encoded as missing rather
+    than by their default value. Hyperparameters are matched by name,
+    regardless of whether the runs were executed in the fixed pipeline or not.
+
+    Parameters
+    ----------
+    configuration_space_wrapper: ConfigSpaceWrapper
+        The configuration space of which the configurations are predicted
+
+    measure: str
+        The cost to predict, e.g., `cpu_time` or `wall_time` (see ResourceStore)
+
+    random_state: int
+        The random seed of the random forest
+    """
+
+    def __init__(self, configuration_space_wrapper: ConfigSpaceWrapper, measure: str = 'cpu_time',
+                 random_state: int = 0):
+        self.classifier = configuration_space_wrapper.config_space.name
+        self.measure = measure
+        self._prefix = '%s__' % self.classifier.rsplit('.', 1)[-1].lower()
+        self.hyperparameters = [hyperparameter for hyperparameter in configuration_space_wrapper.hyperparameters
+                                if not _is_constant(hyperparameter)]
+        self.names = [self._strip(hyperparameter.name) for hyperparameter in self.hyperparameters]
+        self.model = sklearn.ensemble.RandomForestRegressor(n_estimators=100, min_samples_leaf=2,
+                                                            random_state=random_state)
+        self.n_records = 0
+
+    def _strip(self, name: str) -> str:
+        return name[len(self._prefix):] if name.startswith(self._prefix) else name
+
+    def _encode(self, configuration: typing.Dict[str, typing.Any], qualities: typing.Dict[str, float]) \
+            -> typing.List[float]:
+        configuration = {self._strip(name): value for name, value in configuration.items()}
+        features = [np.log(max(qualities.get('NumberOfInstances', 1.0), 1.0)),
+                    np.log(max(qualities.get('NumberOfFeatures', 1.0), 1.0))]
+        for name, hyperparameter in zip(self.names, self.hyperparameters):
+            value = configuration.get(name)
+            if value is None:
+                # inactive (or not set)
+                features.append(-1.0)
+            elif _is_categorical(hyperparameter):
+                choices = _get_choices(hyperparameter)
+                features.append(float(choices.index(value)) if value in choices else -1.0)
+            elif isinstance(value, (bool, str)):
+                features.append(-1.0)
+            elif getattr(hyperparameter, 'log', False) and value > 0:
+                features.append(float(np.log(value)))
+            else:
+                features.append(float(value))
+        return features
+
+    def fit(self, records: pd.DataFrame) -> 'CostModel':
+        """
+        Trains the model on records of the configuration space, as returned by
+        ResourceStore.query.
+        """
+        records = records[records['classifier'] == self.classifier]
+        # runs of which the cost was not measured (e.g., the cpu time of multi-threaded models)
+        records = records[records[self.measure].notnull()]
+        X = np.array([self._encode(parameters, {'NumberOfInstances': n_instances, 'NumberOfFeatures': n_features})
+                      for parameters, n_instances, n_features
+                      in zip(records['parameters'], records['n_instances'], records['n_features'])])
+        y = np.log(np.maximum(records[self.measure].astype(float).values, 1e-3))
+        self.model.fit(X, y)
+        self.n_records = len(records)
+        return self
+
+    def predict(self, configurations: typing.List[typing.Dict[str, typing.Any]],
+                qualities: typing.Dict[str, float]) -> np.ndarray:
+        """
+        Predicts the cost of configurations (dicts, as accepted by
+        `set_params`) on a task with the given data qualities.
+        """
+        X = np.array([self._encode(configuration, qualities) for configuration in configurations])
+        return np.exp(self.model.predict(X))
+
+    @staticmethod
+    def from_store(resource_store: ResourceStore, configuration_space_wrapper: ConfigSpaceWrapper,
+                   measure: str = 'cpu_time', min_records: int = 20) -> typing.Optional['CostModel']:
+        """
+        Trains a cost model on all runs of the configuration space in the
+        resource store. Returns None if the store contains less than
+        `min_records` runs of the configuration space.
+        """
+        model = CostModel(configuration_space_wrapper, measure)
+        records = resource_store.query(classifier=model.classifier)
+        records = records[records[measure].notnull()]
+        if len(records) < min_records:
+            logging.info('Not enough runs of %s to train a cost model (%d)' % (model.classifier, len(records)))
+            return None
+        return model.fit(records)
+
+
+class CostBudget(object):
+    """
+    Restricts the sampling of configurations to configurations of which the
+    predicted cost is within a per-run budget. Configurations that exceed the
+    budget are either replaced by a new sample (`resample`), or the run is
+    skipped (`skip`). Skipped runs are not deferred or retried: the bot
+    reports them as failed (with a ConfigurationOverBudgetError), and
+    continues with the next run. Every rejected configuration is logged, and
+    optionally appended to an audit file (JSON lines), so that the bias that
+    this introduces in the sampled configurations can be analyzed.
+
+    Parameters
+    ----------
+    cost_models: list[CostModel]
+        The cost models, of (at most) one per configuration space.
+        Configurations of configuration spaces without a model are never
+        rejected
+
+    budget: float
+        The maximal predicted cost of a run, in the unit of the measure of
+        the cost models (seconds)
+
+    policy: str
+        Either `resample` or `skip`
+
+    max_resamples: int
+        Only relevant for the `resample` policy. The number of times a new
+        configuration is drawn before the run is skipped
+
+    audit_file: str or None
+        If set, rejected configurations are appended to this file
+    """
+
+    POLICIES = ['resample', 'skip']
+
+    def __init__(self, cost_models: typing.List[CostModel], budget: float, policy: str = 'resample',
+                 max_resamples: int = 10, audit_file: typing.Optional[str] = None):
+        if policy not in CostBudget.POLICIES:
+            raise ValueError('Policy not implemented: %s' % policy)
+        self.cost_models = {cost_model.classifier: cost_model for cost_model in cost_models}
+        self.budget = budget
+        self.policy = policy
+        self.max_resamples = max_resamples
+        self.audit_file = audit_file
+
+    def _audit(self, task_id: int, qualities: typing.Dict[str, float], cost_model: CostModel,
+               configuration: typing.Dict[str, typing.Any], predicted_cost: float, decision: str):
+        logging.info('Rejected configuration on task %d (predicted %s %0.1f > budget %0.1f; %s): %s' %
+                     (task_id, cost_model.measure, predicted_cost, self.budget, decision, configuration))
+        if self.audit_file is None:
+            return
+        record = {
+            'time': time.time(),
+            'task_id': task_id,
+            'n_instances': qualities.get('NumberOfInstances'),
+            'n_features': qualities.get('NumberOfFeatures'),
+            'classifier': cost_model.classifier,
+            'configuration': configuration,
+            'measure': cost_model.measure,
+            'predicted_cost': predicted_cost,
+            'budget': self.budget,
+            'decision': decision,
+        }
+        directory = os.path.dirname(self.audit_file)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.audit_file, 'a') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.write(json.dumps(record, default=str) + '\n')
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def sample_configuration(self, configuration_space_wrapper: ConfigSpaceWrapper, task_id: int,
+                             qualities: typing.Dict[str, float]) -> typing.Dict[str, typing.Any]:
+        """
+        Samples a configuration of which the predicted cost on the task is
+        within the budget. Raises a ConfigurationOverBudgetError if no such
+        configuration was found.
+
+        Parameters
+        ----------
+        configuration_space_wrapper: ConfigSpaceWrapper
+            The configuration space to sample from
+
+        task_id: int
+            The OpenML task id
+
+        qualities: dict
+            The data qualities of the task (NumberOfInstances and
+            NumberOfFeatures)
+
+        Returns
+        -------
+        configuration: dict
+            The configuration, as accepted by `set_params`
+        """
+        cost_model = self.cost_models.get(configuration_space_wrapper.config_space.name)
+        n_attempts = 1 + self.max_resamples if self.policy == 'resample' else 1
+        for attempt in range(n_attempts):
+            configuration = configuration_space_wrapper.sample_configurations(1).get_dictionary(0)
+            if cost_model is None:
+                return configuration
+            predicted_cost = float(cost_model.predict([configuration], qualities)[0])
+            if predicted_cost <= self.budget:
+                return configuration
+            self._audit(task_id, qualities, cost_model, configuration, predicted_cost,
+                        'resampled' if attempt < n_attempts - 1 else 'skipped')
+        raise ConfigurationOverBudgetError('No configuration of %s within budget on task %d after %d attempts' %
+                                           (configuration_space_wrapper.config_space.name, task_id, n_attempts))
+
+
+def create_cost_budget(resource_store: ResourceStore, classifier_names: typing.List[str], budget: float,
+                       measure: str = 'cpu_time', policy: str = 'resample', max_resamples: int = 10,
+                       audit_file: typing.Optional[str] = None) -> CostBudget:
+    """
+    Trains cost models for the given configuration spaces on the runs in the
+    resource store, and wraps these in a CostBudget. Configuration spaces with
+    too few runs in the store are not restricted.
+
+    Parameters
+    ----------
+    resource_store: ResourceStore
+        The store with the costs of earlier runs
+
+    classifier_names: list[str]
+        The names of the configuration spaces, e.g., `random_forest`
+
+    budget: float
+        The maximal predicted cost of a run (seconds)
+
+    measure: str
+        The cost to predict, e.g., `cpu_time` or `wall_time`
+
+    policy: str
+        Either `resample` or `skip`, see CostBudget
+
+    max_resamples: int
+        Only relevant for the `resample` policy, see CostBudget
+
+    audit_file: str or None
+        If set, rejected configurations are appended to this file
+
+    Returns
+    -------
+    cost_budget: CostBudget
+        The budget, to be passed to the bot
+    """
+    cost_models = []
+    for classifier_name in classifier_names:
+        configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(classifier_name, 0)
+        cost_model = CostModel.from_store(resource_store, configuration_space_wrapper, measure)
+        if cost_model is not None:
+            cost_models.append(cost_model)
+    return CostBudget(cost_models, budget, policy, max_resamples, audit_file)
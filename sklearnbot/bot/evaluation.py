@@ -0,0 +1,316 @@
+import collections
+import copy
+import joblib
+import numpy as np
+import openml
+import sklearn
+import sklearn.base
+import sklearn.metrics
+import sklearnbot
+import time
+import typing
+
+from sklearnbot.bot.preprocessing_cache import get_preprocessed_fold
+from sklearnbot.bot.run_index import RunExistsLocallyError, RunIndex, get_run_key
+from sklearnbot.bot.task_cache import CachedTask
+from sklearnbot.timing import phase
+
+
+# flows that are known to exist on the server, per (server, name, external version)
+_server_flows = dict()  # type: typing.Dict[typing.Tuple[str, str, str], openml.flows.OpenMLFlow]
+
+FoldResult = collections.namedtuple('FoldResult', ['repeat', 'fold', 'sample', 'test_indices', 'y_pred',
+                                                   'y_proba', 'measures', 'trace'])
+
+
+def _can_measure_cpu_time(model: sklearn.base.BaseEstimator) -> bool:
+    """
+    Returns whether the model runs on a single core, i.e., all its n_jobs
+    parameters are 1 or None (as in openml-python). Otherwise, the cpu time
+    of the process is not attributable to the model.
+    """
+    for name, value in model.get_params(deep=True).items():
+        if (name == 'n_jobs' or name.endswith('__n_jobs')) and value is not None and value != 1:
+            return False
+    return True
+
+
+def _run_model_on_fold(model: sklearn.base.BaseEstimator, task: CachedTask, repeat: int, fold: int, sample: int,
+                       extension: openml.extensions.Extension, use_preprocessing_cache: bool = False,
+                       measure_cpu_time: bool = True) -> FoldResult:
+    """
+    Fits a copy of the model on the train set of a single split of the task,
+    and predicts the test set.
+
+    Parameters
+    ----------
+    model: sklearn.base.BaseEstimator
+        The untrained model. Will be cloned, and not altered
+
+    task: CachedTask
+        The task that provides the data and the splits
+
+    repeat: int
+        The repeat number of the split
+
+    fold: int
+        The fold number of the split
+
+    sample: int
+        The sample number of the split
+
+    extension: openml.extensions.Extension
+        The OpenML extension belonging to the model, used to extract traces
+
+    use_preprocessing_cache: bool
+        If set to true and the model is a fixed pipeline, the preprocessed
+        split is obtained from the preprocessing cache, and only the
+        classifier is fitted
+
+    measure_cpu_time: bool
+        If set to false, the cpu time measures are omitted (e.g., if the
+        model is multi-threaded)
+
+    Returns
+    -------
+    result: FoldResult
+        The predictions (as class indices), the class probabilities (ordered
+        as the class labels of the task), the measures and the trace
+    """
+    train_indices, test_indices = task.get_train_test_split_indices(fold=fold, repeat=repeat, sample=sample)
+    X, y = task.get_X_and_y()
+    y_train = y[train_indices]
+    y_test = y[test_indices]
+
+    model_fold = sklearn.base.clone(model, safe=True)
+    # only the classifier of a fixed pipeline is fitted; the preprocessed
+    # data is shared with other configurations through the task cache
+    pipeline_split = None
+    if use_preprocessing_cache and task.directory is not None:
+        pipeline_split = sklearnbot.sklearn.split_fixed_pipeline(model_fold)
+    if pipeline_split is not None:
+        preprocessing, classifier = pipeline_split
+        preprocessed = get_preprocessed_fold(preprocessing, task, repeat, fold, sample)
+        X_train, X_test = preprocessed.X_train, preprocessed.X_test
+        timing = preprocessed.timing
+    else:
+        classifier = model_fold
+        X_train, X_test = X[train_indices], X[test_indices]
+        timing = collections.defaultdict(float)
+
+    # reported times include the (original) time of the preprocessing
+    measures = collections.OrderedDict()
+    start_cputime = time.process_time()
+    start_walltime = time.time()
+    classifier.fit(X_train, y_train)
+    training_cputime = (time.process_time() - start_cputime) * 1000 + timing['usercpu_time_millis_training']
+    measures['wall_clock_time_millis_training'] = \
+        (time.time() - start_walltime) * 1000 + timing['wall_clock_time_millis_training']
+
+    start_cputime = time.process_time()
+    start_walltime = time.time()
+    y_pred = classifier.predict(X_test)
+    model_classes = np.asarray(classifier.classes_).astype(int)
+    y_proba = np.zeros((len(test_indices), len(task.class_labels)))
+    try:
+        y_proba[:, model_classes] = classifier.predict_proba(X_test)
+    except AttributeError:
+        # predict_proba is not available (e.g., SVC with probability=False)
+        y_proba[np.arange(len(y_pred)), y_pred.astype(int)] = 1.0
+    testing_cputime = (time.process_time() - start_cputime) * 1000 + timing['usercpu_time_millis_testing']
+    measures['wall_clock_time_millis_testing'] = \
+        (time.time() - start_walltime) * 1000 + timing['wall_clock_time_millis_testing']
+    if measure_cpu_time:
+        measures['usercpu_time_millis_training'] = training_cputime
+        measures['usercpu_time_millis_testing'] = testing_cputime
+        measures['usercpu_time_millis'] = training_cputime + testing_cputime
+    measures['wall_clock_time_millis'] = \
+        measures['wall_clock_time_millis_training'] + measures['wall_clock_time_millis_testing']
+    measures['predictive_accuracy'] = sklearn.metrics.accuracy_score(y_test, y_pred)
+
+    trace = None
+    if extension._is_hpo_class(model_fold):
+        trace_data = extension._extract_trace_data(model_fold, repeat, fold)
+        trace = extension._obtain_arff_trace(model_fold, trace_data)
+    return FoldResult(repeat, fold, sample, test_indices, y_pred, y_proba, measures, trace)
+
+
+def _check_duplicate_run(flow: openml.flows.OpenMLFlow, task_id: int) -> openml.flows.OpenMLFlow:
+    """
+    Raises an OpenMLRunsExistError if the setup was already ran on the task,
+    similar to openml.runs.run_model_on_task. Returns the flow of the run:
+    the flow from the server (which holds the flow ids of all components) if
+    it exists, and the local flow otherwise. Flows that exist on the server
+    are remembered, so that consecutive runs of the same classifier do not
+    query the server for the flow again.
+    """
+    flow_key = (openml.config.server, flow.name, flow.external_version)
+    if flow_key not in _server_flows:
+        flow_id = openml.flows.flow_exists(flow.name, flow.external_version)
+        if not flow_id:
+            return flow
+        _server_flows[flow_key] = openml.flows.get_flow(flow_id)
+    # a copy per run, as it holds the model of the run
+    flow_from_server = copy.deepcopy(_server_flows[flow_key])
+    flow_from_server.model = flow.model
+    setup_id = openml.setups.setup_exists(flow_from_server)
+    ids = openml.runs.run_exists(task_id, setup_id)
+    if ids:
+        raise openml.exceptions.OpenMLRunsExistError(
+            ids, 'One or more runs of this setup were already performed on the task.')
+    return flow_from_server
+
+
+def run_model_on_cached_task(model: sklearn.base.BaseEstimator, task: CachedTask,
+                             avoid_duplicate_runs: bool = True, n_jobs: int = 1,
+                             backend: str = 'loky', use_preprocessing_cache: bool = False,
+                             run_index: typing.Optional[RunIndex] = None) -> openml.runs.OpenMLRun:
+    """
+    Runs a model on all splits of a cached task, and packages the result as
+    OpenML run. Serves the same purpose as openml.runs.run_model_on_task, but
+    operates on the (memory-mapped) data of the task cache, rather than
+    loading the dataset for every run. The splits can be evaluated in
+    parallel. The process based backends share the memory-mapped task data
+    with the workers, rather than copying it.
+
+    As in openml-python, the (user) cpu times are only reported if the model
+    is single-threaded (all its n_jobs parameters are 1 or None), as the cpu
+    time of the process can not be attributed to the model otherwise. For
+    the same reason, they are not reported if the folds are evaluated
+    concurrently in the same process (the `threading` backend). The wall
+    clock times are always reported.
+
+    Parameters
+    ----------
+    model: sklearn.base.BaseEstimator
+        The untrained model
+
+    task: CachedTask
+        The task to run the model on
+
+    avoid_duplicate_runs: bool
+        If set to true, the server is checked for runs with the same setup on
+        this task, and an OpenMLRunsExistError is raised if one exists
+
+    n_jobs: int
+        The number of splits that are evaluated in parallel. Set to -1 to use
+        all cores
+
+    backend: str
+        The joblib backend used to evaluate the splits in parallel, e.g.,
+        `loky` or `multiprocessing` (processes) or `threading` (threads). The
+        cpu times are omitted if the splits are evaluated by threads
+
+    use_preprocessing_cache: bool
+        If set to true, the preprocessing steps of a fixed pipeline are only
+        fitted once per split (and stored in the task cache), rather than for
+        every configuration. Only the classifier is fitted on the stored
+        matrices. The reported run times still include the preprocessing,
+        but as it was originally measured when the split was preprocessed
+        (possibly by another process), so this is off by default
+
+    run_index: RunIndex or None
+        If set, a RunExistsLocallyError is raised (before fitting) if the
+        configuration was already executed on this task according to the
+        index. The run is not added to the index, as it is not stored yet;
+        the caller adds it (see get_run_key) once it is stored
+
+    Returns
+    -------
+    run: openml.runs.OpenMLRun
+        The run, that can be stored on the filesystem or published
+    """
+    extension = openml.extensions.get_extension_by_model(model)
+    with phase('model_to_flow'):
+        flow = extension.model_to_flow(model)
+    if run_index is not None and run_index.contains(task.task_id, get_run_key(flow, model)):
+        raise RunExistsLocallyError('Configuration was already executed on task %d according to the run index'
+                                    % task.task_id)
+    if avoid_duplicate_runs:
+        with phase('check_duplicate_run'):
+            flow = _check_duplicate_run(flow, task.task_id)
+
+    num_repeats, num_folds, num_samples = task.get_split_dimensions()
+    # the cpu time of the process is only reported if it belongs to the model
+    # (and the fold), so not if the folds are evaluated by concurrent threads
+    concurrent_threads = backend == 'threading' and n_jobs not in (None, 1)
+    measure_cpu_time = _can_measure_cpu_time(model) and not concurrent_threads
+    with phase('evaluate_folds'):
+        fold_results = joblib.Parallel(n_jobs=n_jobs, backend=backend)(
+            joblib.delayed(_run_model_on_fold)(model, task, repeat, fold, sample, extension,
+                                               use_preprocessing_cache, measure_cpu_time)
+            for repeat in range(num_repeats)
+            for fold in range(num_folds)
+            for sample in range(num_samples)
+        )
+
+    with phase('format_predictions'):
+        run = _create_run(model, task, flow, extension, fold_results)
+    return run
+
+
+def _create_run(model: sklearn.base.BaseEstimator, task: CachedTask, flow: openml.flows.OpenMLFlow,
+                extension: openml.extensions.Extension, fold_results: typing.List[FoldResult]) \
+        -> openml.runs.OpenMLRun:
+    data_content = []
+    fold_evaluations = collections.OrderedDict()
+    traces = []
+    for result in fold_results:
+        for i, row_id in enumerate(result.test_indices):
+            truth = task.y[row_id]
+            data_content.append(openml.runs.functions.format_prediction(
+                task=task.task,
+                repeat=result.repeat,
+                fold=result.fold,
+                sample=result.sample,
+                index=int(row_id),
+                prediction=task.class_labels[int(result.y_pred[i])],
+                truth=task.class_labels[int(truth)],
+                proba=dict(zip(task.class_labels, result.y_proba[i])),
+            ))
+        for measure, value in result.measures.items():
+            fold_evaluations.setdefault(measure, collections.OrderedDict())
+            fold_evaluations[measure].setdefault(result.repeat, collections.OrderedDict())
+            fold_evaluations[measure][result.repeat][result.fold] = value
+        if result.trace is not None:
+            traces.append(result.trace)
+
+    run_environment = extension.get_version_information()
+    run = openml.runs.OpenMLRun(
+        task_id=task.task_id,
+        flow_id=flow.flow_id,
+        dataset_id=task.dataset_id,
+        model=model,
+        flow_name=flow.name,
+        tags=['openml-python', run_environment[1]],
+        trace=openml.runs.OpenMLRunTrace.merge_traces(traces) if len(traces) > 0 else None,
+        data_content=data_content,
+        flow=flow,
+        setup_string=extension.create_setup_string(model),
+    )
+    if flow.flow_id is not None:
+        run.parameter_settings = extension.obtain_parameter_values(flow)
+    run.fold_evaluations = fold_evaluations
+    return run
+
+
+def get_fold_scores(run: openml.runs.OpenMLRun, measure: str) -> np.ndarray:
+    """
+    Returns the locally calculated per fold scores of a run as flat array.
+
+    Parameters
+    ----------
+    run: openml.runs.OpenMLRun
+        A run, as created by run_model_on_cached_task
+
+    measure: str
+        The name of the evaluation measure, e.g., predictive_accuracy
+
+    Returns
+    -------
+    scores: np.ndarray
+        The scores per fold, ordered by repeat and fold
+    """
+    return np.array([
+        value for repeat in run.fold_evaluations[measure].values() for value in repeat.values()
+    ])
@@ -0,0 +1,209 @@
+import collections
+import fcntl
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import resource
+import signal
+import time
+import traceback
+import typing
+
+
+FAILURES_FILE = 'failures.jsonl'
+
+# Limits of an isolated run: cpu time (seconds), wall clock time (seconds)
+# and address space (megabytes). Limits that are None are not enforced
+ResourceLimits = collections.namedtuple('ResourceLimits', ['cpu_time', 'wall_clock_time', 'memory'])
+ResourceLimits.__new__.__defaults__ = (None, None, None)
+
+# without a wall clock limit, runs with a cpu time limit are stopped after
+# this multiple of their cpu time limit (e.g., when blocked on a lock)
+CPU_TIME_WALL_CLOCK_FACTOR = 3
+
+# modules that are imported by the fork server before it starts children
+PRELOAD_MODULES = ['ConfigSpace', 'numpy', 'openml', 'scipy.sparse', 'sklearn', 'sklearnbot.bot',
+                   'sklearnbot.config_spaces', 'sklearnbot.sklearn']
+
+
+class RunLimitExceededError(Exception):
+    """
+    Raised when an isolated run exceeded one of its resource limits, or was
+    killed otherwise.
+
+    Parameters
+    ----------
+    reason: str
+        Either `cpu_time`, `wall_clock_time`, `memory` or `killed`
+
+    limits: ResourceLimits
+        The limits of the run
+
+    elapsed: float
+        The wall clock time (in seconds) until the run was stopped
+    """
+
+    def __init__(self, reason: str, limits: ResourceLimits, elapsed: float):
+        super(RunLimitExceededError, self).__init__('Run exceeded its %s limit (limits: %s; elapsed: %0.1fs)' %
+                                                    (reason, dict(limits._asdict()), elapsed))
+        self.reason = reason
+        self.limits = limits
+        self.elapsed = elapsed
+
+
+def get_context(start_method: typing.Optional[str] = None):
+    """
+    Returns the multiprocessing context used to start child processes. By
+    default, children are started by a fork server (preloaded with the bot),
+    as forking the (multi-threaded) process itself is not safe. Falls back to
+    spawning if the platform has no fork server.
+    """
+    if start_method is None:
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(start_method)
+    if context.get_start_method() == 'forkserver':
+        context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+
+def get_wall_clock_limit(limits: ResourceLimits) -> typing.Optional[float]:
+    """
+    Returns the wall clock time (in seconds) after which an isolated run is
+    stopped: the wall clock limit or, if not set, a multiple of the cpu time
+    limit (see CPU_TIME_WALL_CLOCK_FACTOR).
+    """
+    if limits.wall_clock_time is not None:
+        return limits.wall_clock_time
+    if limits.cpu_time is not None:
+        return limits.cpu_time * CPU_TIME_WALL_CLOCK_FACTOR
+    return None
+
+
+def _child(function: typing.Callable, args: typing.Tuple, kwargs: typing.Dict, limits: ResourceLimits,
+           connection: multiprocessing.connection.Connection):
+    if limits.cpu_time is not None:
+        # SIGXCPU at the soft limit, SIGKILL at the hard limit
+        resource.setrlimit(resource.RLIMIT_CPU, (int(limits.cpu_time), int(limits.cpu_time) + 1))
+    if limits.memory is not None:
+        memory = int(limits.memory * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    error_traceback = None
+    try:
+        result = ('ok', function(*args, **kwargs))
+    except MemoryError:
+        result = ('memory', None)
+    except BaseException as e:
+        result = ('error', e)
+        error_traceback = traceback.format_exc()
+    try:
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if result[0] == 'error':
+            # not all exceptions can be reconstructed
+            pickle.loads(payload)
+    except Exception:
+        # the exception (or result) can not be transferred
+        payload = pickle.dumps(('error', RuntimeError(error_traceback or traceback.format_exc())))
+    connection.send_bytes(payload)
+    connection.close()
+
+
+def run_isolated(function: typing.Callable, args: typing.Tuple, kwargs: typing.Dict, limits: ResourceLimits):
+    """
+    Executes a function in a child process (started by a fork server, see
+    get_context), with limits on its cpu time, wall clock time and address
+    space. The function and its arguments are pickled; a memory-mapped task
+    is reopened from the task cache by the child, rather than copied.
+    Exceptions of the function are re-raised in the parent. A child that
+    exceeds its limits (or is killed, e.g., by the OOM killer) does not affect
+    the parent. Runs with only a cpu time limit are still stopped after a
+    multiple of it (see get_wall_clock_limit).
+
+    Parameters
+    ----------
+    function: callable
+        The function to execute. It should be importable, and its arguments
+        and result should be picklable
+
+    args: tuple
+        The positional arguments of the function
+
+    kwargs: dict
+        The keyword arguments of the function
+
+    limits: ResourceLimits
+        The limits of the child process
+
+    Returns
+    -------
+    result:
+        The result of the function
+    """
+    context = get_context()
+    start = time.time()
+    wall_clock_limit = get_wall_clock_limit(limits)
+    reader, writer = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(function, args, kwargs, limits, writer))
+    process.start()
+    writer.close()
+    payload = None
+    timed_out = False
+    try:
+        timeout = None
+        if wall_clock_limit is not None:
+            timeout = max(0.0, start + wall_clock_limit - time.time())
+        if reader.poll(timeout):
+            payload = reader.recv_bytes()
+        else:
+            timed_out = True
+    except EOFError:
+        # the child exited without a result
+        pass
+    finally:
+        reader.close()
+        if timed_out:
+            process.kill()
+        process.join()
+    elapsed = time.time() - start
+
+    if timed_out:
+        raise RunLimitExceededError('wall_clock_time', limits._replace(wall_clock_time=wall_clock_limit), elapsed)
+    if payload is None:
+        # the soft cpu time limit sends SIGXCPU, which terminates the child
+        if process.exitcode == -signal.SIGXCPU and limits.cpu_time is not None:
+            raise RunLimitExceededError('cpu_time', limits, elapsed)
+        # e.g., killed by the OOM killer
+        raise RunLimitExceededError('killed', limits, elapsed)
+
+    status, result = pickle.loads(payload)
+    if status == 'memory':
+        raise RunLimitExceededError('memory', limits, elapsed)
+    if status == 'error':
+        raise result
+    return result
+
+
+def record_failure(output_dir: str, task_id: int, model, error: RunLimitExceededError):
+    """
+    Appends a structured record of a run that exceeded its limits to
+    `output_dir/failures.jsonl`, so that pathological regions of the
+    configuration spaces can be analyzed afterwards.
+    """
+    record = {
+        'time': time.time(),
+        'task_id': task_id,
+        'model': model.__class__.__module__ + '.' + model.__class__.__name__,
+        'parameters': {name: value for name, value in model.get_params(deep=True).items()
+                       if value is None or isinstance(value, (str, int, float, bool))},
+        'reason': error.reason,
+        'limits': dict(error.limits._asdict()),
+        'elapsed': error.elapsed,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, FAILURES_FILE), 'a') as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        try:
+            fp.write(json.dumps(record, default=str) + '\n')
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
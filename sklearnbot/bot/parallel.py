@@ -0,0 +1,452 @@
+import collections
+import importlib
+import logging
+import multiprocessing
+import openml
+import os
+import queue
+import random
+import resource
+import sklearnbot
+import time
+import traceback
+import typing
+import uuid
+
+from sklearnbot.bot.cost_model import CostBudget
+from sklearnbot.bot.evaluation import get_fold_scores
+from sklearnbot.bot.isolation import PRELOAD_MODULES, ResourceLimits, RunLimitExceededError, get_context, \
+    record_failure, run_isolated
+from sklearnbot.bot.resource_store import ResourceStore, create_resource_record
+from sklearnbot.bot.results_db import ResultsDatabase, get_configuration
+from sklearnbot.bot.run import _record_fold_timings, _run_and_measure, _store_run, prepare_classifier
+from sklearnbot.bot.run_index import RunIndex, get_run_key
+from sklearnbot.bot.run_store import RunStore
+from sklearnbot.bot.task_cache import get_cached_task, release_cached_task
+from sklearnbot.bot.upload import UploadQueue
+from sklearnbot.bot.warm_start import WarmStartSampler
+from sklearnbot.config_spaces import ConfigSpaceWrapper
+from sklearnbot.timing import PhaseTimings, phase
+
+
+# A single run of the bot: a random configuration (determined by the seed)
+# from the config space of the classifier, on the task
+BotJob = collections.namedtuple('BotJob', ['task_id', 'classifier_name', 'seed'])
+
+# The outcome of a job, as reported by the collector
+JobResult = collections.namedtuple('JobResult', ['job', 'success', 'run_id', 'local_run_folder', 'error'])
+
+_WorkerOptions = collections.namedtuple('_WorkerOptions', ['run_defaults', 'vanilla_estimator',
+                                                           'task_cache_directory', 'openml_server',
+                                                           'openml_apikey', 'run_index_directory',
+                                                           'resource_limits', 'output_dir',
+                                                           'max_runs_per_worker', 'max_worker_rss',
+                                                           'max_resident_tasks', 'resource_store_directory',
+                                                           'cost_budget', 'warm_start', 'use_preprocessing_cache',
+                                                           'record_timings'])
+
+
+def _warm_up():
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    for classifier_name in sklearnbot.config_spaces.get_available_config_spaces(False):
+        importlib.import_module('sklearnbot.config_spaces.%s' % classifier_name)
+
+
+def _drain(result_queue: multiprocessing.Queue) -> typing.List[typing.Tuple]:
+    """
+    Returns all results that are in the queue, without waiting for more
+    """
+    results = []
+    while True:
+        try:
+            results.append(result_queue.get_nowait())
+        except queue.Empty:
+            return results
+
+
+def _get_rss() -> float:
+    """
+    Returns the resident set size of the current process, in megabytes
+    """
+    try:
+        with open('/proc/self/statm', 'r') as fp:
+            return int(fp.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except (IOError, OSError):
+        # peak resident set size (kilobytes on linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _execute_job(job: BotJob, options: _WorkerOptions, run_index: typing.Optional[RunIndex],
+                 resource_store: typing.Optional[ResourceStore]) -> openml.runs.OpenMLRun:
+    task = get_cached_task(job.task_id, options.task_cache_directory)
+    configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(job.classifier_name, job.seed)
+    if not options.vanilla_estimator:
+        configuration_space_wrapper.wrap_in_fixed_pipeline()
+    classifier = prepare_classifier(configuration_space_wrapper, task, options.run_defaults, options.cost_budget,
+                                    options.warm_start)
+    start = time.time()
+    kwargs = {'run_index': run_index, 'use_preprocessing_cache': options.use_preprocessing_cache}
+    if options.resource_limits is None:
+        run, peak_rss = _run_and_measure(classifier, task, **kwargs)
+    else:
+        try:
+            # the phases of the run itself are not recorded in the child process
+            with phase('run_isolated'):
+                run, peak_rss = run_isolated(_run_and_measure, (classifier, task), kwargs, options.resource_limits)
+        except RunLimitExceededError as e:
+            record_failure(options.output_dir, job.task_id, classifier, e)
+            raise
+    if resource_store is not None:
+        resource_store.add(create_resource_record(task, configuration_space_wrapper.config_space.name, classifier,
+                                                  get_configuration(configuration_space_wrapper, classifier), run,
+                                                  time.time() - start, peak_rss, options.resource_limits is not None))
+    _record_fold_timings(run)
+    return run
+
+
+def _worker(worker_id: int, job_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue,
+            options: _WorkerOptions):
+    # the worker might be spawned rather than forked
+    openml.config.server = options.openml_server
+    openml.config.apikey = options.openml_apikey
+    _warm_up()
+    run_index = RunIndex(options.run_index_directory) if options.run_index_directory is not None else None
+    resource_store = None
+    if options.resource_store_directory is not None:
+        resource_store = ResourceStore(options.resource_store_directory)
+    resident_tasks = collections.OrderedDict()
+    n_runs = 0
+    while True:
+        job = job_queue.get()
+        if job is None:
+            return
+        timings = PhaseTimings() if options.record_timings else None
+        try:
+            with sklearnbot.timing.recording(timings):
+                run = _execute_job(job, options, run_index, resource_store)
+            error, failure_reason = None, None
+        except Exception as e:
+            # failures are isolated per job, and reported to the collector
+            run = None
+            error = traceback.format_exc()
+            failure_reason = '%s: %s' % (type(e).__name__, str(e))
+
+        # keep the most recently used tasks resident
+        resident_tasks[job.task_id] = True
+        resident_tasks.move_to_end(job.task_id)
+        if options.max_resident_tasks is not None and len(resident_tasks) > options.max_resident_tasks:
+            task_id, _ = resident_tasks.popitem(last=False)
+            release_cached_task(task_id, options.task_cache_directory)
+
+        # recycle the worker after a number of runs, or when it grew too large
+        n_runs += 1
+        retire = (options.max_runs_per_worker is not None and n_runs >= options.max_runs_per_worker) or \
+            (options.max_worker_rss is not None and _get_rss() > options.max_worker_rss)
+        result_queue.put((worker_id, job, run, error, failure_reason, timings, retire))
+        if retire:
+            return
+
+
+class _Worker(object):
+
+    def __init__(self, worker_id: int, context, result_queue: multiprocessing.Queue, options: _WorkerOptions):
+        self.job_queue = context.Queue()
+        # not daemonic, as daemonic processes can not start isolated runs; the
+        # workers are stopped by run_bot_parallel
+        self.process = context.Process(target=_worker, args=(worker_id, self.job_queue, result_queue, options),
+                                       daemon=False)
+        self.process.start()
+        self.current_job = None  # type: typing.Optional[BotJob]
+
+    def dispatch(self, job: BotJob):
+        self.current_job = job
+        self.job_queue.put(job)
+
+
+def _collect(job: BotJob, run: typing.Optional[openml.runs.OpenMLRun], error: typing.Optional[str],
+             failure_reason: typing.Optional[str], output_dir: str, upload_and_delete: bool, tag: typing.Optional[str],
+             upload_queue: typing.Optional[UploadQueue], run_store: typing.Optional[RunStore],
+             task_cache_directory: typing.Optional[str], results_db: typing.Optional[ResultsDatabase],
+             vanilla_estimator: bool, run_index: typing.Optional[RunIndex], timings: typing.Optional[PhaseTimings],
+             timing_callback: typing.Optional[typing.Callable[[typing.Dict], None]]) -> JobResult:
+    """
+    Handles the outcome of a single job in the main process: logs the result,
+    writes the run to the filesystem (or the run store) and optionally
+    uploads it (and records it in the results database and the run index).
+    Failures to store or upload the run are reported as failed job, rather
+    than raised. The phases of storing the run are added to the timings of
+    the worker, which are then passed to the timing callback.
+    """
+    configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(job.classifier_name, job.seed)
+    if not vanilla_estimator:
+        configuration_space_wrapper.wrap_in_fixed_pipeline()
+    with sklearnbot.timing.recording(timings):
+        result = _collect_run(job, run, error, failure_reason, output_dir, upload_and_delete, tag, upload_queue,
+                              run_store, task_cache_directory, results_db, configuration_space_wrapper, run_index)
+    sklearnbot.timing.emit(timing_callback, timings, task_id=job.task_id,
+                           classifier=configuration_space_wrapper.config_space.name, success=result.success,
+                           run_id=result.run_id)
+    return result
+
+
+def _collect_run(job: BotJob, run: typing.Optional[openml.runs.OpenMLRun], error: typing.Optional[str],
+                 failure_reason: typing.Optional[str], output_dir: str, upload_and_delete: bool,
+                 tag: typing.Optional[str], upload_queue: typing.Optional[UploadQueue],
+                 run_store: typing.Optional[RunStore],
+                 task_cache_directory: typing.Optional[str], results_db: typing.Optional[ResultsDatabase],
+                 configuration_space_wrapper: ConfigSpaceWrapper, run_index: typing.Optional[RunIndex]) -> JobResult:
+    classifier_name = configuration_space_wrapper.config_space.name
+    if error is not None:
+        logging.warning('Job %s failed: %s' % (str(job), error))
+        if results_db is not None:
+            results_db.add(job.task_id, classifier_name, None, success=False, failure_reason=failure_reason)
+        return JobResult(job, False, None, None, error)
+    configuration = None
+    if results_db is not None:
+        configuration = get_configuration(configuration_space_wrapper, run.model)
+    local_run_dir = os.path.join(output_dir, str(job.task_id), str(uuid.uuid4()))
+    try:
+        score = get_fold_scores(run, 'predictive_accuracy')
+        logging.info('Task %d - %s; Accuracy: %0.2f' % (job.task_id, job.classifier_name, score.mean()))
+        class_labels = None
+        if run_store is not None:
+            # the task was cached by the worker
+            class_labels = get_cached_task(job.task_id, task_cache_directory).class_labels
+        run_id, local_run_dir = _store_run(run, local_run_dir, upload_and_delete, tag, upload_queue, run_store,
+                                           class_labels)
+        if run_index is not None:
+            # only once the run is stored, so that failed runs are retried
+            run_index.add(job.task_id, [get_run_key(run.flow, run.model)])
+        logging.info('Run was executed successfully. Run id=%s; folder=%s' % (run_id, local_run_dir))
+        if results_db is not None:
+            results_db.add(job.task_id, classifier_name, configuration, run=run, run_id=run_id,
+                           local_run=local_run_dir)
+        return JobResult(job, True, run_id, local_run_dir, None)
+    except Exception as e:
+        # e.g., a server error, or a failure to write the run; the other jobs continue
+        error = traceback.format_exc()
+        logging.warning('A problem occurred. Run id=None; folder=%s; %s' % (local_run_dir, error))
+        if results_db is not None:
+            results_db.add(job.task_id, classifier_name, configuration, run=run, success=False,
+                           failure_reason='%s: %s' % (type(e).__name__, str(e)))
+        return JobResult(job, False, None, local_run_dir, error)
+
+
+def run_bot_parallel(jobs: typing.List[BotJob],
+                     n_workers: int,
+                     run_defaults: bool,
+                     vanilla_estimator: bool,
+                     output_dir: str,
+                     upload_and_delete: bool,
+                     tag: typing.Optional[str]=None,
+                     task_cache_directory: typing.Optional[str]=None,
+                     upload_queue: typing.Optional[UploadQueue]=None,
+                     run_index_directory: typing.Optional[str]=None,
+                     resource_limits: typing.Optional[ResourceLimits]=None,
+                     max_runs_per_worker: typing.Optional[int]=None,
+                     max_worker_rss: typing.Optional[float]=None,
+                     max_resident_tasks: typing.Optional[int]=None,
+                     start_method: typing.Optional[str]=None,
+                     resource_store_directory: typing.Optional[str]=None,
+                     cost_budget: typing.Optional[CostBudget]=None,
+                     run_store: typing.Optional[RunStore]=None,
+                     results_db: typing.Optional[ResultsDatabase]=None,
+                     warm_start: typing.Optional[WarmStartSampler]=None,
+                     use_preprocessing_cache: bool=False,
+                     timing_callback: typing.Optional[typing.Callable[[typing.Dict], None]]=None) \
+        -> typing.List[JobResult]:
+    """
+    Executes bot jobs on a pool of worker processes. Each task is pinned to
+    a worker, so that the data of a task stays warm in the memory of that
+    worker; idle workers take over jobs of busy workers. Failing jobs and
+    crashing workers do not affect other jobs (crashed workers are replaced).
+    The runs are sent back to the main process, which acts as single
+    collector that logs the results, writes the runs to the filesystem and
+    optionally uploads them.
+
+    Workers are forked from a fork server that has already imported
+    scikit-learn, openml, ConfigSpace and all configuration spaces, so that
+    starting (and recycling) a worker is cheap. Jobs are sent to the workers
+    as compact BotJob tuples (the seed determines the configuration).
+
+    Parameters
+    ----------
+    jobs: list[BotJob]
+        The jobs to execute. The classifier name can be the wildcard `all`,
+        in which case a random classifier is selected upon submission
+
+    n_workers: int
+        The number of worker processes
+
+    run_defaults: bool
+        If set to true, the configurations will be run with their default hyperparameter values
+
+    vanilla_estimator: bool
+        If set to true, vanilla classifiers are ran rather than the fixed pipeline
+
+    output_dir: str
+        A writable directory where the intermediate run results can be stored,
+        before uploading
+
+    upload_and_delete: bool
+        If true, after a run has been executed it will be uploaded to OpenML.
+        If the uploading is correct, the local files will be deleted afterwards.
+
+    tag: str
+        Only relevant when upload_and_delete is set to True. Adds the provided string as tag to the uploaded runs
+
+    task_cache_directory: str or None
+        The directory in which the task data is cached (memory-mapped) across
+        runs. Leave to None to use the default location in the OpenML cache
+
+    upload_queue: UploadQueue or None
+        Only relevant when upload_and_delete is set to True. If set, the
+        collector hands the runs to the upload queue, rather than uploading
+        them itself
+
+    run_index_directory: str or None
+        If set, the workers skip configurations that were already executed on
+        the task according to the run index in this directory (before
+        fitting). Runs are added to it by the collector, once they are stored
+
+    resource_limits: ResourceLimits or None
+        If set, the workers execute every run in an isolated child process,
+        with the given limits on cpu time, wall clock time and memory. Runs
+        that exceed their limits are recorded in `output_dir/failures.jsonl`
+
+    max_runs_per_worker: int or None
+        If set, workers are replaced by a fresh worker after this number of
+        runs
+
+    max_worker_rss: float or None
+        If set, workers are replaced by a fresh worker once their resident
+        set size exceeds this number of megabytes (checked after every run)
+
+    max_resident_tasks: int or None
+        If set, every worker keeps at most this number of (recently used)
+        tasks opened
+
+    start_method: str or None
+        The multiprocessing start method. Leave to None to use a fork server
+        where available (see isolation.get_context)
+
+    resource_store_directory: str or None
+        If set, the workers record the resources that every successful run
+        consumed in the ResourceStore in this directory
+
+    cost_budget: CostBudget or None
+        If set, the workers only sample configurations of which the predicted
+        cost is within the budget. Jobs for which no such configuration is
+        found fail with a ConfigurationOverBudgetError
+
+    run_store: RunStore or None
+        Only relevant when upload_and_delete is set to False. If set, the
+        collector adds the runs to this store, rather than storing them as a
+        directory in `output_dir`
+
+    results_db: ResultsDatabase or None
+        If set, the collector records the outcome of every job
+        (configuration, scores per fold, timings, run id or failure reason)
+        in this database
+
+    warm_start: WarmStartSampler or None
+        If set, the workers run the best configurations of the most similar
+        tasks first, before sampling randomly. Every worker keeps track of
+        its own proposals, so tasks should be pinned to workers (which they
+        are, unless jobs are taken over by idle workers)
+
+    use_preprocessing_cache: bool
+        If set to true, the preprocessing steps of the fixed pipeline are only
+        fitted once per split (see run_bot_on_task_batch)
+
+    timing_callback: callable or None
+        If set, the time spent in every phase of a job is recorded (by the
+        worker, and by the collector for storing and uploading the run), and
+        passed to this function as a dict per job in the main process, e.g.,
+        sklearnbot.timing.TimingFile. As in run_bot_on_task_batch, phases
+        that are executed by joblib workers or isolated child processes are
+        not recorded, only the phase that encloses them
+
+    Returns
+    -------
+    results: list[JobResult]
+        The result of each job, in order of completion
+    """
+    context = get_context(start_method)
+    result_queue = context.Queue()
+    options = _WorkerOptions(run_defaults, vanilla_estimator, task_cache_directory,
+                             openml.config.server, openml.config.apikey, run_index_directory,
+                             resource_limits, output_dir, max_runs_per_worker, max_worker_rss,
+                             max_resident_tasks, resource_store_directory, cost_budget, warm_start,
+                             use_preprocessing_cache, timing_callback is not None)
+    workers = [_Worker(worker_id, context, result_queue, options) for worker_id in range(n_workers)]
+    run_index = RunIndex(run_index_directory) if run_index_directory is not None else None
+
+    # task affinity: tasks are assigned to workers in order of appearance
+    pending = [collections.deque() for _ in range(n_workers)]
+    affinity = dict()
+    for job in jobs:
+        if job.classifier_name == sklearnbot.config_spaces.bootstrap.ALL_WILDCARD_NAME:
+            job = job._replace(classifier_name=random.choice(
+                sklearnbot.config_spaces.get_available_config_spaces(False)))
+        if job.task_id not in affinity:
+            affinity[job.task_id] = len(affinity) % n_workers
+        pending[affinity[job.task_id]].append(job)
+
+    results = []
+    try:
+        while len(results) < len(jobs):
+            for worker_id, worker in enumerate(workers):
+                if worker.current_job is not None:
+                    continue
+                if len(pending[worker_id]) > 0:
+                    worker.dispatch(pending[worker_id].popleft())
+                else:
+                    # steal from the back of the longest queue
+                    busiest = max(range(n_workers), key=lambda idx: len(pending[idx]))
+                    if len(pending[busiest]) > 0:
+                        worker.dispatch(pending[busiest].pop())
+
+            try:
+                received = [result_queue.get(timeout=1.0)]
+            except queue.Empty:
+                received = []
+            # a worker flushes its results before it exits, so the results of
+            # exited workers are received before they are considered crashed
+            exited = [worker_id for worker_id, worker in enumerate(workers)
+                      if worker.current_job is not None and not worker.process.is_alive()]
+            if len(exited) > 0:
+                received.extend(_drain(result_queue))
+
+            for worker_id, job, run, error, failure_reason, timings, retire in received:
+                if workers[worker_id].current_job is None:
+                    # result of a worker that was already considered crashed
+                    continue
+                workers[worker_id].current_job = None
+                if retire:
+                    workers[worker_id].process.join()
+                    workers[worker_id] = _Worker(worker_id, context, result_queue, options)
+                results.append(_collect(job, run, error, failure_reason, output_dir, upload_and_delete, tag,
+                                        upload_queue, run_store, task_cache_directory, results_db,
+                                        vanilla_estimator, run_index, timings, timing_callback))
+                logging.info('Finished %d/%d jobs' % (len(results), len(jobs)))
+
+            for worker_id in exited:
+                worker = workers[worker_id]
+                if worker.current_job is not None:
+                    # there is no exception (or traceback) of a crashed worker
+                    error = 'Worker crashed with exit code %s' % worker.process.exitcode
+                    results.append(_collect(worker.current_job, None, error, error, output_dir, upload_and_delete,
+                                            tag, upload_queue, run_store, task_cache_directory, results_db,
+                                            vanilla_estimator, run_index, None, timing_callback))
+                    workers[worker_id] = _Worker(worker_id, context, result_queue, options)
+    finally:
+        for worker in workers:
+            if worker.process.is_alive():
+                worker.job_queue.put(None)
+        for worker in workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+    return results
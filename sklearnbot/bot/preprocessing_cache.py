@@ -0,0 +1,200 @@
+import collections
+import json
+import os
+import shutil
+import sklearn.base
+import sklearn.pipeline
+import sklearnbot
+import time
+import typing
+import uuid
+
+from sklearnbot.bot.task_cache import CachedTask, load_matrix, save_matrix
+
+
+PREPROCESSED_DIRECTORY = 'preprocessed'
+# the default maximal size of the preprocessed splits per task, in megabytes
+DEFAULT_MAX_SIZE = 1024
+
+# A preprocessed split of a task: the transformed train and test matrices,
+# and the (cpu and wall clock) time it originally took to compute them
+PreprocessedFold = collections.namedtuple('PreprocessedFold', ['X_train', 'X_test', 'timing'])
+
+
+def get_preprocessing_signature(preprocessing: sklearn.pipeline.Pipeline) -> str:
+    """
+    Returns a hash that identifies the preprocessing pipeline, based on all
+    its (deep) hyperparameters and the scikit-learn version.
+    """
+    return sklearnbot.sklearn.get_estimator_signature(preprocessing)
+
+
+def _materialize(preprocessing: sklearn.pipeline.Pipeline, task: CachedTask, repeat: int, fold: int, sample: int,
+                 fold_directory: str):
+    train_indices, test_indices = task.get_train_test_split_indices(fold=fold, repeat=repeat, sample=sample)
+    X, y = task.get_X_and_y()
+
+    preprocessing = sklearn.base.clone(preprocessing, safe=True)
+    timing = dict()
+    start_cputime = time.process_time()
+    start_walltime = time.time()
+    X_train = preprocessing.fit_transform(X[train_indices], y[train_indices])
+    timing['usercpu_time_millis_training'] = (time.process_time() - start_cputime) * 1000
+    timing['wall_clock_time_millis_training'] = (time.time() - start_walltime) * 1000
+
+    start_cputime = time.process_time()
+    start_walltime = time.time()
+    X_test = preprocessing.transform(X[test_indices])
+    timing['usercpu_time_millis_testing'] = (time.process_time() - start_cputime) * 1000
+    timing['wall_clock_time_millis_testing'] = (time.time() - start_walltime) * 1000
+
+    # write to a private directory first, and move it in place atomically,
+    # so that concurrent processes never observe a partially written fold
+    parent_directory = os.path.dirname(fold_directory)
+    os.makedirs(parent_directory, exist_ok=True)
+    tmp_directory = os.path.join(parent_directory, '.%s.%s' % (os.path.basename(fold_directory), uuid.uuid4()))
+    os.makedirs(tmp_directory)
+    try:
+        save_matrix(tmp_directory, 'X_train', X_train)
+        save_matrix(tmp_directory, 'X_test', X_test)
+        with open(os.path.join(tmp_directory, 'timing.json'), 'w') as fp:
+            json.dump(timing, fp)
+        os.rename(tmp_directory, fold_directory)
+    except OSError:
+        # another process materialized the same fold in the meantime
+        if not os.path.isfile(os.path.join(fold_directory, 'timing.json')):
+            raise
+    finally:
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+
+def _directory_size(directory: str) -> int:
+    size = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                # removed in the meantime
+                continue
+    return size
+
+
+def evict_preprocessed_folds(task_directory: str, max_size: float, keep: typing.Optional[str] = None) -> int:
+    """
+    Removes the preprocessed splits of the least recently used preprocessing
+    pipelines of a task, until the preprocessed splits of the task take at
+    most `max_size` megabytes. Splits that are opened (memory-mapped) by
+    other processes remain readable until they are closed.
+
+    Parameters
+    ----------
+    task_directory: str
+        The directory of the task in the task cache
+
+    max_size: float
+        The maximal size of the preprocessed splits of the task, in megabytes
+
+    keep: str or None
+        The signature of a preprocessing pipeline that is never removed (e.g.,
+        the one that is in use)
+
+    Returns
+    -------
+    n_removed: int
+        The number of preprocessing pipelines of which the splits were removed
+    """
+    preprocessed_directory = os.path.join(task_directory, PREPROCESSED_DIRECTORY)
+    if not os.path.isdir(preprocessed_directory):
+        return 0
+    signatures = []
+    for name in os.listdir(preprocessed_directory):
+        directory = os.path.join(preprocessed_directory, name)
+        if name.startswith('.') or not os.path.isdir(directory):
+            continue
+        try:
+            # the modification time is updated upon every use
+            signatures.append((os.path.getmtime(directory), name, _directory_size(directory)))
+        except OSError:
+            continue
+    total_size = sum(size for _, _, size in signatures)
+    n_removed = 0
+    for _, name, size in sorted(signatures):
+        if total_size <= max_size * 1024 * 1024:
+            break
+        if name == keep:
+            continue
+        # moved out of sight first, so that no process observes a partially removed split
+        evicted_directory = os.path.join(preprocessed_directory, '.evicted.%s' % uuid.uuid4())
+        try:
+            os.rename(os.path.join(preprocessed_directory, name), evicted_directory)
+        except OSError:
+            # evicted by another process in the meantime
+            continue
+        shutil.rmtree(evicted_directory, ignore_errors=True)
+        total_size -= size
+        n_removed += 1
+    return n_removed
+
+
+def get_preprocessed_fold(preprocessing: sklearn.pipeline.Pipeline, task: CachedTask,
+                          repeat: int, fold: int, sample: int,
+                          max_size: typing.Optional[float] = DEFAULT_MAX_SIZE) -> PreprocessedFold:
+    """
+    Obtains the train and test matrices of a split of a task, as transformed
+    by the preprocessing pipeline. The matrices are computed once per (task,
+    split, preprocessing signature), stored next to the task in the task
+    cache and opened memory-mapped afterwards, so that all configurations
+    and all worker processes share them. Once the preprocessed splits of the
+    task exceed `max_size`, those of the least recently used preprocessing
+    pipelines are removed.
+
+    Parameters
+    ----------
+    preprocessing: sklearn.pipeline.Pipeline
+        The (untrained) preprocessing pipeline. Will be cloned, and not altered
+
+    task: CachedTask
+        A task that is stored in the task cache
+
+    repeat: int
+        The repeat number of the split
+
+    fold: int
+        The fold number of the split
+
+    sample: int
+        The sample number of the split
+
+    max_size: float or None
+        The maximal size of the preprocessed splits of the task, in
+        megabytes. Set to None to never remove preprocessed splits
+
+    Returns
+    -------
+    preprocessed: PreprocessedFold
+        The memory-mapped train and test matrices, and the time it took to
+        compute them
+    """
+    if task.directory is None:
+        raise ValueError('Task %d is not stored in a task cache' % task.task_id)
+    signature = get_preprocessing_signature(preprocessing)
+    signature_directory = os.path.join(task.directory, PREPROCESSED_DIRECTORY, signature)
+    fold_directory = os.path.join(signature_directory, '%d_%d_%d' % (repeat, fold, sample))
+    for attempt in range(2):
+        if not os.path.isfile(os.path.join(fold_directory, 'timing.json')):
+            _materialize(preprocessing, task, repeat, fold, sample, fold_directory)
+            if max_size is not None:
+                evict_preprocessed_folds(task.directory, max_size, keep=signature)
+        try:
+            # marks the preprocessing pipeline as recently used
+            os.utime(signature_directory)
+            with open(os.path.join(fold_directory, 'timing.json'), 'r') as fp:
+                timing = json.load(fp)
+            return PreprocessedFold(load_matrix(fold_directory, 'X_train'), load_matrix(fold_directory, 'X_test'),
+                                    timing)
+        except FileNotFoundError:
+            # evicted by another process in the meantime
+            if attempt > 0:
+                raise
@@ -0,0 +1,232 @@
+import fcntl
+import json
+import numpy as np
+import openml
+import os
+import pandas as pd
+import resource
+import sklearn.base
+import sklearnbot
+import time
+import typing
+
+from sklearnbot.bot.task_cache import CachedTask
+
+
+def _resolve_classifier(classifier: str) -> str:
+    # configuration spaces can be referred to by their short name, e.g., random_forest
+    if classifier in sklearnbot.config_spaces.get_available_config_spaces(False):
+        return sklearnbot.config_spaces.get_config_space(classifier, 0).config_space.name
+    return classifier
+
+
+def get_peak_rss() -> float:
+    """
+    Returns the peak resident set size of the current process, in megabytes
+    """
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def create_resource_record(task: CachedTask, classifier: str, model: sklearn.base.BaseEstimator,
+                           configuration: typing.Dict[str, typing.Any], run: openml.runs.OpenMLRun, wall_time: float,
+                           peak_rss: typing.Optional[float], isolated: bool) -> typing.Dict[str, typing.Any]:
+    """
+    Describes the resources that a run consumed.
+
+    Parameters
+    ----------
+    task: CachedTask
+        The task the run was executed on
+
+    classifier: str
+        The name of the configuration space, e.g.,
+        `sklearn.ensemble.RandomForestClassifier`
+
+    model: sklearn.base.BaseEstimator
+        The (untrained) model
+
+    configuration: dict
+        The active hyperparameters of the configuration space that were set
+        on the model (see results_db.get_configuration). Recorded as the
+        `parameters` of the run, on which the cost model is trained
+
+    run: openml.runs.OpenMLRun
+        The executed run
+
+    wall_time: float
+        The wall clock time of the run (in seconds)
+
+    peak_rss: float or None
+        The peak resident set size of the process that executed the run (in
+        megabytes, see get_peak_rss)
+
+    isolated: bool
+        Whether the run was executed in an isolated child process. Only then
+        the peak resident set size is recorded, as it belongs to the run
+        itself; the peak of a long-lived process (e.g., a worker) is not
+        attributable to a single run
+
+    Returns
+    -------
+    record: dict
+        A JSON serializable record
+    """
+    folds = []
+    evaluations = run.fold_evaluations
+    # cpu times are not reported of multi-threaded models (see run_model_on_cached_task)
+    has_cpu_time = 'usercpu_time_millis_training' in evaluations
+    for repeat in evaluations['wall_clock_time_millis_training']:
+        for fold in evaluations['wall_clock_time_millis_training'][repeat]:
+            folds.append({
+                'repeat': repeat,
+                'fold': fold,
+                'fit_cpu_time': evaluations['usercpu_time_millis_training'][repeat][fold] / 1000
+                if has_cpu_time else None,
+                'fit_time': evaluations['wall_clock_time_millis_training'][repeat][fold] / 1000,
+                'predict_cpu_time': evaluations['usercpu_time_millis_testing'][repeat][fold] / 1000
+                if has_cpu_time else None,
+                'predict_time': evaluations['wall_clock_time_millis_testing'][repeat][fold] / 1000,
+            })
+    return {
+        'time': time.time(),
+        'task_id': task.task_id,
+        'n_instances': task.qualities.get('NumberOfInstances'),
+        'n_features': task.qualities.get('NumberOfFeatures'),
+        'n_classes': task.qualities.get('NumberOfClasses'),
+        'classifier': classifier,
+        'configuration': sklearnbot.sklearn.get_estimator_signature(model, include_version=False),
+        'parameters': configuration,
+        # measured within the folds, so also valid if the folds are evaluated by other processes
+        'cpu_time': sum(fold['fit_cpu_time'] + fold['predict_cpu_time'] for fold in folds)
+        if has_cpu_time else None,
+        'wall_time': wall_time,
+        'fit_time': sum(fold['fit_time'] for fold in folds),
+        'predict_time': sum(fold['predict_time'] for fold in folds),
+        'peak_rss': peak_rss if isolated else None,
+        'isolated': isolated,
+        'folds': folds,
+    }
+
+
+class ResourceStore(object):
+    """
+    Append-only local store of the resources (cpu time, wall clock time, peak
+    memory of isolated runs, and fit and predict time per fold) that runs
+    consumed, keyed by task, configuration space and configuration. Records of a configuration
+    space are appended (under an exclusive lock) to a JSON lines file, so
+    that multiple processes can use the same store.
+
+    Parameters
+    ----------
+    store_directory: str
+        A writable directory in which the records will be stored
+    """
+
+    def __init__(self, store_directory: str):
+        self.store_directory = store_directory
+        os.makedirs(store_directory, exist_ok=True)
+
+    def _store_file(self, classifier: str) -> str:
+        return os.path.join(self.store_directory, '%s.jsonl' % classifier)
+
+    def add(self, record: typing.Dict[str, typing.Any]):
+        """
+        Appends a record, as created by create_resource_record
+        """
+        with open(self._store_file(record['classifier']), 'a') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.write(json.dumps(record, default=str) + '\n')
+                fp.flush()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def _read(self, classifier: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        if not os.path.isfile(self._store_file(classifier)):
+            return []
+        with open(self._store_file(classifier), 'r') as fp:
+            fcntl.flock(fp, fcntl.LOCK_SH)
+            try:
+                lines = fp.readlines()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+        # a partially written last line (e.g., of a killed process) is skipped
+        return [json.loads(line) for line in lines if line.endswith('\n')]
+
+    def query(self, classifier: typing.Optional[str] = None,
+              task_ids: typing.Optional[typing.List[int]] = None,
+              min_instances: typing.Optional[float] = None,
+              max_instances: typing.Optional[float] = None) -> pd.DataFrame:
+        """
+        Returns the records that match all given filters, as a data frame
+        with a row per run (without the per fold records).
+
+        Parameters
+        ----------
+        classifier: str or None
+            The configuration space, either by its name in sklearnbot (e.g.,
+            `random_forest`) or by the name of the classifier (e.g.,
+            `sklearn.ensemble.RandomForestClassifier`). Leave to None to
+            include all configuration spaces
+
+        task_ids: list[int] or None
+            If set, only runs on these tasks are included
+
+        min_instances: float or None
+            If set, only runs on tasks with at least this number of instances
+            are included
+
+        max_instances: float or None
+            If set, only runs on tasks with at most this number of instances
+            are included
+
+        Returns
+        -------
+        records: pd.DataFrame
+            The matching records
+        """
+        if classifier is not None:
+            classifiers = [_resolve_classifier(classifier)]
+        else:
+            classifiers = [name[:-len('.jsonl')] for name in sorted(os.listdir(self.store_directory))
+                           if name.endswith('.jsonl')]
+        records = [record for name in classifiers for record in self._read(name)]
+        frame = pd.DataFrame(records, columns=['time', 'task_id', 'n_instances', 'n_features', 'n_classes',
+                                               'classifier', 'configuration', 'parameters', 'cpu_time',
+                                               'wall_time', 'fit_time', 'predict_time', 'peak_rss', 'isolated'])
+        if task_ids is not None:
+            frame = frame[frame['task_id'].isin(task_ids)]
+        if min_instances is not None:
+            frame = frame[frame['n_instances'] >= min_instances]
+        if max_instances is not None:
+            frame = frame[frame['n_instances'] <= max_instances]
+        return frame.reset_index(drop=True)
+
+    def get_percentile(self, measure: str, percentile: float, **filters) -> typing.Optional[float]:
+        """
+        Returns a percentile of a resource measure over the runs that match
+        the filters (see query), e.g., the 95th percentile of the cpu time of
+        random_forest on tasks with more than 100,000 instances:
+        `get_percentile('cpu_time', 95, classifier='random_forest', min_instances=100000)`
+
+        Parameters
+        ----------
+        measure: str
+            Either `cpu_time`, `wall_time`, `fit_time`, `predict_time` or
+            `peak_rss`
+
+        percentile: float
+            The percentile, between 0 and 100
+
+        Returns
+        -------
+        value: float or None
+            The percentile, or None if no runs match the filters (of which
+            the measure was recorded)
+        """
+        frame = self.query(**filters)
+        values = frame[measure].astype(float).dropna() if len(frame) > 0 else frame
+        if len(values) == 0:
+            return None
+        return float(np.percentile(values, percentile))
@@ -0,0 +1,285 @@
+import json
+import numpy as np
+import openml
+import pandas as pd
+import sqlite3
+import threading
+import time
+import typing
+
+from sklearnbot.bot.resource_store import _resolve_classifier
+from sklearnbot.config_spaces import ConfigSpaceWrapper
+from sklearnbot.config_spaces.sampling import get_active_configuration
+
+
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS runs ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' time REAL NOT NULL,'
+    ' task_id INTEGER NOT NULL,'
+    ' classifier TEXT NOT NULL,'
+    ' optimizer TEXT,'
+    ' configuration TEXT,'
+    ' success INTEGER NOT NULL,'
+    ' run_id INTEGER,'
+    ' local_run TEXT,'
+    ' predictive_accuracy REAL,'
+    ' wall_time REAL,'
+    ' cpu_time REAL,'
+    ' fit_time REAL,'
+    ' predict_time REAL,'
+    ' failure_reason TEXT)',
+    'CREATE TABLE IF NOT EXISTS folds ('
+    ' run INTEGER NOT NULL REFERENCES runs(id),'
+    ' repeat INTEGER NOT NULL,'
+    ' fold INTEGER NOT NULL,'
+    ' predictive_accuracy REAL,'
+    ' fit_time REAL,'
+    ' predict_time REAL,'
+    ' PRIMARY KEY (run, repeat, fold))',
+    'CREATE INDEX IF NOT EXISTS runs_task ON runs (task_id, classifier)',
+    'CREATE INDEX IF NOT EXISTS runs_classifier ON runs (classifier, time)',
+    'CREATE INDEX IF NOT EXISTS runs_run_id ON runs (run_id)',
+]
+
+_RUN_COLUMNS = ['id', 'time', 'task_id', 'classifier', 'optimizer', 'configuration', 'success', 'run_id',
+                'local_run', 'predictive_accuracy', 'wall_time', 'cpu_time', 'fit_time', 'predict_time',
+                'failure_reason']
+
+
+def _to_json_value(value):
+    # numpy scalars (e.g., of sampled configurations) are not JSON serializable
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def get_configuration(configuration_space_wrapper: ConfigSpaceWrapper, model) -> typing.Dict[str, typing.Any]:
+    """
+    Returns the values of the hyperparameters of the configuration space
+    that are set on a model (named as in the configuration space, e.g.,
+    `randomforestclassifier__max_features` for the fixed pipeline).
+    Hyperparameters that are inactive according to the conditions are left
+    out, as in a sampled configuration.
+    """
+    configuration = get_active_configuration(configuration_space_wrapper.hyperparameters,
+                                             configuration_space_wrapper.conditions, model.get_params(deep=True))
+    return {name: _to_json_value(value) for name, value in configuration.items()}
+
+
+class ResultsDatabase(object):
+    """
+    Embedded (SQLite) database of the outcome of every run of the bot, so
+    that sweeps can be analyzed without the OpenML server. Every record holds
+    the task, the configuration space and configuration, the success or
+    failure reason, the run id or local run folder (or run store key), the
+    mean and per fold accuracy, and the timings of the run. Records are
+    indexed by task, configuration space and time, and by run id.
+
+    The database is opened in WAL mode, so that readers do not block the
+    bot, and it can be shared by multiple processes on the same machine (WAL
+    does not work on network filesystems).
+
+    Parameters
+    ----------
+    path: str
+        The database file, created if it does not exist
+
+    timeout: float
+        The number of seconds to wait for a lock held by another process
+    """
+
+    def __init__(self, path: str, timeout: float = 60.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+
+    def close(self):
+        self._connection.close()
+
+    def add(self, task_id: int, classifier: str, configuration: typing.Optional[typing.Dict[str, typing.Any]],
+            run: typing.Optional[openml.runs.OpenMLRun] = None, success: bool = True,
+            run_id: typing.Optional[int] = None, local_run: typing.Optional[str] = None,
+            wall_time: typing.Optional[float] = None, failure_reason: typing.Optional[str] = None,
+            optimizer: typing.Optional[str] = None) -> int:
+        """
+        Records the outcome of a run.
+
+        Parameters
+        ----------
+        task_id: int
+            The OpenML task id
+
+        classifier: str
+            The name of the configuration space, e.g.,
+            `sklearn.ensemble.RandomForestClassifier`
+
+        configuration: dict or None
+            The configuration (see get_configuration), or None if it is not
+            known (e.g., for optimizers or runs that failed before sampling)
+
+        run: openml.runs.OpenMLRun or None
+            The executed run, if any. The scores and timings per fold are
+            recorded from its (local) fold evaluations
+
+        success: bool
+            Whether the run was executed and stored successfully
+
+        run_id: int or None
+            The OpenML run id, if uploaded
+
+        local_run: str or None
+            The local run folder, or the key of the run in the run store
+
+        wall_time: float or None
+            The wall clock time of the run (in seconds)
+
+        failure_reason: str or None
+            If not successful, the reason
+
+        optimizer: str or None
+            If the run executed an optimizer, its name
+
+        Returns
+        -------
+        record_id: int
+            The id of the record in the database
+        """
+        folds = []
+        if run is not None:
+            evaluations = run.fold_evaluations
+            # cpu times are not reported of multi-threaded models
+            has_cpu_time = 'usercpu_time_millis_training' in evaluations
+            for repeat in evaluations['predictive_accuracy']:
+                for fold in evaluations['predictive_accuracy'][repeat]:
+                    folds.append((repeat, fold, evaluations['predictive_accuracy'][repeat][fold],
+                                  evaluations['wall_clock_time_millis_training'][repeat][fold] / 1000,
+                                  evaluations['wall_clock_time_millis_testing'][repeat][fold] / 1000,
+                                  (evaluations['usercpu_time_millis_training'][repeat][fold] +
+                                   evaluations['usercpu_time_millis_testing'][repeat][fold]) / 1000
+                                  if has_cpu_time else None))
+        record = (time.time(), task_id, classifier, optimizer,
+                  json.dumps(configuration) if configuration is not None else None, int(success), run_id, local_run,
+                  float(np.mean([fold[2] for fold in folds])) if len(folds) > 0 else None, wall_time,
+                  sum(fold[5] for fold in folds) if len(folds) > 0 and folds[0][5] is not None else None,
+                  sum(fold[3] for fold in folds) if len(folds) > 0 else None,
+                  sum(fold[4] for fold in folds) if len(folds) > 0 else None,
+                  failure_reason)
+        with self._lock, self._connection:
+            cursor = self._connection.execute('INSERT INTO runs (%s) VALUES (%s)' %
+                                              (', '.join(_RUN_COLUMNS[1:]), ', '.join('?' * len(record))), record)
+            record_id = cursor.lastrowid
+            self._connection.executemany('INSERT INTO folds VALUES (?, ?, ?, ?, ?, ?)',
+                                         [(record_id,) + fold[:5] for fold in folds])
+        return record_id
+
+    def query(self, classifier: typing.Optional[str] = None,
+              task_ids: typing.Optional[typing.List[int]] = None,
+              success: typing.Optional[bool] = None,
+              since: typing.Optional[float] = None) -> pd.DataFrame:
+        """
+        Returns the records that match all given filters, as a data frame
+        with a row per run (configurations are decoded into dicts).
+
+        Parameters
+        ----------
+        classifier: str or None
+            The configuration space, either by its name in sklearnbot (e.g.,
+            `random_forest`) or by the name of the classifier (e.g.,
+            `sklearn.ensemble.RandomForestClassifier`). Leave to None to
+            include all configuration spaces
+
+        task_ids: list[int] or None
+            If set, only runs on these tasks are included
+
+        success: bool or None
+            If set, only successful (or only failed) runs are included
+
+        since: float or None
+            If set, only runs recorded after this (unix) time are included
+
+        Returns
+        -------
+        records: pd.DataFrame
+            The matching records
+        """
+        clauses, parameters = [], []
+        if classifier is not None:
+            clauses.append('classifier = ?')
+            parameters.append(_resolve_classifier(classifier))
+        if task_ids is not None:
+            clauses.append('task_id IN (%s)' % ', '.join('?' * len(task_ids)))
+            parameters.extend(int(task_id) for task_id in task_ids)
+        if success is not None:
+            clauses.append('success = ?')
+            parameters.append(int(success))
+        if since is not None:
+            clauses.append('time > ?')
+            parameters.append(since)
+        statement = 'SELECT %s FROM runs' % ', '.join(_RUN_COLUMNS)
+        if len(clauses) > 0:
+            statement += ' WHERE ' + ' AND '.join(clauses)
+        with self._lock:
+            rows = self._connection.execute(statement + ' ORDER BY id', parameters).fetchall()
+        configuration_index = _RUN_COLUMNS.index('configuration')
+        rows = [row[:configuration_index] +
+                (json.loads(row[configuration_index]) if row[configuration_index] is not None else None,) +
+                row[configuration_index + 1:] for row in rows]
+        frame = pd.DataFrame(rows, columns=_RUN_COLUMNS)
+        frame['success'] = frame['success'].astype(bool)
+        return frame
+
+    def get_folds(self, record_ids: typing.List[int]) -> pd.DataFrame:
+        """
+        Returns the scores and timings per fold of the given records
+        """
+        columns = ['run', 'repeat', 'fold', 'predictive_accuracy', 'fit_time', 'predict_time']
+        with self._lock:
+            rows = self._connection.execute('SELECT %s FROM folds WHERE run IN (%s) ORDER BY run, repeat, fold' %
+                                            (', '.join(columns), ', '.join('?' * len(record_ids))),
+                                            [int(record_id) for record_id in record_ids]).fetchall()
+        return pd.DataFrame(rows, columns=columns)
+
+    def to_frame(self, classifier: str, task_ids: typing.Optional[typing.List[int]] = None,
+                 per_fold: bool = False) -> pd.DataFrame:
+        """
+        Exports the successful runs of a configuration space in the layout of
+        `examples/obtain_results.py`: a row per run (or fold), with the task
+        id, a column per hyperparameter and the predictive accuracy.
+
+        Parameters
+        ----------
+        classifier: str
+            The configuration space (see query)
+
+        task_ids: list[int] or None
+            If set, only runs on these tasks are included
+
+        per_fold: bool
+            If set to true, a row per fold (with the repeat and fold number)
+            rather than per run
+
+        Returns
+        -------
+        results: pd.DataFrame
+            The results
+        """
+        records = self.query(classifier, task_ids, success=True)
+        records = records[records['configuration'].notnull()]
+        configurations = pd.DataFrame(list(records['configuration']), index=records.index)
+        results = pd.concat([records[['task_id']], configurations], axis=1)
+        if not per_fold:
+            results['predictive_accuracy'] = records['predictive_accuracy']
+            return results.reset_index(drop=True)
+        folds = self.get_folds(list(records['id']))
+        folds = folds.rename(columns={'repeat': 'repeat_nr', 'fold': 'fold_nr'})
+        results = results.join(records['id']).merge(folds[['run', 'repeat_nr', 'fold_nr', 'predictive_accuracy']],
+                                                    left_on='id', right_on='run')
+        return results.drop(columns=['id', 'run']).reset_index(drop=True)
@@ -2,27 +2,58 @@ import logging
 import openml
 import os
 import shutil
-import sklearn
 import sklearnbot
+import sklearnbot.timing
+import time
 import traceback
 import typing
 import uuid
 
+from sklearnbot.bot.cost_model import ConfigurationOverBudgetError, CostBudget
+from sklearnbot.bot.evaluation import get_fold_scores, run_model_on_cached_task
+from sklearnbot.bot.isolation import ResourceLimits, RunLimitExceededError, record_failure, run_isolated
+from sklearnbot.bot.resource_store import ResourceStore, create_resource_record, get_peak_rss
+from sklearnbot.bot.results_db import ResultsDatabase, get_configuration
+from sklearnbot.bot.run_index import RunExistsLocallyError, RunIndex, get_run_key
+from sklearnbot.bot.run_store import RunStore
+from sklearnbot.bot.task_cache import CachedTask, get_cached_task
+from sklearnbot.bot.upload import UploadQueue
+from sklearnbot.bot.warm_start import WarmStartSampler
 from sklearnbot.config_spaces import ConfigSpaceWrapper
+from sklearnbot.timing import PhaseTimings, phase
 
 
-def prepare_classifier(configuration_space_wrapper: ConfigSpaceWrapper, task: openml.tasks.OpenMLTask,
-                       run_defaults: bool):
-    configuration_space = configuration_space_wrapper.assemble()
+OPTIMIZERS = ['random_search', 'successive_halving']
 
-    data_name = task.get_dataset().name
-    data_qualities = task.get_dataset().qualities
+
+def _get_task_description(task: typing.Union[openml.tasks.OpenMLTask, CachedTask]) \
+        -> typing.Tuple[str, typing.Dict[str, float], typing.List[int], typing.List[int]]:
+    """
+    Returns the dataset name, data qualities, nominal indices and numeric
+    indices of a task. Only a single dataset object is obtained.
+    """
+    if isinstance(task, CachedTask):
+        return task.name, task.qualities, task.nominal_indices, task.numeric_indices
+    dataset = task.get_dataset()
+    nominal_indices = dataset.get_features_by_type('nominal', [task.target_name])
+    numeric_indices = dataset.get_features_by_type('numeric', [task.target_name])
+    return dataset.name, dataset.qualities, nominal_indices, numeric_indices
+
+
+def prepare_classifier(configuration_space_wrapper: ConfigSpaceWrapper,
+                       task: typing.Union[openml.tasks.OpenMLTask, CachedTask],
+                       run_defaults: bool,
+                       cost_budget: typing.Optional[CostBudget]=None,
+                       warm_start: typing.Optional[WarmStartSampler]=None):
+    # only the name and meta-data are required to instantiate the classifier,
+    # so the configuration space does not need to be assembled
+    configuration_space = configuration_space_wrapper.config_space
+
+    data_name, data_qualities, nominal_indices, numeric_indices = _get_task_description(task)
     data_tuple = (task.task_id, data_name, data_qualities['NumberOfFeatures'], data_qualities['NumberOfInstances'])
     logging.info('Obtained task %d (%s); %s attributes; %s observations' % data_tuple)
 
     # obtain deserialized classifier
-    nominal_indices = task.get_dataset().get_features_by_type('nominal', [task.target_name])
-    numeric_indices = task.get_dataset().get_features_by_type('numeric', [task.target_name])
     if configuration_space_wrapper.wrapped_in_pipeline:
         classifier = sklearnbot.sklearn.as_pipeline(configuration_space, numeric_indices, nominal_indices)
     else:
@@ -30,36 +61,169 @@ def prepare_classifier(configuration_space_wrapper: ConfigSpaceWrapper, task: op
 
     # sample configuration and set hyperparameters
     if not run_defaults:
-        configuration = configuration_space.sample_configuration(1)
-        logging.info('Configuration: %s' % configuration.get_dictionary())
-        classifier.set_params(**configuration.get_dictionary())
+        configuration = None
+        if warm_start is not None:
+            # the best configurations of similar tasks are proposed first
+            configuration = warm_start.propose(configuration_space_wrapper, task.task_id, data_qualities)
+        if configuration is not None:
+            logging.info('Warm start configuration')
+        elif cost_budget is not None:
+            # raises a ConfigurationOverBudgetError if no affordable configuration was found
+            configuration = cost_budget.sample_configuration(configuration_space_wrapper, task.task_id,
+                                                             data_qualities)
+        else:
+            configuration = configuration_space_wrapper.sample_configurations(1).get_dictionary(0)
+        logging.info('Configuration: %s' % configuration)
+        classifier.set_params(**configuration)
     else:
         logging.info('Running default configuration')
     return classifier
 
 
+def _store_run(run: openml.runs.OpenMLRun, local_run_dir: str, upload_and_delete: bool, tag: typing.Optional[str],
+               upload_queue: typing.Optional[UploadQueue], run_store: typing.Optional[RunStore] = None,
+               class_labels: typing.Optional[typing.List[str]] = None) \
+        -> typing.Tuple[typing.Optional[int], typing.Optional[str]]:
+    """
+    Stores an executed run on the filesystem, and optionally uploads it (and
+    deletes the local copy afterwards). Returns the run id (if uploaded) and
+    the local run directory (if not deleted). If an upload queue is given,
+    the upload happens asynchronously, and no run id is returned. If a run
+    store is given (and the run is not uploaded), the run is added to the
+    store instead, and its key in the store is returned rather than a
+    directory.
+    """
+    if run_store is not None and not upload_and_delete:
+        with phase('to_run_store'):
+            return None, run_store.add(run, class_labels, tag)
+    with phase('to_filesystem'):
+        run.to_filesystem(local_run_dir, store_model=False)
+    if upload_and_delete:
+        if upload_queue is not None:
+            upload_queue.submit(local_run_dir, tag)
+            return None, local_run_dir
+        with phase('publish'):
+            run = run.publish()
+            shutil.rmtree(local_run_dir)
+            local_run_dir = None
+            if tag is not None:
+                run.push_tag(tag)
+    return run.run_id, local_run_dir
+
+
+def _record_fold_timings(run: openml.runs.OpenMLRun):
+    """
+    Records the training and testing times of the individual folds of a run
+    to the active timings, if any. As reported to OpenML, these include the
+    (possibly cached) preprocessing.
+    """
+    timings = sklearnbot.timing.get_active_timings()
+    if timings is None:
+        return
+    training = run.fold_evaluations['wall_clock_time_millis_training']
+    testing = run.fold_evaluations['wall_clock_time_millis_testing']
+    for repeat in training:
+        for fold in training[repeat]:
+            timings.add_fold(repeat, fold, 0, training=training[repeat][fold] / 1000,
+                             testing=testing[repeat][fold] / 1000)
+
+
+def _run_and_measure(classifier, task: CachedTask, **kwargs) -> typing.Tuple[openml.runs.OpenMLRun, float]:
+    # executed by the process that runs the model, which might be isolated
+    run = run_model_on_cached_task(classifier, task, **kwargs)
+    return run, get_peak_rss()
+
+
+def _record_result(results_db: typing.Optional[ResultsDatabase], task_id: int, classifier_name: str,
+                   configuration: typing.Optional[typing.Dict[str, typing.Any]], **kwargs):
+    if results_db is not None:
+        results_db.add(task_id, classifier_name, configuration, **kwargs)
+
+
+def _run_classifier_on_task(classifier, classifier_name: str, task: CachedTask, output_dir: str,
+                            upload_and_delete: bool, tag: typing.Optional[str], n_jobs: int, backend: str,
+                            upload_queue: typing.Optional[UploadQueue], run_index: typing.Optional[RunIndex],
+                            resource_limits: typing.Optional[ResourceLimits],
+                            resource_store: typing.Optional[ResourceStore],
+                            run_store: typing.Optional[RunStore],
+                            results_db: typing.Optional[ResultsDatabase],
+                            configuration: typing.Optional[typing.Dict[str, typing.Any]],
+                            use_preprocessing_cache: bool, avoid_duplicate_runs: bool = True) \
+        -> typing.Tuple[bool, typing.Optional[int], typing.Optional[str]]:
+    local_run_dir = os.path.join(output_dir, str(task.task_id), str(uuid.uuid4()))
+    run, start = None, time.time()
+    try:
+        # invoke OpenML run
+        kwargs = {'n_jobs': n_jobs, 'backend': backend, 'run_index': run_index,
+                  'use_preprocessing_cache': use_preprocessing_cache, 'avoid_duplicate_runs': avoid_duplicate_runs}
+        start = time.time()
+        if resource_limits is not None:
+            # the phases of the run itself are not recorded in the child process
+            with phase('run_isolated'):
+                run, peak_rss = run_isolated(_run_and_measure, (classifier, task), kwargs, resource_limits)
+        else:
+            run, peak_rss = _run_and_measure(classifier, task, **kwargs)
+        if resource_store is not None:
+            resource_store.add(create_resource_record(task, classifier_name, classifier, configuration, run,
+                                                      time.time() - start, peak_rss, resource_limits is not None))
+        _record_fold_timings(run)
+        score = get_fold_scores(run, 'predictive_accuracy')
+        logging.info('Task %d - %s; Accuracy: %0.2f' % (task.task_id, task.name, score.mean()))
+        run_id, local_run_dir = _store_run(run, local_run_dir, upload_and_delete, tag, upload_queue, run_store,
+                                           task.class_labels)
+        if run_index is not None:
+            # only once the run is stored, so that failed runs are retried
+            run_index.add(task.task_id, [get_run_key(run.flow, run.model)])
+        _record_result(results_db, task.task_id, classifier_name, configuration, run=run, run_id=run_id,
+                       local_run=local_run_dir, wall_time=time.time() - start)
+        return True, run_id, local_run_dir
+    except (openml.exceptions.OpenMLServerException, openml.exceptions.OpenMLRunsExistError) as e:
+        traceback.print_exc()
+        _record_result(results_db, task.task_id, classifier_name, configuration, run=run, success=False,
+                       wall_time=time.time() - start, failure_reason='%s: %s' % (type(e).__name__, str(e)))
+        return False, None, local_run_dir
+    except RunExistsLocallyError as e:
+        logging.info(str(e))
+        _record_result(results_db, task.task_id, classifier_name, configuration, success=False,
+                       failure_reason='%s: %s' % (type(e).__name__, str(e)))
+        return False, None, None
+    except RunLimitExceededError as e:
+        logging.warning('Task %d - %s; %s' % (task.task_id, task.name, str(e)))
+        record_failure(output_dir, task.task_id, classifier, e)
+        _record_result(results_db, task.task_id, classifier_name, configuration, success=False,
+                       wall_time=e.elapsed, failure_reason='%s: %s' % (type(e).__name__, e.reason))
+        return False, None, None
+    except Exception as e:
+        # e.g., the model failed to fit; recorded, but left to the caller
+        _record_result(results_db, task.task_id, classifier_name, configuration, run=run, success=False,
+                       wall_time=time.time() - start, failure_reason='%s: %s' % (type(e).__name__, str(e)))
+        raise
+
+
 def run_bot_on_task(task_id: int,
                     configuration_space_wrapper: ConfigSpaceWrapper,
                     run_defaults: bool,
                     output_dir: str,
                     upload_and_delete: bool,
-                    tag: typing.Optional[str]=None) \
+                    tag: typing.Optional[str]=None,
+                    **kwargs) \
         -> typing.Tuple[bool, typing.Optional[int], typing.Optional[str]]:
     """
-    Runs the bot with a random configuration on an OpenML task
+    Runs the bot with a random configuration on an OpenML task (i.e., a
+    batch of a single run, see run_bot_on_task_batch)
 
     Parameters
     ----------
     task_id: int
         The OpenML task id to run the bot on
 
-    run_defaults: bool
-        If set to true, the configuration will be run with its default hyperparameter values
-
     configuration_space_wrapper: ConfigSpace.ConfigurationSpace
         The config space wrapper, that can be assembled to a config space, from which random configurations will be
         sampled
 
+    run_defaults: bool
+        If set to true, the configuration will be run with its default hyperparameter values
+
     output_dir: str
         A writable directory where the intermediate run results can be stored,
         before uploading
@@ -71,6 +235,10 @@ def run_bot_on_task(task_id: int,
     tag: str
         Only relevant when upload_and_delete is set to True. Adds the provided string as tag to the uploaded runs
 
+    kwargs: dict
+        The remaining (optional) arguments of run_bot_on_task_batch, e.g.,
+        `task_cache_directory`, `n_jobs`, `upload_queue` or `results_db`
+
     Returns
     -------
     success: bool
@@ -83,74 +251,263 @@ def run_bot_on_task(task_id: int,
 
     local_run_folder: str or None
         If the run was executed successfully and the folder was not deleted,
-        the path to the folder. None otherwise
+        the path to the folder (or the key of the run in the run store). None
+        otherwise
     """
-    local_run_dir = os.path.join(output_dir, str(task_id), str(uuid.uuid4()))
-    try:
-        # obtain task
-        task = openml.tasks.get_task(task_id)
+    return run_bot_on_task_batch(task_id, [configuration_space_wrapper], run_defaults, output_dir,
+                                 upload_and_delete, tag, **kwargs)[0]
 
-        # obtain prepared classifier
-        classifier = prepare_classifier(configuration_space_wrapper, task, run_defaults)
 
-        # invoke OpenML run
-        run = openml.runs.run_model_on_task(classifier, task)
-        score = run.get_metric_fn(sklearn.metrics.accuracy_score)
-        logging.info('Task %d - %s; Accuracy: %0.2f' % (task_id, task.get_dataset().name, score.mean()))
-        run.to_filesystem(local_run_dir, store_model=False)
-        if upload_and_delete:
-            run = run.publish()
-            shutil.rmtree(local_run_dir)
-            local_run_dir = None
-            if tag is not None:
-                run.push_tag(tag)
+def run_bot_on_task_batch(task_id: int,
+                          configuration_space_wrappers: typing.List[ConfigSpaceWrapper],
+                          run_defaults: bool,
+                          output_dir: str,
+                          upload_and_delete: bool,
+                          tag: typing.Optional[str]=None,
+                          task_cache_directory: typing.Optional[str]=None,
+                          n_jobs: int=1,
+                          backend: str='loky',
+                          upload_queue: typing.Optional[UploadQueue]=None,
+                          run_index: typing.Optional[RunIndex]=None,
+                          resource_limits: typing.Optional[ResourceLimits]=None,
+                          timing_callback: typing.Optional[typing.Callable[[typing.Dict], None]]=None,
+                          resource_store: typing.Optional[ResourceStore]=None,
+                          cost_budget: typing.Optional[CostBudget]=None,
+                          run_store: typing.Optional[RunStore]=None,
+                          results_db: typing.Optional[ResultsDatabase]=None,
+                          warm_start: typing.Optional[WarmStartSampler]=None,
+                          use_preprocessing_cache: bool=False,
+                          avoid_duplicate_runs: bool=True) \
+        -> typing.List[typing.Tuple[bool, typing.Optional[int], typing.Optional[str]]]:
+    """
+    Runs the bot with a random configuration from each of the given config
+    space wrappers on an OpenML task. The task, its data and its splits are
+    obtained only once, and shared by all runs. The wrappers do not need to
+    stem from the same classifier.
 
-        return True, run.run_id, local_run_dir
+    Parameters
+    ----------
+    task_id: int
+        The OpenML task id to run the bot on
+
+    configuration_space_wrappers: list[ConfigSpaceWrapper]
+        The config space wrappers. For each wrapper, a single configuration
+        will be sampled and executed
+
+    run_defaults: bool
+        If set to true, the configurations will be run with their default
+        hyperparameter values
+
+    output_dir: str
+        A writable directory where the intermediate run results can be stored,
+        before uploading
+
+    upload_and_delete: bool
+        If true, after a run has been executed it will be uploaded to OpenML.
+        If the uploading is correct, the local files will be deleted afterwards.
+
+    tag: str
+        Only relevant when upload_and_delete is set to True. Adds the provided string as tag to the uploaded runs
+
+    task_cache_directory: str or None
+        The directory in which the task data is cached (memory-mapped) across
+        runs. Leave to None to use the default location in the OpenML cache
+
+    n_jobs: int
+        The number of folds that are evaluated in parallel. Set to -1 to use
+        all cores
+
+    backend: str
+        The joblib backend used to evaluate the folds in parallel, e.g., `loky`
+        (processes) or `threading` (threads). With threads, the cpu times of
+        the folds are not reported
+
+    upload_queue: UploadQueue or None
+        Only relevant when upload_and_delete is set to True. If set, the run
+        is uploaded asynchronously by the upload queue (which also deletes
+        the local files afterwards), and no run id is returned
+
+    run_index: RunIndex or None
+        If set, configurations that were already executed on the task
+        according to this (local) index are skipped before fitting, and
+        successful runs are added to it once they are stored
+
+    resource_limits: ResourceLimits or None
+        If set, every run is executed in an isolated child process, with
+        the given limits on cpu time, wall clock time and memory. Runs that
+        exceed their limits are recorded in `output_dir/failures.jsonl`
+
+    timing_callback: callable or None
+        If set, the time spent in every phase of a run (obtaining the task,
+        sampling, fitting and predicting per fold, storing and uploading) is
+        recorded, and passed to this function as a dict per run, e.g.,
+        sklearnbot.timing.TimingFile. The phases of obtaining the task are
+        part of the first run on the task. Phases that are executed by
+        joblib workers (see n_jobs) or isolated child processes (see
+        resource_limits) are not recorded, only the phase that encloses them
+        (`evaluate_folds` or `run_isolated`); the fit and predict times per
+        fold are taken from the run
+
+    resource_store: ResourceStore or None
+        If set, the resources that every successful run consumed (cpu time,
+        wall clock time, peak memory and fit and predict time per fold) are
+        recorded in this store
+
+    cost_budget: CostBudget or None
+        If set, only configurations of which the predicted cost is within the
+        budget are sampled. Runs for which no such configuration is found are
+        skipped (and reported as unsuccessful)
+
+    run_store: RunStore or None
+        Only relevant when upload_and_delete is set to False. If set, the run
+        is added to this store, rather than stored as a directory in
+        `output_dir`
+
+    results_db: ResultsDatabase or None
+        If set, the outcome of every run (configuration, scores per fold,
+        timings, run id or failure reason) is recorded in this database
+
+    warm_start: WarmStartSampler or None
+        If set (and run_defaults is not set), the best configurations of the
+        most similar tasks are run first, before sampling randomly
+
+    use_preprocessing_cache: bool
+        If set to true, the preprocessing steps of the fixed pipeline are only
+        fitted once per split (and stored in the task cache), rather than for
+        every configuration. The reported run times then include the time it
+        originally took to preprocess the split (possibly in another process),
+        rather than a fresh measurement
+
+    avoid_duplicate_runs: bool
+        If set to true, runs of which the setup was already ran on the task
+        according to the server are skipped. Set to false for tasks that do
+        not exist on the server, e.g., synthetic tasks
+
+    Returns
+    -------
+    results: list[tuple(bool, int or None, str or None)]
+        For each of the config space wrappers (in order), the success flag
+        (whether the run and/or upload was successful), the run id (if
+        uploaded, the OpenML run id that was assigned to the run) and the
+        local run folder (if the run was executed successfully and the folder
+        was not deleted, the path to the folder or the key of the run in the
+        run store)
+    """
+    timings = PhaseTimings() if timing_callback is not None else None
+    try:
+        # obtain task
+        with sklearnbot.timing.recording(timings):
+            task = get_cached_task(task_id, task_cache_directory)
     except openml.exceptions.OpenMLServerException:
         traceback.print_exc()
-        return False, None, local_run_dir
-    except openml.exceptions.OpenMLRunsExistError:
-        traceback.print_exc()
-        return False, None, local_run_dir
+        return [(False, None, None) for _ in configuration_space_wrappers]
+
+    results = []
+    for configuration_space_wrapper in configuration_space_wrappers:
+        with sklearnbot.timing.recording(timings):
+            # obtain prepared classifier
+            try:
+                classifier = prepare_classifier(configuration_space_wrapper, task, run_defaults, cost_budget,
+                                                warm_start)
+            except ConfigurationOverBudgetError as e:
+                logging.warning(str(e))
+                _record_result(results_db, task_id, configuration_space_wrapper.config_space.name, None,
+                               success=False, failure_reason='%s: %s' % (type(e).__name__, str(e)))
+                results.append((False, None, None))
+                continue
+            configuration = get_configuration(configuration_space_wrapper, classifier)
+            result = _run_classifier_on_task(classifier, configuration_space_wrapper.config_space.name, task,
+                                             output_dir, upload_and_delete, tag, n_jobs, backend, upload_queue,
+                                             run_index, resource_limits, resource_store, run_store, results_db,
+                                             configuration, use_preprocessing_cache, avoid_duplicate_runs)
+        sklearnbot.timing.emit(timing_callback, timings, task_id=task_id,
+                               classifier=configuration_space_wrapper.config_space.name, success=result[0],
+                               run_id=result[1])
+        results.append(result)
+        timings = PhaseTimings() if timing_callback is not None else None
+    return results
 
 
 def run_optimizer_on_task(task_id: int,
                           configuration_space_wrapper: ConfigSpaceWrapper,
                           output_dir: str,
-                          upload_and_delete: bool) \
+                          upload_and_delete: bool,
+                          task_cache_directory: typing.Optional[str]=None,
+                          n_jobs: int=1,
+                          backend: str='loky',
+                          upload_queue: typing.Optional[UploadQueue]=None,
+                          optimizer: str='random_search',
+                          resource: str='n_samples',
+                          timing_callback: typing.Optional[typing.Callable[[typing.Dict], None]]=None,
+                          resource_store: typing.Optional[ResourceStore]=None,
+                          run_store: typing.Optional[RunStore]=None,
+                          results_db: typing.Optional[ResultsDatabase]=None,
+                          tag: typing.Optional[str]=None) \
+        -> typing.Tuple[bool, typing.Optional[int], typing.Optional[str]]:
+    if optimizer not in OPTIMIZERS:
+        raise ValueError('Optimizer not implemented: %s' % optimizer)
+    timings = PhaseTimings() if timing_callback is not None else None
+    with sklearnbot.timing.recording(timings):
+        result = _run_optimizer_on_task(task_id, configuration_space_wrapper, output_dir, upload_and_delete,
+                                        task_cache_directory, n_jobs, backend, upload_queue, optimizer, resource,
+                                        resource_store, run_store, results_db, tag)
+    sklearnbot.timing.emit(timing_callback, timings, task_id=task_id,
+                           classifier=configuration_space_wrapper.config_space.name, optimizer=optimizer,
+                           success=result[0], run_id=result[1])
+    return result
+
+
+def _run_optimizer_on_task(task_id: int, configuration_space_wrapper: ConfigSpaceWrapper, output_dir: str,
+                           upload_and_delete: bool, task_cache_directory: typing.Optional[str], n_jobs: int,
+                           backend: str, upload_queue: typing.Optional[UploadQueue], optimizer: str,
+                           resource: str, resource_store: typing.Optional[ResourceStore],
+                           run_store: typing.Optional[RunStore], results_db: typing.Optional[ResultsDatabase],
+                           tag: typing.Optional[str]) \
         -> typing.Tuple[bool, typing.Optional[int], typing.Optional[str]]:
     local_run_dir = os.path.join(output_dir, str(task_id), str(uuid.uuid4()))
+    classifier_name = configuration_space_wrapper.config_space.name
+    run, start = None, time.time()
     try:
         # obtain task
-        task = openml.tasks.get_task(task_id)
+        task = get_cached_task(task_id, task_cache_directory)
 
         configuration_space = configuration_space_wrapper.assemble()
 
-        data_name = task.get_dataset().name
-        data_qualities = task.get_dataset().qualities
-        data_tuple = (task.task_id, data_name, data_qualities['NumberOfFeatures'], data_qualities['NumberOfInstances'])
+        data_tuple = (task.task_id, task.name, task.qualities['NumberOfFeatures'], task.qualities['NumberOfInstances'])
         logging.info('Obtained task %d (%s); %s attributes; %s observations' % data_tuple)
 
-        # obtain deserialized classifier
-        nominal_indices = task.get_dataset().get_features_by_type('nominal', [task.target_name])
-        numeric_indices = task.get_dataset().get_features_by_type('numeric', [task.target_name])
-
         # obtain prepared classifier
-        optimizer = sklearnbot.sklearn.as_search_cv(configuration_space, nominal_indices, numeric_indices)
+        if optimizer == 'successive_halving':
+            search = sklearnbot.sklearn.as_successive_halving_cv(configuration_space, task.numeric_indices,
+                                                                 task.nominal_indices, resource)
+        else:
+            search = sklearnbot.sklearn.as_search_cv(configuration_space, task.numeric_indices,
+                                                     task.nominal_indices)
 
         # invoke OpenML run
-        run = openml.runs.run_model_on_task(optimizer, task)
-        score = run.get_metric_fn(sklearn.metrics.accuracy_score)
-        logging.info('Task %d - %s; Accuracy: %0.2f' % (task_id, task.get_dataset().name, score.mean()))
-        run.to_filesystem(local_run_dir, store_model=False)
-        if upload_and_delete:
-            run = run.publish()
-            shutil.rmtree(local_run_dir)
-            local_run_dir = None
-        return True, run.run_id, local_run_dir
-    except openml.exceptions.OpenMLServerException:
-        traceback.print_exc()
-        return False, None, local_run_dir
-    except openml.exceptions.OpenMLRunsExistError:
+        start = time.time()
+        run, peak_rss = _run_and_measure(search, task, n_jobs=n_jobs, backend=backend)
+        if resource_store is not None:
+            # the search does not have a single configuration
+            resource_store.add(create_resource_record(task, configuration_space_wrapper.config_space.name, search,
+                                                      {}, run, time.time() - start, peak_rss, False))
+        _record_fold_timings(run)
+        score = get_fold_scores(run, 'predictive_accuracy')
+        logging.info('Task %d - %s; Accuracy: %0.2f' % (task_id, task.name, score.mean()))
+        run_id, local_run_dir = _store_run(run, local_run_dir, upload_and_delete, tag, upload_queue, run_store,
+                                           task.class_labels)
+        _record_result(results_db, task_id, classifier_name, None, run=run, run_id=run_id, local_run=local_run_dir,
+                       wall_time=time.time() - start, optimizer=optimizer)
+        return True, run_id, local_run_dir
+    except (openml.exceptions.OpenMLServerException, openml.exceptions.OpenMLRunsExistError) as e:
         traceback.print_exc()
+        _record_result(results_db, task_id, classifier_name, None, run=run, success=False,
+                       wall_time=time.time() - start, failure_reason='%s: %s' % (type(e).__name__, str(e)),
+                       optimizer=optimizer)
         return False, None, local_run_dir
+    except Exception as e:
+        # e.g., the search failed to fit; recorded, but left to the caller
+        _record_result(results_db, task_id, classifier_name, None, run=run, success=False,
+                       wall_time=time.time() - start, failure_reason='%s: %s' % (type(e).__name__, str(e)),
+                       optimizer=optimizer)
+        raise
@@ -0,0 +1,173 @@
+import copy
+import fcntl
+import hashlib
+import logging
+import openml
+import os
+import sklearn.base
+import sklearnbot
+import typing
+
+
+class RunExistsLocallyError(Exception):
+    """
+    Raised when a configuration was already executed on a task, according to
+    the run index
+    """
+    pass
+
+
+def get_run_key(flow: openml.flows.OpenMLFlow, model: sklearn.base.BaseEstimator) -> str:
+    """
+    Returns the key of a configuration in the run index, based on the flow
+    (name and external version) and the configuration of the model.
+    Hyperparameters that are inactive are not set by the bot, and remain at
+    their default value, so equivalent configurations have the same key.
+
+    Parameters
+    ----------
+    flow: openml.flows.OpenMLFlow
+        The flow of the model
+
+    model: sklearn.BaseEstimator
+        The (untrained) model
+
+    Returns
+    -------
+    key: str
+        A hexadecimal hash
+    """
+    description = '%s|%s|%s' % (flow.name, flow.external_version,
+                                sklearnbot.sklearn.get_estimator_signature(model, include_version=False))
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+
+class RunIndex(object):
+    """
+    Local index of the configurations that were executed per task, used to
+    skip duplicate runs before any fitting. Per task, the keys (see
+    get_run_key) are stored in an append-only file. Writers hold an exclusive
+    lock on the file while appending, so that multiple processes (also on a
+    shared filesystem) can use the same index. Every process keeps the keys
+    in memory, and only reads the lines that were appended since its last
+    lookup.
+
+    Parameters
+    ----------
+    index_directory: str
+        A writable directory in which the index will be stored
+    """
+
+    def __init__(self, index_directory: str):
+        self.index_directory = index_directory
+        os.makedirs(index_directory, exist_ok=True)
+        self._keys = dict()  # type: typing.Dict[int, typing.Set[str]]
+        self._offsets = dict()  # type: typing.Dict[int, int]
+
+    def _index_file(self, task_id: int) -> str:
+        return os.path.join(self.index_directory, '%d.idx' % task_id)
+
+    def _refresh(self, task_id: int):
+        self._keys.setdefault(task_id, set())
+        self._offsets.setdefault(task_id, 0)
+        if not os.path.isfile(self._index_file(task_id)):
+            return
+        with open(self._index_file(task_id), 'rb') as fp:
+            fcntl.flock(fp, fcntl.LOCK_SH)
+            try:
+                fp.seek(self._offsets[task_id])
+                data = fp.read()
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+        # only complete lines are consumed
+        data = data[:data.rfind(b'\n') + 1]
+        self._offsets[task_id] += len(data)
+        self._keys[task_id].update(line.decode('ascii') for line in data.splitlines() if len(line) > 0)
+
+    def contains(self, task_id: int, key: str) -> bool:
+        """
+        Returns whether the configuration was executed on the task, by this
+        or any other process that uses the same index
+        """
+        if key in self._keys.get(task_id, set()):
+            return True
+        self._refresh(task_id)
+        return key in self._keys[task_id]
+
+    def add(self, task_id: int, keys: typing.Iterable[str]):
+        """
+        Records that configurations were executed on the task
+        """
+        keys = set(keys)
+        if len(keys) == 0:
+            return
+        with open(self._index_file(task_id), 'ab') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.write(''.join('%s\n' % key for key in sorted(keys)).encode('ascii'))
+                fp.flush()
+                os.fsync(fp.fileno())
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def import_published_runs(self, task_id: int, flow_id: int, batch_size: int = 500) -> int:
+        """
+        Adds the setups of all runs of a flow on a task that were published on
+        OpenML to the index. The setups are listed in bulk (in batches), and
+        instantiated from a single copy of the flow. Setups that can not be
+        instantiated by the current scikit-learn version are skipped (and
+        logged).
+
+        Parameters
+        ----------
+        task_id: int
+            The OpenML task id
+
+        flow_id: int
+            The OpenML flow id
+
+        batch_size: int
+            The number of setups that are listed per request
+
+        Returns
+        -------
+        n_imported: int
+            The number of setups that were added to the index
+        """
+        runs = openml.runs.list_runs(task=[task_id], flow=[flow_id], output_format='dataframe')
+        if len(runs) == 0:
+            return 0
+        flow = openml.flows.get_flow(flow_id)
+        setup_ids = sorted(int(setup_id) for setup_id in runs['setup_id'].unique())
+        keys = set()
+        skipped = []
+        for batch_start in range(0, len(setup_ids), batch_size):
+            setups = openml.setups.list_setups(flow=flow_id, setup=setup_ids[batch_start:batch_start + batch_size],
+                                               output_format='object')
+            for setup_id, setup in setups.items():
+                try:
+                    model = _setup_to_model(flow, setup)
+                except Exception as e:
+                    logging.warning('Could not instantiate setup %d, skipping: %s' % (setup_id, str(e)))
+                    skipped.append(setup_id)
+                    continue
+                keys.add(get_run_key(flow, model))
+        self._refresh(task_id)
+        keys -= self._keys[task_id]
+        self.add(task_id, keys)
+        logging.info('Imported %d setups of flow %d on task %d; skipped %d setups' %
+                     (len(keys), flow_id, task_id, len(skipped)))
+        return len(keys)
+
+
+def _setup_to_model(flow: openml.flows.OpenMLFlow, setup: openml.setups.OpenMLSetup) -> sklearn.base.BaseEstimator:
+    # as openml.setups.initialize_model, but without downloading the setup
+    # and flow again for every setup
+    flow = copy.deepcopy(flow)
+    structure = flow.get_structure('flow_id')
+    for hyperparameter in (setup.parameters or {}).values():
+        subflow = flow
+        if len(structure[hyperparameter.flow_id]) > 0:
+            subflow = flow.get_subflow(structure[hyperparameter.flow_id])
+        subflow.parameters[hyperparameter.parameter_name] = hyperparameter.value
+    return flow.extension.flow_to_model(flow)
@@ -0,0 +1,340 @@
+import arff
+import collections
+import fcntl
+import glob
+import json
+import logging
+import numpy as np
+import openml
+import os
+import pandas as pd
+import time
+import typing
+import uuid
+
+
+class RunStore(object):
+    """
+    Compact alternative to storing every run as a directory of XML and ARFF
+    files (`run.to_filesystem`). Runs are buffered in memory, and written per
+    task as columnar segment files (compressed npz) of many runs: the
+    predictions of all runs of a segment are stored as concatenated columns
+    (repeat, fold, sample, row id, predicted and correct class index and
+    confidences), next to the run descriptions (which contain the
+    configuration and the per fold measures and timings), flows, traces and
+    some metadata. Once a task has accumulated many segments, these are
+    compacted into a single segment. Any run can be exported back to the
+    OpenML on-disk layout (as written by `run.to_filesystem`), e.g., for
+    publishing.
+
+    Layout: `store_directory/<task_id>/<segment>.npz`. Segments are written
+    to a temporary file and renamed, under a lock per task, so that multiple
+    processes can use the same store, and compaction never removes segments
+    that are being read.
+
+    Parameters
+    ----------
+    store_directory: str
+        A writable directory in which the segments will be stored
+
+    segment_size: int
+        The number of buffered runs after which a segment is written. Runs
+        that are still buffered are lost if the process is killed. Set to 1
+        to write every run immediately
+
+    compaction_threshold: int or None
+        When a task has this number of segments after writing a segment, the
+        segments of the task are compacted. Set to None to only compact
+        explicitly (see compact)
+    """
+
+    LOCK_FILE = '.lock'
+
+    def __init__(self, store_directory: str, segment_size: int = 100,
+                 compaction_threshold: typing.Optional[int] = 16):
+        self.store_directory = store_directory
+        self.segment_size = segment_size
+        self.compaction_threshold = compaction_threshold
+        # buffered runs per task, as (run key, columns) pairs
+        self._buffer = collections.OrderedDict()  # type: typing.Dict[int, typing.List[typing.Tuple[str, typing.Dict]]]
+        self._n_buffered = 0
+        os.makedirs(store_directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _task_directory(self, task_id: int) -> str:
+        return os.path.join(self.store_directory, str(task_id))
+
+    def _lock(self, task_id: int, operation: int):
+        directory = self._task_directory(task_id)
+        os.makedirs(directory, exist_ok=True)
+        fp = open(os.path.join(directory, RunStore.LOCK_FILE), 'a')
+        fcntl.flock(fp, operation)
+        return fp
+
+    def _segment_files(self, task_id: int) -> typing.List[str]:
+        return sorted(glob.glob(os.path.join(self._task_directory(task_id), '*.npz')))
+
+    def add(self, run: openml.runs.OpenMLRun, class_labels: typing.List[str],
+            tag: typing.Optional[str] = None) -> str:
+        """
+        Adds an executed run to the store. The run is written with the next
+        segment of its task.
+
+        Parameters
+        ----------
+        run: openml.runs.OpenMLRun
+            The executed run (with predictions)
+
+        class_labels: list[str]
+            The class labels of the task, in the order of the confidences
+
+        tag: str or None
+            A tag that is recorded with the run, to be added when publishing
+
+        Returns
+        -------
+        run_key: str
+            The key of the run in the store, `<task_id>/<uuid>`
+        """
+        if run.description_text is None:
+            run.description_text = time.strftime('%c')
+        label_index = {label: idx for idx, label in enumerate(class_labels)}
+        # [repeat, fold, sample, row id, prediction, correct, *confidences]
+        data_content = run.data_content
+        confidences = np.array([row[6:] for row in data_content], dtype=np.float64)
+        columns = {
+            'repeat': np.array([row[0] for row in data_content], dtype=np.int32),
+            'fold': np.array([row[1] for row in data_content], dtype=np.int32),
+            'sample': np.array([row[2] for row in data_content], dtype=np.int32),
+            'row_id': np.array([row[3] for row in data_content], dtype=np.int64),
+            'prediction': np.array([label_index[row[4]] for row in data_content], dtype=np.int32),
+            'correct': np.array([label_index[row[5]] for row in data_content], dtype=np.int32),
+            'confidence': confidences.reshape(len(data_content), len(class_labels)),
+            'class_labels': list(class_labels),
+            'description': run._to_xml(),
+            'flow': run.flow._to_xml() if run.flow_id is None and run.flow is not None else '',
+            'trace': arff.dumps(run.trace.trace_to_arff()) if run.trace is not None else '',
+            'metadata': json.dumps({
+                'task_id': run.task_id,
+                'flow_name': run.flow_name,
+                'setup_string': run.setup_string,
+                'description_text': run.description_text,
+                'tag': tag,
+                'time': time.time(),
+                'evaluations': {measure: float(np.mean([value for repeat in folds.values()
+                                                        for value in repeat.values()]))
+                                for measure, folds in run.fold_evaluations.items()},
+            }, default=str),
+        }
+        run_key = '%d/%s' % (run.task_id, uuid.uuid4())
+        self._buffer.setdefault(run.task_id, []).append((run_key, columns))
+        self._n_buffered += 1
+        if self._n_buffered >= self.segment_size:
+            self.flush()
+        return run_key
+
+    def flush(self):
+        """
+        Writes all buffered runs, as a segment per task
+        """
+        buffer = self._buffer
+        self._buffer = collections.OrderedDict()
+        self._n_buffered = 0
+        for task_id, runs in buffer.items():
+            self._write_segment(task_id, _merge_runs(runs))
+            if self.compaction_threshold is not None \
+                    and len(self._segment_files(task_id)) >= self.compaction_threshold:
+                self.compact([task_id])
+
+    def close(self):
+        """
+        Writes all buffered runs. The store can still be used afterwards
+        """
+        self.flush()
+
+    def _write_segment(self, task_id: int, segment: typing.Dict[str, np.ndarray]):
+        segment_file = os.path.join(self._task_directory(task_id), '%d-%s.npz' % (time.time() * 1000, uuid.uuid4()))
+        with self._lock(task_id, fcntl.LOCK_SH):
+            # write and rename, so that the segment is never observed half-written
+            with open(segment_file + '.tmp', 'wb') as fp:
+                np.savez_compressed(fp, **segment)
+            os.rename(segment_file + '.tmp', segment_file)
+        logging.info('Stored %d runs in %s' % (len(segment['run_keys']), segment_file))
+
+    def compact(self, task_ids: typing.Optional[typing.List[int]] = None):
+        """
+        Merges the segments of tasks into a single segment per task.
+
+        Parameters
+        ----------
+        task_ids: list[int] or None
+            The tasks to compact. Leave to None to compact all tasks
+        """
+        if task_ids is None:
+            task_ids = self.get_task_ids()
+        for task_id in task_ids:
+            with self._lock(task_id, fcntl.LOCK_EX):
+                segment_files = self._segment_files(task_id)
+                if len(segment_files) < 2:
+                    continue
+                segment = _concatenate_segments([_load_segment(segment_file) for segment_file in segment_files])
+                compacted_file = os.path.join(self._task_directory(task_id),
+                                              '%d-%s.npz' % (time.time() * 1000, uuid.uuid4()))
+                with open(compacted_file + '.tmp', 'wb') as fp:
+                    np.savez_compressed(fp, **segment)
+                os.rename(compacted_file + '.tmp', compacted_file)
+                for segment_file in segment_files:
+                    os.remove(segment_file)
+            logging.info('Compacted %d segments of task %d (%d runs)' %
+                         (len(segment_files), task_id, len(segment['run_keys'])))
+
+    def get_task_ids(self) -> typing.List[int]:
+        """
+        Returns the ids of the tasks that have runs in the store (excluding
+        runs that are still buffered)
+        """
+        return sorted(int(name) for name in os.listdir(self.store_directory) if name.isdigit())
+
+    def _read(self, task_id: int) -> typing.List[typing.Dict[str, np.ndarray]]:
+        with self._lock(task_id, fcntl.LOCK_SH):
+            return [_load_segment(segment_file) for segment_file in self._segment_files(task_id)]
+
+    def list_runs(self, task_ids: typing.Optional[typing.List[int]] = None) -> pd.DataFrame:
+        """
+        Returns the metadata of the stored runs (excluding runs that are still
+        buffered), as a data frame with a row per run: the run key, task id,
+        flow name, setup string, tag, time and the mean of every per fold
+        measure (e.g., predictive_accuracy).
+
+        Parameters
+        ----------
+        task_ids: list[int] or None
+            If set, only runs on these tasks are included
+
+        Returns
+        -------
+        runs: pd.DataFrame
+            The metadata of the runs
+        """
+        if task_ids is None:
+            task_ids = self.get_task_ids()
+        records = []
+        for task_id in task_ids:
+            for segment in self._read(task_id):
+                for run_key, metadata in zip(segment['run_keys'], segment['metadata']):
+                    metadata = json.loads(metadata)
+                    record = collections.OrderedDict([('run_key', str(run_key))])
+                    for field in ['task_id', 'flow_name', 'setup_string', 'tag', 'time']:
+                        record[field] = metadata[field]
+                    record.update(metadata['evaluations'])
+                    records.append(record)
+        return pd.DataFrame(records)
+
+    def export(self, run_key: str, directory: str) -> str:
+        """
+        Writes a stored run to a directory in the OpenML on-disk layout, as
+        `run.to_filesystem(directory, store_model=False)` would have. The run
+        can be loaded using `openml.runs.OpenMLRun.from_filesystem(directory,
+        expect_model=False)`, and published (e.g., using an UploadQueue).
+
+        Parameters
+        ----------
+        run_key: str
+            The key of the run, as returned by add
+
+        directory: str
+            The directory to write the run to. Should not exist or be empty
+
+        Returns
+        -------
+        tag: str or None
+            The tag that was recorded with the run
+        """
+        task_id = int(run_key.split('/')[0])
+        self.flush()
+        for segment in self._read(task_id):
+            matches = np.where(segment['run_keys'] == run_key)[0]
+            if len(matches) > 0:
+                break
+        else:
+            raise KeyError('Run not in store: %s' % run_key)
+        idx = matches[0]
+        start, end = segment['offsets'][idx], segment['offsets'][idx + 1]
+        class_labels = [str(label) for label in segment['class_labels']]
+        metadata = json.loads(str(segment['metadata'][idx]))
+
+        os.makedirs(directory, exist_ok=True)
+        if len(os.listdir(directory)) > 0:
+            raise ValueError('Output directory %s should be empty' % directory)
+        data = [
+            [int(repeat), int(fold), int(sample), int(row_id), class_labels[prediction], class_labels[correct]] +
+            [float(value) for value in confidence]
+            for repeat, fold, sample, row_id, prediction, correct, confidence in zip(
+                segment['repeat'][start:end], segment['fold'][start:end], segment['sample'][start:end],
+                segment['row_id'][start:end], segment['prediction'][start:end], segment['correct'][start:end],
+                segment['confidence'][start:end])
+        ]
+        # attributes as generated by OpenMLRun._generate_arff_dict for classification tasks
+        predictions = collections.OrderedDict()
+        predictions['data'] = data
+        predictions['description'] = metadata['description_text']
+        predictions['relation'] = 'openml_task_%d_predictions' % task_id
+        predictions['attributes'] = [('repeat', 'NUMERIC'), ('fold', 'NUMERIC'), ('sample', 'NUMERIC'),
+                                     ('row_id', 'NUMERIC'), ('prediction', class_labels),
+                                     ('correct', class_labels)] + \
+                                    [('confidence.%s' % label, 'NUMERIC') for label in class_labels]
+        with open(os.path.join(directory, 'description.xml'), 'w') as fp:
+            fp.write(str(segment['description'][idx]))
+        with open(os.path.join(directory, 'predictions.arff'), 'w') as fp:
+            fp.write(arff.dumps(predictions))
+        if len(segment['flow'][idx]) > 0:
+            with open(os.path.join(directory, 'flow.xml'), 'w') as fp:
+                fp.write(str(segment['flow'][idx]))
+        if len(segment['trace'][idx]) > 0:
+            with open(os.path.join(directory, 'trace.arff'), 'w') as fp:
+                fp.write(str(segment['trace'][idx]))
+        return metadata['tag']
+
+
+def _load_segment(segment_file: str) -> typing.Dict[str, np.ndarray]:
+    with np.load(segment_file, allow_pickle=False) as segment:
+        return {name: segment[name] for name in segment.files}
+
+
+def _merge_runs(runs: typing.List[typing.Tuple[str, typing.Dict]]) -> typing.Dict[str, np.ndarray]:
+    """
+    Combines the columns of the buffered runs of a task into a segment
+    """
+    lengths = [len(columns['row_id']) for _, columns in runs]
+    segment = {
+        'run_keys': np.array([run_key for run_key, _ in runs]),
+        'offsets': np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+        'class_labels': np.array(runs[0][1]['class_labels']),
+    }
+    for name in ['description', 'flow', 'trace', 'metadata']:
+        segment[name] = np.array([columns[name] for _, columns in runs])
+    for name in ['repeat', 'fold', 'sample', 'row_id', 'prediction', 'correct', 'confidence']:
+        segment[name] = np.concatenate([columns[name] for _, columns in runs])
+    return segment
+
+
+def _concatenate_segments(segments: typing.List[typing.Dict[str, np.ndarray]]) -> typing.Dict[str, np.ndarray]:
+    """
+    Combines segments of the same task into a single segment
+    """
+    offsets = [segments[0]['offsets']]
+    for segment in segments[1:]:
+        offsets.append(segment['offsets'][1:] + offsets[-1][-1])
+    result = {
+        'offsets': np.concatenate(offsets),
+        'class_labels': segments[0]['class_labels'],
+    }
+    for name in ['run_keys', 'description', 'flow', 'trace', 'metadata', 'repeat', 'fold', 'sample', 'row_id',
+                 'prediction', 'correct', 'confidence']:
+        result[name] = np.concatenate([segment[name] for segment in segments])
+    return result
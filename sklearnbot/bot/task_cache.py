@@ -0,0 +1,432 @@
+import json
+import logging
+import numpy as np
+import openml
+import os
+import pandas as pd
+import scipy.sparse
+import shutil
+import typing
+import uuid
+
+from sklearnbot.timing import phase
+
+
+class CachedTask(object):
+    """
+    Local, memory-mapped representation of an OpenML supervised
+    classification task. Holds everything the bot needs to run a classifier
+    on the task (data, feature types, qualities and splits), so that the
+    OpenML task and dataset only have to be resolved once.
+
+    Parameters
+    ----------
+    task_id: int
+        The OpenML task id
+
+    dataset_id: int
+        The OpenML dataset id of the dataset the task is defined on
+
+    name: str
+        The name of the dataset
+
+    target_name: str
+        The name of the target attribute
+
+    class_labels: list[str]
+        The class labels, ordered as the integer encoding of y
+
+    nominal_indices: list[int]
+        The indices of the nominal attributes in X
+
+    numeric_indices: list[int]
+        The indices of the numeric attributes in X
+
+    qualities: dict
+        The data qualities as calculated by OpenML
+
+    X: np.ndarray or scipy.sparse.csr_matrix
+        The (possibly memory-mapped) feature matrix
+
+    y: np.ndarray
+        The (possibly memory-mapped) integer encoded target
+
+    split_dimensions: tuple(int, int, int)
+        The number of repeats, folds and samples of the estimation procedure
+
+    train_indices: np.ndarray
+        The concatenated train indices of all splits
+
+    train_offsets: np.ndarray
+        Offsets of the individual splits into `train_indices`
+
+    test_indices: np.ndarray
+        The concatenated test indices of all splits
+
+    test_offsets: np.ndarray
+        Offsets of the individual splits into `test_indices`
+    """
+
+    def __init__(self, task_id: int, dataset_id: int, name: str, target_name: str,
+                 class_labels: typing.List[str], nominal_indices: typing.List[int],
+                 numeric_indices: typing.List[int], qualities: typing.Dict[str, float],
+                 X: typing.Union[np.ndarray, scipy.sparse.csr_matrix], y: np.ndarray,
+                 split_dimensions: typing.Tuple[int, int, int],
+                 train_indices: np.ndarray, train_offsets: np.ndarray,
+                 test_indices: np.ndarray, test_offsets: np.ndarray):
+        self.task_id = task_id
+        self.dataset_id = dataset_id
+        self.name = name
+        self.target_name = target_name
+        self.class_labels = class_labels
+        self.nominal_indices = nominal_indices
+        self.numeric_indices = numeric_indices
+        self.qualities = qualities
+        self.X = X
+        self.y = y
+        self.split_dimensions = split_dimensions
+        self.train_indices = train_indices
+        self.train_offsets = train_offsets
+        self.test_indices = test_indices
+        self.test_offsets = test_offsets
+        # the directory of the task in the task cache, if any
+        self.directory = None  # type: typing.Optional[str]
+        self._task = None
+
+    @property
+    def task(self) -> openml.tasks.OpenMLTask:
+        """
+        The OpenML task object. Only resolved (from the OpenML cache) when
+        explicitly requested, e.g., for formatting predictions.
+        """
+        if self._task is None:
+            self._task = openml.tasks.get_task(self.task_id)
+        return self._task
+
+    def get_split_dimensions(self) -> typing.Tuple[int, int, int]:
+        return self.split_dimensions
+
+    def get_train_test_split_indices(self, fold: int = 0, repeat: int = 0, sample: int = 0) \
+            -> typing.Tuple[np.ndarray, np.ndarray]:
+        num_repeats, num_folds, num_samples = self.split_dimensions
+        if not (0 <= repeat < num_repeats and 0 <= fold < num_folds and 0 <= sample < num_samples):
+            raise ValueError('Split (repeat=%d, fold=%d, sample=%d) out of range for task %d' %
+                             (repeat, fold, sample, self.task_id))
+        split_idx = (repeat * num_folds + fold) * num_samples + sample
+        train = self.train_indices[self.train_offsets[split_idx]:self.train_offsets[split_idx + 1]]
+        test = self.test_indices[self.test_offsets[split_idx]:self.test_offsets[split_idx + 1]]
+        return train, test
+
+    def get_X_and_y(self) -> typing.Tuple[typing.Union[np.ndarray, scipy.sparse.csr_matrix], np.ndarray]:
+        return self.X, self.y
+
+    def __reduce_ex__(self, protocol):
+        if self.directory is not None and isinstance(self.y, np.memmap):
+            # other processes open the task from the task cache, rather than
+            # receiving a copy of its data
+            return _reopen_cached_task, (self.task_id, os.path.dirname(self.directory), self._task)
+        return super(CachedTask, self).__reduce_ex__(protocol)
+
+
+class TaskCache(object):
+    """
+    Persistent cache of OpenML tasks. A task is resolved through OpenML once,
+    after which its data, meta-data and splits are stored as numpy files in
+    `cache_directory/<task_id>`. Subsequent requests (also from other
+    processes) open these files as memory-mapped arrays. Within a process,
+    opened tasks are kept, so repeated requests are free.
+
+    Parameters
+    ----------
+    cache_directory: str
+        A writable directory in which the tasks will be stored
+    """
+
+    def __init__(self, cache_directory: str):
+        self.cache_directory = cache_directory
+        self._tasks = dict()  # type: typing.Dict[int, CachedTask]
+
+    def _task_directory(self, task_id: int) -> str:
+        return os.path.join(self.cache_directory, str(task_id))
+
+    def get(self, task_id: int) -> CachedTask:
+        """
+        Returns the cached task, materializing it first if it was not cached
+        on disk yet.
+
+        Parameters
+        ----------
+        task_id: int
+            The OpenML task id
+
+        Returns
+        -------
+        task: CachedTask
+            The task, with memory-mapped data and splits
+        """
+        if task_id not in self._tasks:
+            if not os.path.isfile(os.path.join(self._task_directory(task_id), 'meta.json')):
+                self._materialize(task_id)
+            with phase('load_task'):
+                self._tasks[task_id] = self._load(task_id)
+        return self._tasks[task_id]
+
+    def release(self, task_id: int):
+        """
+        Closes the opened task (if any), so that its memory-mapped data can
+        be unmapped. The task remains cached on disk.
+        """
+        self._tasks.pop(task_id, None)
+
+    def _materialize(self, task_id: int):
+        with phase('get_task'):
+            task = openml.tasks.get_task(task_id)
+        if task.class_labels is None:
+            raise ValueError('Task %d is not a classification task' % task_id)
+        with phase('parse_dataset'):
+            dataset = task.get_dataset()
+            logging.info('Materializing task %d (%s) in cache %s' % (task_id, dataset.name, self.cache_directory))
+            X, y = _to_array(*task.get_X_and_y(dataset_format='dataframe'), task.class_labels)
+        num_repeats, num_folds, num_samples = task.get_split_dimensions()
+        train_splits = []
+        test_splits = []
+        for repeat in range(num_repeats):
+            for fold in range(num_folds):
+                for sample in range(num_samples):
+                    train, test = task.get_train_test_split_indices(fold=fold, repeat=repeat, sample=sample)
+                    train_splits.append(np.asarray(train, dtype=np.int64))
+                    test_splits.append(np.asarray(test, dtype=np.int64))
+
+        meta = {
+            'task_id': task_id,
+            'dataset_id': task.dataset_id,
+            'name': dataset.name,
+            'target_name': task.target_name,
+            'class_labels': list(task.class_labels),
+            'nominal_indices': [int(i) for i in dataset.get_features_by_type('nominal', [task.target_name])],
+            'numeric_indices': [int(i) for i in dataset.get_features_by_type('numeric', [task.target_name])],
+            'qualities': dataset.qualities,
+            'split_dimensions': [num_repeats, num_folds, num_samples],
+        }
+        with phase('store_task'):
+            self.store(meta, X, y, train_splits, test_splits)
+
+    def store(self, meta: typing.Dict[str, typing.Any], X: typing.Union[np.ndarray, scipy.sparse.spmatrix],
+              y: np.ndarray, train_splits: typing.List[np.ndarray], test_splits: typing.List[np.ndarray]):
+        """
+        Stores a task in the cache. Used for tasks that are resolved through
+        OpenML, but also allows to cache tasks that are created locally.
+
+        Parameters
+        ----------
+        meta: dict
+            The meta-data of the task: task_id, dataset_id, name,
+            target_name, class_labels, nominal_indices, numeric_indices,
+            qualities and split_dimensions
+
+        X: np.ndarray or scipy.sparse.spmatrix
+            The feature matrix
+
+        y: np.ndarray
+            The integer encoded target
+
+        train_splits: list[np.ndarray]
+            The train indices per split, ordered by repeat, fold and sample
+
+        test_splits: list[np.ndarray]
+            The test indices per split, ordered by repeat, fold and sample
+        """
+        task_id = meta['task_id']
+        # write to a private directory first, and move it in place atomically,
+        # so that concurrent processes never observe a partially written task
+        os.makedirs(self.cache_directory, exist_ok=True)
+        tmp_directory = os.path.join(self.cache_directory, '.%d.%s' % (task_id, uuid.uuid4()))
+        os.makedirs(tmp_directory)
+        try:
+            save_matrix(tmp_directory, 'X', X)
+            np.save(os.path.join(tmp_directory, 'y.npy'), np.asarray(y))
+            np.save(os.path.join(tmp_directory, 'train_indices.npy'), np.concatenate(train_splits))
+            np.save(os.path.join(tmp_directory, 'train_offsets.npy'),
+                    np.cumsum([0] + [len(split) for split in train_splits]))
+            np.save(os.path.join(tmp_directory, 'test_indices.npy'), np.concatenate(test_splits))
+            np.save(os.path.join(tmp_directory, 'test_offsets.npy'),
+                    np.cumsum([0] + [len(split) for split in test_splits]))
+            with open(os.path.join(tmp_directory, 'meta.json'), 'w') as fp:
+                json.dump(meta, fp)
+            os.rename(tmp_directory, self._task_directory(task_id))
+        except OSError:
+            # another process materialized the same task in the meantime
+            if not os.path.isfile(os.path.join(self._task_directory(task_id), 'meta.json')):
+                raise
+        finally:
+            if os.path.isdir(tmp_directory):
+                shutil.rmtree(tmp_directory)
+
+    def _load(self, task_id: int) -> CachedTask:
+        task_directory = self._task_directory(task_id)
+
+        def _open(name):
+            return np.load(os.path.join(task_directory, name), mmap_mode='r')
+
+        with open(os.path.join(task_directory, 'meta.json'), 'r') as fp:
+            meta = json.load(fp)
+        task = CachedTask(task_id=meta['task_id'],
+                          dataset_id=meta['dataset_id'],
+                          name=meta['name'],
+                          target_name=meta['target_name'],
+                          class_labels=meta['class_labels'],
+                          nominal_indices=meta['nominal_indices'],
+                          numeric_indices=meta['numeric_indices'],
+                          qualities=meta['qualities'],
+                          X=load_matrix(task_directory, 'X'),
+                          y=_open('y.npy'),
+                          split_dimensions=tuple(meta['split_dimensions']),
+                          train_indices=_open('train_indices.npy'),
+                          train_offsets=_open('train_offsets.npy'),
+                          test_indices=_open('test_indices.npy'),
+                          test_offsets=_open('test_offsets.npy'))
+        task.directory = task_directory
+        return task
+
+
+def _to_array(X: pd.DataFrame, y: pd.Series, class_labels: typing.List[str]) \
+        -> typing.Tuple[typing.Union[np.ndarray, scipy.sparse.csr_matrix], np.ndarray]:
+    """
+    Converts the data of a task (in dataframe format) to the layout of the
+    task cache (as the former array format of OpenML): nominal attributes
+    are encoded as the index of their category (missing values are NaN),
+    and the target as the index of its class label.
+    """
+    if len(X.columns) > 0 and all(isinstance(dtype, pd.SparseDtype) for dtype in X.dtypes):
+        X = scipy.sparse.csr_matrix(X.sparse.to_coo(), dtype=np.float64)
+    else:
+        columns = []
+        for name in X.columns:
+            if isinstance(X[name].dtype, pd.CategoricalDtype):
+                codes = X[name].cat.codes.to_numpy().astype(np.float64)
+                codes[codes < 0] = np.nan
+                columns.append(codes)
+            else:
+                columns.append(X[name].to_numpy(dtype=np.float64, na_value=np.nan))
+        X = np.column_stack(columns) if len(columns) > 0 else np.empty((len(X), 0))
+    y = pd.Index(class_labels).get_indexer(np.asarray(y, dtype=object)).astype(np.int64)
+    if np.any(y < 0):
+        raise ValueError('Target contains missing values or values that are not a class label')
+    return X, y
+
+
+def save_matrix(directory: str, name: str, X: typing.Union[np.ndarray, scipy.sparse.spmatrix]):
+    """
+    Stores a dense or sparse matrix as numpy file(s) in a directory, so that
+    it can be opened memory-mapped using load_matrix
+    """
+    if scipy.sparse.issparse(X):
+        X = scipy.sparse.csr_matrix(X)
+        np.save(os.path.join(directory, '%s_data.npy' % name), X.data)
+        np.save(os.path.join(directory, '%s_indices.npy' % name), X.indices)
+        np.save(os.path.join(directory, '%s_indptr.npy' % name), X.indptr)
+        np.save(os.path.join(directory, '%s_shape.npy' % name), np.array(X.shape))
+    else:
+        np.save(os.path.join(directory, '%s.npy' % name), np.asarray(X))
+
+
+def load_matrix(directory: str, name: str) -> typing.Union[np.ndarray, scipy.sparse.csr_matrix]:
+    """
+    Opens a matrix that was stored using save_matrix as memory-mapped array
+    (or as sparse matrix on top of memory-mapped arrays)
+    """
+    def _open(suffix):
+        return np.load(os.path.join(directory, '%s%s.npy' % (name, suffix)), mmap_mode='r')
+
+    if os.path.isfile(os.path.join(directory, '%s_shape.npy' % name)):
+        return scipy.sparse.csr_matrix((_open('_data'), _open('_indices'), _open('_indptr')),
+                                       shape=tuple(np.load(os.path.join(directory, '%s_shape.npy' % name))),
+                                       copy=False)
+    return _open('')
+
+
+_task_caches = dict()  # type: typing.Dict[str, TaskCache]
+
+
+def get_default_cache_directory() -> str:
+    """
+    Returns the default location of the task cache, which is located in the
+    (server specific) OpenML cache directory.
+    """
+    return os.path.join(openml.config.get_cache_directory(), 'sklearnbot', 'tasks')
+
+
+def get_task_cache(cache_directory: typing.Optional[str] = None) -> TaskCache:
+    """
+    Returns the task cache of a directory, which is shared within a process
+    (e.g., by get_cached_task), so that tasks that are opened (or created
+    locally, such as synthetic tasks) are served by all of its users.
+
+    Parameters
+    ----------
+    cache_directory: str or None
+        The directory of the task cache. Leave to None to use the default
+        location in the OpenML cache directory
+
+    Returns
+    -------
+    task_cache: TaskCache
+        The task cache of the directory
+    """
+    if cache_directory is None:
+        cache_directory = get_default_cache_directory()
+    if cache_directory not in _task_caches:
+        _task_caches[cache_directory] = TaskCache(cache_directory)
+    return _task_caches[cache_directory]
+
+
+def get_cached_task(task_id: int, cache_directory: typing.Optional[str] = None) -> CachedTask:
+    """
+    Obtains a task from the persistent task cache. Caches are shared within
+    a process, so the data of a task is only opened once.
+
+    Parameters
+    ----------
+    task_id: int
+        The OpenML task id
+
+    cache_directory: str or None
+        The directory of the task cache. Leave to None to use the default
+        location in the OpenML cache directory
+
+    Returns
+    -------
+    task: CachedTask
+        The task, with memory-mapped data and splits
+    """
+    return get_task_cache(cache_directory).get(task_id)
+
+
+def _reopen_cached_task(task_id: int, cache_directory: str,
+                        task: typing.Optional[openml.tasks.OpenMLTask]) -> CachedTask:
+    # unpickles a task in another process; a resolved OpenML task is kept, as
+    # it might not exist on the server (e.g., a synthetic task)
+    cached_task = get_cached_task(task_id, cache_directory)
+    if cached_task._task is None:
+        cached_task._task = task
+    return cached_task
+
+
+def release_cached_task(task_id: int, cache_directory: typing.Optional[str] = None):
+    """
+    Closes a task that was opened using get_cached_task, e.g., to bound the
+    number of tasks that are resident in a long-lived process.
+
+    Parameters
+    ----------
+    task_id: int
+        The OpenML task id
+
+    cache_directory: str or None
+        The directory of the task cache. Leave to None to use the default
+        location in the OpenML cache directory
+    """
+    if cache_directory is None:
+        cache_directory = get_default_cache_directory()
+    if cache_directory in _task_caches:
+        _task_caches[cache_directory].release(task_id)
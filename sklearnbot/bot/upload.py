@@ -0,0 +1,517 @@
+import contextlib
+import fcntl
+import glob
+import json
+import logging
+import openml
+import os
+import queue
+import requests
+import shutil
+import socket
+import threading
+import time
+import typing
+import uuid
+import xml.parsers.expat
+import xmltodict
+
+
+# OpenML error code of a failing database connection, which is typically
+# resolved by retrying
+DATABASE_CONNECTION_ERROR = 107
+# seconds to wait for the server, before the upload is retried
+REQUEST_TIMEOUT = 300
+
+
+class UploadQueue(object):
+    """
+    Durable, asynchronous upload queue for runs that are stored on the
+    filesystem. Submitting a run only writes a small queue entry to
+    `output_dir/.upload_queue`; a pool of background threads publishes the
+    runs, tags them and deletes the local run folder and queue entry
+    afterwards. Transient failures (connection errors and server-side errors)
+    are retried with exponential backoff. Entries that can not be uploaded
+    after all retries, or that failed with an error that is not transient
+    (e.g., a run that is rejected by the server), are moved to
+    `output_dir/.upload_queue/failed`, together with the failure reason.
+    Entries that were not yet processed (e.g., because the process was
+    killed) are picked up again by the next queue on the same output
+    directory.
+
+    Multiple queues (also in different processes) can drain the same
+    directory. An entry is claimed before it is processed, by atomically
+    renaming it to `<entry>.inprogress.<hostname>.<pid>`, so that every run
+    is published by a single queue. Claims of processes that no longer exist
+    (on the same host), or that were not renewed within `claim_timeout`
+    seconds, are considered stale and are released by the next queue. There
+    is at most one entry per run folder, so a run that is already queued (or
+    failed) is not submitted again.
+
+    The runs are published to the server that is configured in
+    `openml.config.server`, which can also point to a local stand-in server.
+    Every thread posts the stored files of the runs over its own pooled HTTP
+    session, so that consecutive uploads reuse their connection (openml opens
+    a new session for every request). Runs of which the flow is not yet on
+    the server are published through openml, which publishes the flow first.
+
+    Parameters
+    ----------
+    output_dir: str
+        The directory in which the bot stores its runs. The queue is stored
+        in a subdirectory of it
+
+    n_threads: int
+        The number of concurrent uploads (and HTTP sessions)
+
+    max_retries: int
+        The number of times a failing upload is retried
+
+    backoff_factor: float
+        Seconds to wait before the first retry. Doubles after every retry
+
+    claim_timeout: float
+        The number of seconds after which a claim of another host (or of a
+        process that was replaced under the same process id) is considered
+        stale. Claims are renewed before every upload attempt
+    """
+
+    QUEUE_DIRECTORY = '.upload_queue'
+    FAILED_DIRECTORY = 'failed'
+    # guards the submission and claiming of entries
+    LOCK_FILE = '.lock'
+    # infix of claimed entries, followed by the hostname and process id of the claiming queue
+    CLAIM_INFIX = '.inprogress.'
+    # written to run folders that were published, but not deleted
+    PUBLISHED_FILE = 'published.json'
+
+    def __init__(self, output_dir: str, n_threads: int = 4, max_retries: int = 5, backoff_factor: float = 1.0,
+                 claim_timeout: float = 3600.0):
+        self.queue_directory = os.path.join(output_dir, UploadQueue.QUEUE_DIRECTORY)
+        self.failed_directory = os.path.join(self.queue_directory, UploadQueue.FAILED_DIRECTORY)
+        os.makedirs(self.failed_directory, exist_ok=True)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.claim_timeout = claim_timeout
+        self.n_uploaded = 0
+        self.n_failed = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()  # type: queue.Queue
+
+        # pick up entries that were left behind by a previous queue
+        with self._queue_lock():
+            for claim_file in glob.glob(os.path.join(self.queue_directory, '*.json%s*' % UploadQueue.CLAIM_INFIX)):
+                # claimed entries are rewritten through a temporary file
+                if not claim_file.endswith('.tmp') and _is_stale_claim(claim_file, claim_timeout):
+                    logging.info('Releasing stale claim %s' % claim_file)
+                    entry_file = claim_file.rsplit(UploadQueue.CLAIM_INFIX, 1)[0]
+                    try:
+                        os.rename(claim_file, entry_file)
+                    except FileNotFoundError:
+                        # released (or completed) by another queue in the meantime
+                        continue
+        for entry_file in sorted(glob.glob(os.path.join(self.queue_directory, '*.json'))):
+            self._queue.put(entry_file)
+        if self._queue.qsize() > 0:
+            logging.info('Resuming %d pending uploads from %s' % (self._queue.qsize(), self.queue_directory))
+
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(n_threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @contextlib.contextmanager
+    def _queue_lock(self):
+        # exclusive across threads and processes (flock is per open file)
+        with open(os.path.join(self.queue_directory, UploadQueue.LOCK_FILE), 'a') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            yield
+
+    def _is_queued(self, entry_file: str) -> bool:
+        return os.path.exists(entry_file) or \
+            len(glob.glob(entry_file + UploadQueue.CLAIM_INFIX + '*')) > 0 or \
+            os.path.exists(os.path.join(self.failed_directory, os.path.basename(entry_file)))
+
+    def submit(self, local_run_dir: str, tag: typing.Optional[str] = None, delete: bool = True) -> bool:
+        """
+        Schedules a run that was stored on the filesystem for uploading. The
+        queue takes ownership of the run folder, which will be deleted after
+        a successful upload. A run folder that is already queued (by any
+        queue on the same directory, or as failed entry) is not submitted
+        again.
+
+        Parameters
+        ----------
+        local_run_dir: str
+            The folder in which the run was stored (using `to_filesystem`)
+
+        tag: str or None
+            If not None, this tag will be added to the uploaded run
+
+        delete: bool
+            If set to false, the run folder is kept after a successful upload,
+            and marked as published (see PUBLISHED_FILE)
+
+        Returns
+        -------
+        submitted: bool
+            Whether the run was submitted, i.e., was not queued yet
+        """
+        entry = {'local_run_dir': os.path.abspath(local_run_dir), 'tag': tag, 'run_id': None, 'delete': delete}
+        # a single entry per run folder
+        entry_file = os.path.join(self.queue_directory, '%s.json' %
+                                  uuid.uuid5(uuid.NAMESPACE_URL, entry['local_run_dir']))
+        with self._queue_lock():
+            if self._is_queued(entry_file):
+                return False
+            _write_entry(entry, entry_file)
+        self._queue.put(entry_file)
+        return True
+
+    def pending(self) -> int:
+        """
+        Returns the number of runs that were not processed yet
+        """
+        return self._queue.unfinished_tasks
+
+    def get_queued_run_dirs(self) -> typing.Set[str]:
+        """
+        Returns the (absolute) run folders of all entries on disk, including
+        the claimed and failed entries
+        """
+        entry_files = glob.glob(os.path.join(self.queue_directory, '*.json')) + \
+            [claim_file for claim_file in glob.glob(os.path.join(self.queue_directory,
+                                                                 '*.json%s*' % UploadQueue.CLAIM_INFIX))
+             if not claim_file.endswith('.tmp')] + \
+            glob.glob(os.path.join(self.failed_directory, '*.json'))
+        run_dirs = set()
+        for entry_file in entry_files:
+            try:
+                with open(entry_file, 'r') as fp:
+                    run_dirs.add(json.load(fp)['local_run_dir'])
+            except (IOError, OSError, ValueError):
+                # processed (and removed) in the meantime
+                continue
+        return run_dirs
+
+    def close(self, wait: bool = True):
+        """
+        Stops the upload threads. Entries that were not uploaded remain on
+        disk, and will be picked up by the next queue on the same directory.
+
+        Parameters
+        ----------
+        wait: bool
+            If true, blocks until all submitted runs have been processed
+        """
+        if wait:
+            self._queue.join()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        logging.info('Upload queue closed. Uploaded: %d; failed: %d; pending: %d' %
+                     (self.n_uploaded, self.n_failed, len(glob.glob(os.path.join(self.queue_directory, '*.json')))))
+
+    def _worker(self):
+        with requests.Session() as session:
+            while True:
+                entry_file = self._queue.get()
+                try:
+                    if entry_file is None:
+                        return
+                    self._process(entry_file, session)
+                except Exception:
+                    # the entry was moved to the failed entries (see _process)
+                    logging.exception('Unexpected error while uploading %s' % entry_file)
+                finally:
+                    self._queue.task_done()
+
+    def _claim(self, entry_file: str) -> typing.Optional[str]:
+        """
+        Claims an entry by renaming it. Returns the claimed file, or None if
+        the entry was claimed (or processed) by another queue.
+        """
+        claim_file = '%s%s%s.%d' % (entry_file, UploadQueue.CLAIM_INFIX, socket.gethostname(), os.getpid())
+        with self._queue_lock():
+            try:
+                os.rename(entry_file, claim_file)
+            except FileNotFoundError:
+                return None
+        # the claim is renewed by touching it
+        os.utime(claim_file)
+        return claim_file
+
+    def _process(self, entry_file: str, session: requests.Session):
+        claim_file = self._claim(entry_file)
+        if claim_file is None:
+            logging.info('Skipping %s, as it was claimed by another queue' % entry_file)
+            return
+        try:
+            self._process_claimed(entry_file, claim_file, session)
+        except Exception as e:
+            if os.path.exists(claim_file):
+                # not released, as every next queue would fail on it again
+                self._move_to_failed(entry_file, claim_file, '%s: %s' % (type(e).__name__, str(e)))
+            raise
+
+    def _move_to_failed(self, entry_file: str, claim_file: str, failure_reason: str):
+        try:
+            with open(claim_file, 'r') as fp:
+                entry = json.load(fp)
+            entry['failure_reason'] = failure_reason
+            _write_entry(entry, claim_file)
+        except ValueError:
+            # an unreadable entry, which is moved as is
+            pass
+        shutil.move(claim_file, os.path.join(self.failed_directory, os.path.basename(entry_file)))
+        with self._lock:
+            self.n_failed += 1
+        logging.warning('Giving up on uploading %s: %s' % (entry_file, failure_reason))
+
+    def _process_claimed(self, entry_file: str, claim_file: str, session: requests.Session):
+        with open(claim_file, 'r') as fp:
+            entry = json.load(fp)
+        if entry.get('run_id') is None and (not os.path.isdir(entry['local_run_dir']) or os.path.exists(
+                os.path.join(entry['local_run_dir'], UploadQueue.PUBLISHED_FILE))):
+            # published by another queue, after this entry was submitted
+            logging.info('Run %s was already published' % entry['local_run_dir'])
+            os.remove(claim_file)
+            return
+        for attempt in range(self.max_retries + 1):
+            try:
+                os.utime(claim_file)
+                _publish_entry(entry, claim_file, session)
+                os.remove(claim_file)
+                with self._lock:
+                    self.n_uploaded += 1
+                logging.info('Uploaded run %d from %s' % (entry['run_id'], entry['local_run_dir']))
+                return
+            except openml.exceptions.OpenMLServerException as e:
+                # rejected by the server, which does not change by retrying
+                self._move_to_failed(entry_file, claim_file, '%s: %s' % (type(e).__name__, str(e)))
+                return
+            except requests.exceptions.RequestException as e:
+                logging.warning('Upload of %s failed (attempt %d/%d): %s' %
+                                (entry['local_run_dir'], attempt + 1, self.max_retries + 1, str(e)))
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff_factor * 2 ** attempt)
+                else:
+                    self._move_to_failed(entry_file, claim_file, '%s: %s' % (type(e).__name__, str(e)))
+
+
+def _write_entry(entry: typing.Dict, entry_file: str):
+    # write and rename, so that the entry is never observed half-written
+    with open(entry_file + '.tmp', 'w') as fp:
+        json.dump(entry, fp)
+    os.rename(entry_file + '.tmp', entry_file)
+
+
+def _is_stale_claim(claim_file: str, claim_timeout: float) -> bool:
+    hostname, pid = claim_file.rsplit(UploadQueue.CLAIM_INFIX, 1)[1].rsplit('.', 1)
+    try:
+        if time.time() - os.path.getmtime(claim_file) > claim_timeout:
+            return True
+    except FileNotFoundError:
+        return False
+    if hostname != socket.gethostname():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        # a process of another user
+        return False
+    return False
+
+
+def _post(session: requests.Session, call: str, data: typing.Optional[typing.Dict] = None,
+          files: typing.Optional[typing.Dict] = None) -> typing.Dict:
+    """
+    Posts to an endpoint of the configured server, and returns the parsed
+    response. Server-side errors (which typically are resolved by retrying)
+    are raised as requests.exceptions.HTTPError, other errors as
+    openml.exceptions.OpenMLServerException.
+    """
+    url = '%s/%s' % (openml.config.server.rstrip('/'), call)
+    data = dict(data if data is not None else {}, api_key=openml.config.apikey)
+    response = session.post(url, data=data, files=files, timeout=REQUEST_TIMEOUT)
+    if response.status_code != 200:
+        try:
+            error = xmltodict.parse(response.text)['oml:error']
+            code, message = int(error['oml:code']), error['oml:message']
+        except (xml.parsers.expat.ExpatError, KeyError, TypeError, ValueError):
+            code, message = None, response.text
+        if response.status_code >= 500 or code == DATABASE_CONNECTION_ERROR:
+            raise requests.exceptions.HTTPError('%d error for %s: %s' % (response.status_code, url, message),
+                                                response=response)
+        raise openml.exceptions.OpenMLServerException(message, code, url)
+    return xmltodict.parse(response.text)
+
+
+def _publish_entry(entry: typing.Dict, entry_file: str, session: requests.Session):
+    """
+    Publishes the run of a queue entry, adds the tag and deletes the run
+    folder (or marks it as published). The run id is recorded in the entry
+    as soon as the run is published, so that a retry (e.g., after a failure
+    to tag) never publishes the same run twice.
+    """
+    if entry.get('run_id') is None:
+        if os.path.exists(os.path.join(entry['local_run_dir'], 'flow.xml')):
+            # the flow is not on the server yet
+            run = openml.runs.OpenMLRun.from_filesystem(entry['local_run_dir'], expect_model=False)
+            entry['run_id'] = run.publish().run_id
+        else:
+            # the stored files are the ones that openml would upload
+            files = dict()
+            for name, file_name in [('description', 'description.xml'), ('predictions', 'predictions.arff'),
+                                    ('trace', 'trace.arff')]:
+                path = os.path.join(entry['local_run_dir'], file_name)
+                if os.path.exists(path):
+                    with open(path, 'r') as fp:
+                        files[name] = (file_name, fp.read())
+            entry['run_id'] = int(_post(session, 'run/', files=files)['oml:upload_run']['oml:run_id'])
+        _write_entry(entry, entry_file)
+    if entry['tag'] is not None:
+        _post(session, 'run/tag', {'run_id': entry['run_id'], 'tag': entry['tag']})
+    if entry.get('delete', True):
+        shutil.rmtree(entry['local_run_dir'], ignore_errors=True)
+    else:
+        _write_entry({'run_id': entry['run_id'], 'tag': entry['tag']},
+                     os.path.join(entry['local_run_dir'], UploadQueue.PUBLISHED_FILE))
+
+
+def find_stored_runs(output_dir: str, min_age: float = 60.0) -> typing.List[str]:
+    """
+    Returns the (absolute) folders below a directory that contain a run that
+    was stored on the filesystem (using `to_filesystem`) and was not yet
+    published. Hidden directories (such as the upload queue) are skipped.
+
+    Parameters
+    ----------
+    output_dir: str
+        The directory to scan, e.g., the output directory of the bot
+
+    min_age: float
+        Folders that were modified less than this number of seconds ago are
+        skipped, as the bot might still be writing to them
+
+    Returns
+    -------
+    run_dirs: list[str]
+        The run folders, in sorted order
+    """
+    run_dirs = []
+    now = time.time()
+    for directory, subdirectories, files in os.walk(os.path.abspath(output_dir)):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith('.'))
+        if 'description.xml' not in files or 'predictions.arff' not in files:
+            continue
+        subdirectories[:] = []
+        if UploadQueue.PUBLISHED_FILE in files:
+            continue
+        if now - os.path.getmtime(os.path.join(directory, 'predictions.arff')) < min_age:
+            continue
+        run_dirs.append(directory)
+    return run_dirs
+
+
+def publish_stored_runs(output_dir: str, tag: typing.Optional[str] = None, n_threads: int = 8,
+                        delete: bool = True, retry_failed: bool = False, max_retries: int = 5,
+                        backoff_factor: float = 1.0, report_interval: float = 30.0,
+                        min_age: float = 60.0) -> typing.Tuple[int, int]:
+    """
+    Publishes all runs that are stored on the filesystem below a directory
+    (e.g., by the bot with upload_and_delete set to False), using a bounded
+    number of concurrent uploads. The runs are submitted to the (durable)
+    upload queue of the directory, so that an interrupted invocation can be
+    resumed by invoking it again: runs that are already in the queue are not
+    submitted twice, and runs that were published are either deleted or
+    marked as published. Concurrent invocations on the same directory (also
+    next to the bot) are safe, as every queue entry is claimed before it is
+    published (see UploadQueue). Progress (throughput and failures) is logged while
+    uploading.
+
+    Parameters
+    ----------
+    output_dir: str
+        The directory that contains the runs. The upload queue is stored in a
+        subdirectory of it
+
+    tag: str or None
+        If not None, this tag will be added to the uploaded runs
+
+    n_threads: int
+        The number of concurrent uploads (and connections to the server)
+
+    delete: bool
+        If set to true, run folders are deleted after a successful upload.
+        Otherwise, they are marked as published, and skipped by subsequent
+        invocations
+
+    retry_failed: bool
+        If set to true, runs that failed to upload in a previous invocation
+        are retried. Otherwise, they are skipped
+
+    max_retries: int
+        The number of times a failing upload is retried
+
+    backoff_factor: float
+        Seconds to wait before the first retry. Doubles after every retry
+
+    report_interval: float
+        The number of seconds between progress reports
+
+    min_age: float
+        Run folders that were modified less than this number of seconds ago
+        are skipped, as the bot might still be writing to them
+
+    Returns
+    -------
+    n_uploaded: int
+        The number of runs that were published (including resumed ones)
+
+    n_failed: int
+        The number of runs that could not be published
+    """
+    failed_directory = os.path.join(output_dir, UploadQueue.QUEUE_DIRECTORY, UploadQueue.FAILED_DIRECTORY)
+    if retry_failed and os.path.isdir(failed_directory):
+        for entry_file in glob.glob(os.path.join(failed_directory, '*.json')):
+            try:
+                os.rename(entry_file, os.path.join(os.path.dirname(failed_directory), os.path.basename(entry_file)))
+            except FileNotFoundError:
+                # moved by a concurrent invocation
+                continue
+
+    start = time.time()
+    upload_queue = UploadQueue(output_dir, n_threads, max_retries, backoff_factor)
+    try:
+        n_resumed = upload_queue.pending()
+        # runs that are already queued (also by a concurrent invocation) are not submitted
+        n_submitted = sum(upload_queue.submit(run_dir, tag, delete)
+                          for run_dir in find_stored_runs(output_dir, min_age))
+        logging.info('Publishing %d stored runs from %s (%d resumed)' % (n_submitted, output_dir, n_resumed))
+
+        next_report = start + report_interval
+        while upload_queue.pending() > 0:
+            time.sleep(min(report_interval, 1.0))
+            if time.time() >= next_report:
+                _report_progress(upload_queue, start)
+                next_report += report_interval
+    finally:
+        upload_queue.close()
+    _report_progress(upload_queue, start)
+    return upload_queue.n_uploaded, upload_queue.n_failed
+
+
+def _report_progress(upload_queue: UploadQueue, start: float):
+    elapsed = time.time() - start
+    logging.info('Uploaded: %d; failed: %d; pending: %d; %0.1f runs per minute' %
+                 (upload_queue.n_uploaded, upload_queue.n_failed, upload_queue.pending(),
+                  upload_queue.n_uploaded / max(elapsed, 1e-6) * 60))
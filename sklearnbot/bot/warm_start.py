@@ -0,0 +1,242 @@
+import ConfigSpace
+import collections
+import json
+import logging
+import numpy as np
+import os
+import pandas as pd
+import sklearn.neighbors
+import typing
+import warnings
+
+from sklearnbot.config_spaces import ConfigSpaceWrapper
+from sklearnbot.config_spaces.sampling import _get_choices, _is_categorical, _is_constant
+
+
+# the meta-features (data qualities) by which tasks are compared
+META_FEATURES = ['NumberOfInstances', 'NumberOfFeatures', 'NumberOfClasses', 'NumberOfSymbolicFeatures']
+
+
+def _decode_value(hyperparameter, value) -> typing.Any:
+    """
+    Converts a value of a hyperparameter as stored in a results file (e.g.,
+    a string in a csv file) to a value of the configuration space. Returns
+    None if the value is missing (inactive) or not in the configuration space.
+    """
+    if _is_constant(hyperparameter):
+        return hyperparameter.value
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if _is_categorical(hyperparameter):
+        for choice in _get_choices(hyperparameter):
+            if choice == value or str(choice) == str(value):
+                return choice
+        return None
+    if isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformIntegerHyperparameter):
+        value = int(round(float(value)))
+    else:
+        value = float(value)
+    return value if hyperparameter.lower <= value <= hyperparameter.upper else None
+
+
+def load_results_frame(path: str) -> pd.DataFrame:
+    """
+    Loads a results meta-dataset, as created by `examples/obtain_results.py`
+    (arff, csv, feather or parquet, by extension)
+    """
+    extension = os.path.splitext(path)[1][1:]
+    if extension == 'csv':
+        return pd.read_csv(path)
+    if extension == 'arff':
+        import arff
+        with open(path, 'r') as fp:
+            dataset = arff.load(fp)
+        return pd.DataFrame(dataset['data'], columns=[name for name, _ in dataset['attributes']])
+    # feather and parquet files are written by sklearnbot.results.ResultsWriter
+    from sklearnbot.results.export import read_results
+    return read_results(path)[0].to_pandas()
+
+
+class WarmStartSampler(object):
+    """
+    Proposes the configurations that performed best on the most similar
+    tasks first, before the bot falls back to random sampling. Tasks are
+    compared by their meta-features (data qualities), which are log-scaled
+    and standardized. The results meta-dataset (a row per run, with the task
+    id, the hyperparameters, the performance measure and the meta-features,
+    as created by `examples/obtain_results.py --meta_features`) is reduced to
+    the best configurations per task, and a nearest neighbour index over the
+    tasks is built once, so that a proposal is a single (cached) lookup.
+
+    The proposals for a task are interleaved over the nearest tasks (the best
+    configuration of each of them, then the second best, etc.), excluding
+    the task itself. Proposed configurations are remembered per process; use
+    a RunIndex to skip configurations that were executed by other processes.
+
+    Parameters
+    ----------
+    configuration_space_wrapper: ConfigSpaceWrapper
+        The configuration space of which configurations are proposed.
+        Hyperparameters are matched by name, regardless of whether the
+        results were obtained in the fixed pipeline or not. Likewise, the
+        proposals are named after the configuration space passed to
+        `propose`, which may or may not be wrapped in the fixed pipeline
+
+    results: pd.DataFrame
+        The results meta-dataset of the configuration space
+
+    measure: str
+        The performance measure (higher is better), e.g., predictive_accuracy
+
+    meta_features: list[str] or None
+        The meta-features by which tasks are compared. Leave to None to use
+        META_FEATURES
+
+    n_neighbours: int
+        The number of nearest tasks of which configurations are proposed
+
+    n_configurations: int
+        The number of best configurations per nearest task that are proposed
+    """
+
+    def __init__(self, configuration_space_wrapper: ConfigSpaceWrapper, results: pd.DataFrame,
+                 measure: str = 'predictive_accuracy', meta_features: typing.Optional[typing.List[str]] = None,
+                 n_neighbours: int = 5, n_configurations: int = 5):
+        self.classifier = configuration_space_wrapper.config_space.name
+        self.meta_features = meta_features if meta_features is not None else META_FEATURES
+        self.n_neighbours = n_neighbours
+        missing = [name for name in [measure, 'task_id'] + self.meta_features if name not in results.columns]
+        if len(missing) > 0:
+            raise ValueError('Results of %s lack columns: %s' % (self.classifier, missing))
+
+        # hyperparameters are matched by name, without the prefix of the fixed pipeline
+        self._prefix = '%s__' % self.classifier.rsplit('.', 1)[-1].lower()
+        columns = {self._strip(name): name for name in results.columns}
+        self._hyperparameters = []  # type: typing.List[typing.Tuple[typing.Any, str]]
+        for hyperparameter in configuration_space_wrapper.hyperparameters:
+            name = self._strip(hyperparameter.name)
+            if name in columns:
+                self._hyperparameters.append((hyperparameter, columns[name]))
+            elif _is_constant(hyperparameter):
+                self._hyperparameters.append((hyperparameter, None))
+            else:
+                logging.warning('Hyperparameter %s not in results of %s' % (hyperparameter.name, self.classifier))
+
+        # the best configurations per task, averaged over repeated runs (or folds)
+        parameter_columns = [column for _, column in self._hyperparameters if column is not None]
+        scores = results.groupby(['task_id'] + parameter_columns, dropna=False)[measure].mean().reset_index()
+        scores = scores.sort_values(['task_id', measure], ascending=[True, False])
+        self._configurations = collections.defaultdict(list)  # type: typing.Dict[int, typing.List[typing.Dict]]
+        for row in scores.itertuples(index=False):
+            task_configurations = self._configurations[int(row[0])]
+            if len(task_configurations) < n_configurations:
+                configuration = self._decode(dict(zip(parameter_columns, row[1:])))
+                if configuration is not None:
+                    task_configurations.append(configuration)
+
+        # the index over the (encoded) meta-features of the tasks
+        qualities = results.groupby('task_id')[self.meta_features].first()
+        qualities = qualities[qualities.index.isin([task_id for task_id, configurations
+                                                    in self._configurations.items() if len(configurations) > 0])]
+        self._task_ids = [int(task_id) for task_id in qualities.index]
+        if len(self._task_ids) == 0:
+            raise ValueError('No results of %s' % self.classifier)
+        values = qualities.values.astype(float)
+        X = np.log1p(np.where(values < 0, np.nan, values))
+        with warnings.catch_warnings():
+            # meta-features that are missing for all tasks are ignored
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self._mean = np.nanmean(X, axis=0)
+            std = np.nanstd(X, axis=0)
+        self._std = np.where(np.isnan(std) | (std == 0), 1.0, std)
+        self._index = sklearn.neighbors.NearestNeighbors(n_neighbors=min(n_neighbours + 1, len(self._task_ids)))
+        self._index.fit(self._encode_qualities(values))
+        self._proposals = dict()  # type: typing.Dict[int, typing.Deque[typing.Dict[str, typing.Any]]]
+        logging.info('Warm start index of %s over %d tasks' % (self.classifier, len(self._task_ids)))
+
+    def _strip(self, name: str) -> str:
+        return name[len(self._prefix):] if name.startswith(self._prefix) else name
+
+    def _decode(self, values: typing.Dict[str, typing.Any]) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        configuration = dict()
+        for hyperparameter, column in self._hyperparameters:
+            raw_value = values[column] if column is not None else None
+            value = _decode_value(hyperparameter, raw_value)
+            if value is None and not pd.isnull(raw_value):
+                # not within the configuration space
+                return None
+            if value is not None:
+                # named without prefix, see propose
+                configuration[self._strip(hyperparameter.name)] = value
+        return configuration
+
+    def _encode_qualities(self, values: np.ndarray) -> np.ndarray:
+        # missing meta-features (also the placeholder of obtain_results) are imputed by the mean
+        values = np.where(values < 0, np.nan, values)
+        X = (np.log1p(values) - self._mean) / self._std
+        return np.where(np.isnan(X), 0.0, X)
+
+    def _get_proposals(self, task_id: int, qualities: typing.Dict[str, float]) \
+            -> typing.Deque[typing.Dict[str, typing.Any]]:
+        values = np.array([[qualities.get(name, np.nan) for name in self.meta_features]], dtype=float)
+        _, indices = self._index.kneighbors(self._encode_qualities(values))
+        neighbours = [self._task_ids[index] for index in indices[0] if self._task_ids[index] != task_id]
+        neighbours = neighbours[:self.n_neighbours]
+        logging.info('Nearest tasks of task %d: %s' % (task_id, neighbours))
+        proposals, seen = collections.deque(), set()
+        for rank in range(max([len(self._configurations[neighbour]) for neighbour in neighbours], default=0)):
+            for neighbour in neighbours:
+                if rank < len(self._configurations[neighbour]):
+                    configuration = self._configurations[neighbour][rank]
+                    key = json.dumps(configuration, sort_keys=True, default=str)
+                    if key not in seen:
+                        seen.add(key)
+                        proposals.append(configuration)
+        return proposals
+
+    def propose(self, configuration_space_wrapper: ConfigSpaceWrapper, task_id: int,
+                qualities: typing.Dict[str, float]) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """
+        Returns the next configuration to run on a task, or None once all
+        proposals for the task were made (or if the configuration space is
+        not the one of the sampler), after which the caller should sample
+        randomly. The hyperparameters are named after the given
+        configuration space, with the prefix of the fixed pipeline if it
+        is wrapped in it.
+
+        Parameters
+        ----------
+        configuration_space_wrapper: ConfigSpaceWrapper
+            The configuration space to propose a configuration of
+
+        task_id: int
+            The OpenML task id
+
+        qualities: dict
+            The data qualities of the task (at least the meta-features)
+
+        Returns
+        -------
+        configuration: dict or None
+            The configuration, as accepted by `set_params`
+        """
+        if configuration_space_wrapper.config_space.name != self.classifier:
+            return None
+        if task_id not in self._proposals:
+            self._proposals[task_id] = self._get_proposals(task_id, qualities)
+        if len(self._proposals[task_id]) == 0:
+            return None
+        # the proposals are named without prefix, regardless of the pipeline
+        names = {self._strip(hyperparameter.name): hyperparameter.name
+                 for hyperparameter in configuration_space_wrapper.hyperparameters}
+        configuration = self._proposals[task_id].popleft()
+        return {names[name]: value for name, value in configuration.items() if name in names}
+
+    @staticmethod
+    def from_file(configuration_space_wrapper: ConfigSpaceWrapper, path: str, **kwargs) -> 'WarmStartSampler':
+        """
+        Creates a sampler from a results meta-dataset file (with
+        meta-features), see load_results_frame. The keyword arguments are
+        passed to the constructor.
+        """
+        return WarmStartSampler(configuration_space_wrapper, load_results_frame(path), **kwargs)
@@ -1,13 +1,22 @@
-from sklearnbot.config_spaces.config_space_wrapper import ConfigSpaceWrapper
-# contents of this library should be moved to other library
-import sklearnbot.config_spaces.adaboost
-import sklearnbot.config_spaces.bernoulli_nb
-import sklearnbot.config_spaces.decision_tree
-import sklearnbot.config_spaces.extra_trees
-import sklearnbot.config_spaces.gradient_boosting
-import sklearnbot.config_spaces.knn
-import sklearnbot.config_spaces.neural_network
-import sklearnbot.config_spaces.random_forest
-import sklearnbot.config_spaces.sgd
-import sklearnbot.config_spaces.svc
-from .bootstrap import get_available_config_spaces, get_config_space
\ No newline at end of file
+import importlib
+
+from .bootstrap import get_available_config_spaces, get_config_space
+
+# the configuration space wrapper (ConfigSpace) and the individual
+# configuration spaces are imported upon first access
+_LAZY_ATTRIBUTES = {
+    'ConfigSpaceWrapper': 'sklearnbot.config_spaces.config_space_wrapper',
+    'ConfigurationBatch': 'sklearnbot.config_spaces.sampling',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    if name in get_available_config_spaces(False):
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRIBUTES.keys()) + get_available_config_spaces(False))
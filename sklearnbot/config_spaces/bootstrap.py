@@ -1,8 +1,9 @@
+import importlib
 import random
-import sklearnbot
 import typing
 
-from sklearnbot.config_spaces import ConfigSpaceWrapper
+if typing.TYPE_CHECKING:
+    from sklearnbot.config_spaces import ConfigSpaceWrapper
 
 ALL_WILDCARD_NAME = 'all'
 
@@ -39,9 +40,10 @@ def get_available_config_spaces(allow_all: bool):
     return config_spaces
 
 
-def get_config_space(classifier_name: str, seed: typing.Optional[int]) -> ConfigSpaceWrapper:
+def get_config_space(classifier_name: str, seed: typing.Optional[int]) -> 'ConfigSpaceWrapper':
     """
     Maps string names to a stored instantiation of the configuration space.
+    Only the module of the requested configuration space is imported.
 
     Parameters
     ----------
@@ -61,4 +63,5 @@ def get_config_space(classifier_name: str, seed: typing.Optional[int]) -> Config
         classifier_name = random.choice(get_available_config_spaces(False))
     if classifier_name not in get_available_config_spaces(False):
         raise ValueError('Classifier search space not implemented: %s' % classifier_name)
-    return getattr(sklearnbot.config_spaces, classifier_name).get_hyperparameter_search_space(seed)
+    module = importlib.import_module('sklearnbot.config_spaces.%s' % classifier_name)
+    return module.get_hyperparameter_search_space(seed)
@@ -1,7 +1,11 @@
 import ConfigSpace
 import copy
+import numpy as np
 import typing
 
+from sklearnbot.config_spaces.sampling import ConfigurationBatch, sample_configurations
+from sklearnbot.timing import phase
+
 
 class ConfigSpaceWrapper(object):
 
@@ -23,12 +27,45 @@ class ConfigSpaceWrapper(object):
         self.conditions = None
 
     def assemble(self) -> ConfigSpace.ConfigurationSpace:
-        config_space = copy.deepcopy(self.config_space)
-        config_space.add_hyperparameters(self.hyperparameters)
-        if self.conditions is not None:
-            config_space.add_conditions(self.conditions)
+        with phase('assemble'):
+            config_space = copy.deepcopy(self.config_space)
+            config_space.add_hyperparameters(self.hyperparameters)
+            if self.conditions is not None:
+                config_space.add_conditions(self.conditions)
         return config_space
 
+    def sample_configurations(self, n_configurations: int,
+                              random_state: typing.Optional[np.random.RandomState] = None) -> ConfigurationBatch:
+        """
+        Draws a batch of random configurations in a single vectorized call,
+        respecting the conditions. Does not assemble the configuration space.
+
+        Parameters
+        ----------
+        n_configurations: int
+            The number of configurations to draw
+
+        random_state: np.random.RandomState or None
+            The random state to sample from. Leave to None to use the (seeded)
+            random state of the configuration space
+
+        Returns
+        -------
+        batch: ConfigurationBatch
+            Columnar representation of the configurations
+        """
+        if random_state is None:
+            random_state = self.config_space.random
+        with phase('sample'):
+            return sample_configurations(self.hyperparameters, self.conditions, n_configurations, random_state)
+
+    def load_configurations(self, path: str) -> ConfigurationBatch:
+        """
+        Loads a batch of configurations that was sampled from this
+        configuration space, and stored using ConfigurationBatch.save
+        """
+        return ConfigurationBatch.load(path, self.hyperparameters)
+
     def wrap_in_fixed_pipeline(self):
         if self.wrapped_in_pipeline:
             raise ValueError('Can not doubly wrap the fixed pipeline.')
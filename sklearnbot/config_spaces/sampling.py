@@ -0,0 +1,322 @@
+import ConfigSpace
+import hashlib
+import json
+import numpy as np
+import typing
+
+
+def _is_categorical(hyperparameter) -> bool:
+    return isinstance(hyperparameter, (ConfigSpace.hyperparameters.CategoricalHyperparameter,
+                                       ConfigSpace.hyperparameters.OrdinalHyperparameter))
+
+
+def _is_constant(hyperparameter) -> bool:
+    return isinstance(hyperparameter, (ConfigSpace.hyperparameters.Constant,
+                                       ConfigSpace.hyperparameters.UnParametrizedHyperparameter))
+
+
+def _get_choices(hyperparameter) -> typing.List:
+    if isinstance(hyperparameter, ConfigSpace.hyperparameters.OrdinalHyperparameter):
+        return list(hyperparameter.sequence)
+    return list(hyperparameter.choices)
+
+
+def _get_dtype(hyperparameter) -> np.dtype:
+    # categorical and constant values are represented by the index of the value
+    if isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformFloatHyperparameter):
+        return np.dtype(np.float64)
+    return np.dtype(np.int64)
+
+
+def _sample_column(hyperparameter, n_configurations: int, random_state: np.random.RandomState) -> np.ndarray:
+    if isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformFloatHyperparameter):
+        if hyperparameter.log:
+            return np.exp(random_state.uniform(np.log(hyperparameter.lower), np.log(hyperparameter.upper),
+                                               n_configurations))
+        return random_state.uniform(hyperparameter.lower, hyperparameter.upper, n_configurations)
+    elif isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformIntegerHyperparameter):
+        if hyperparameter.log:
+            values = np.floor(np.exp(random_state.uniform(np.log(hyperparameter.lower),
+                                                          np.log(hyperparameter.upper + 1), n_configurations)))
+            return np.clip(values, hyperparameter.lower, hyperparameter.upper).astype(np.int64)
+        return random_state.randint(hyperparameter.lower, hyperparameter.upper + 1, n_configurations)
+    elif _is_categorical(hyperparameter):
+        probabilities = getattr(hyperparameter, 'weights', None)
+        if probabilities is not None:
+            probabilities = np.asarray(probabilities, dtype=np.float64) / np.sum(probabilities)
+        return random_state.choice(len(_get_choices(hyperparameter)), n_configurations, p=probabilities)
+    elif _is_constant(hyperparameter):
+        return np.zeros(n_configurations, dtype=np.int64)
+    else:
+        raise ValueError('Hyperparameter type not supported yet: %s' % type(hyperparameter))
+
+
+def _encode_value(hyperparameter, value) -> typing.Union[int, float]:
+    # maps a value as it appears in a condition to the encoding of the column
+    if _is_categorical(hyperparameter):
+        return _get_choices(hyperparameter).index(value)
+    if _is_constant(hyperparameter):
+        return 0 if value == hyperparameter.value else -1
+    return value
+
+
+def _evaluate_condition(condition, values: np.ndarray, active: np.ndarray, names: typing.List[str],
+                        hyperparameters: typing.Dict[str, typing.Any]) -> np.ndarray:
+    """
+    Evaluates a (possibly conjunctive) condition for all configurations at
+    once. A condition only holds if its parent is active.
+    """
+    if isinstance(condition, ConfigSpace.conditions.AndConjunction):
+        result = np.ones(len(values), dtype=bool)
+        for component in condition.components:
+            result &= _evaluate_condition(component, values, active, names, hyperparameters)
+        return result
+    if isinstance(condition, ConfigSpace.conditions.OrConjunction):
+        result = np.zeros(len(values), dtype=bool)
+        for component in condition.components:
+            result |= _evaluate_condition(component, values, active, names, hyperparameters)
+        return result
+
+    parent = hyperparameters[condition.parent.name]
+    column = values[condition.parent.name]
+    parent_active = active[:, names.index(condition.parent.name)]
+    if isinstance(condition, ConfigSpace.conditions.EqualsCondition):
+        result = column == _encode_value(parent, condition.value)
+    elif isinstance(condition, ConfigSpace.conditions.NotEqualsCondition):
+        result = column != _encode_value(parent, condition.value)
+    elif isinstance(condition, ConfigSpace.conditions.InCondition):
+        result = np.isin(column, [_encode_value(parent, value) for value in condition.values])
+    elif isinstance(condition, ConfigSpace.conditions.GreaterThanCondition):
+        result = column > _encode_value(parent, condition.value)
+    elif isinstance(condition, ConfigSpace.conditions.LessThanCondition):
+        result = column < _encode_value(parent, condition.value)
+    else:
+        raise ValueError('Condition type not supported yet: %s' % type(condition))
+    return result & parent_active
+
+
+def get_child_name(condition) -> str:
+    if isinstance(condition, (ConfigSpace.conditions.AndConjunction, ConfigSpace.conditions.OrConjunction)):
+        return get_child_name(condition.components[0])
+    return condition.child.name
+
+
+def get_parent_names(condition) -> typing.Set[str]:
+    if isinstance(condition, (ConfigSpace.conditions.AndConjunction, ConfigSpace.conditions.OrConjunction)):
+        return set.union(*[get_parent_names(component) for component in condition.components])
+    return {condition.parent.name}
+
+
+class ConfigurationBatch(object):
+    """
+    Columnar representation of a batch of configurations. The values are
+    stored in a numpy structured array, with one field per hyperparameter:
+    floats and integers are stored as is, categorical and constant values as
+    index into their choices. A boolean matrix marks which hyperparameters
+    are active in which configuration; inactive values are stored as 0.
+    Configurations are only turned into dicts (as accepted by `set_params`)
+    when requested.
+
+    Parameters
+    ----------
+    hyperparameters: list[ConfigSpace.hyperparameters.Hyperparameter]
+        The hyperparameters, in the order of the fields
+
+    values: np.ndarray
+        Structured array with a field per hyperparameter
+
+    active: np.ndarray
+        Boolean array of shape (n_configurations, n_hyperparameters)
+    """
+
+    def __init__(self, hyperparameters: typing.List, values: np.ndarray, active: np.ndarray):
+        self.hyperparameters = hyperparameters
+        self.names = [hyperparameter.name for hyperparameter in hyperparameters]
+        self.values = values
+        self.active = active
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, item) -> 'ConfigurationBatch':
+        if isinstance(item, (int, np.integer)):
+            item = [item]
+        return ConfigurationBatch(self.hyperparameters, self.values[item], self.active[item])
+
+    def get_dictionary(self, index: int) -> typing.Dict[str, typing.Any]:
+        """
+        Returns the active hyperparameters of a single configuration as dict
+        of (native python) values, that can be passed to `set_params`.
+        """
+        result = dict()
+        row = self.values[index]
+        for idx, hyperparameter in enumerate(self.hyperparameters):
+            if not self.active[index, idx]:
+                continue
+            value = row[hyperparameter.name]
+            if _is_categorical(hyperparameter):
+                value = _get_choices(hyperparameter)[int(value)]
+            elif _is_constant(hyperparameter):
+                value = hyperparameter.value
+            elif isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformIntegerHyperparameter):
+                value = int(value)
+            else:
+                value = float(value)
+            result[hyperparameter.name] = value
+        return result
+
+    def get_dictionaries(self) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+        """
+        Lazily iterates over all configurations as dicts.
+        """
+        for index in range(len(self)):
+            yield self.get_dictionary(index)
+
+    def hashes(self) -> typing.List[str]:
+        """
+        Returns a hash per configuration, based on the hyperparameter names,
+        the values and the active mask. Equal configurations have equal hashes.
+        """
+        names = json.dumps(self.names).encode('utf-8')
+        rows = np.ascontiguousarray(self.values).view(np.uint8).reshape(len(self), -1)
+        active = np.ascontiguousarray(self.active, dtype=np.uint8)
+        return [hashlib.sha1(names + rows[i].tobytes() + active[i].tobytes()).hexdigest() for i in range(len(self))]
+
+    def deduplicate(self) -> 'ConfigurationBatch':
+        """
+        Returns a batch without duplicate configurations, in order of first
+        occurrence.
+        """
+        rows = np.ascontiguousarray(self.values).view(np.uint8).reshape(len(self), -1)
+        keys = np.hstack([rows, self.active.astype(np.uint8)])
+        _, indices = np.unique(keys, axis=0, return_index=True)
+        return self[np.sort(indices)]
+
+    def save(self, path: str):
+        """
+        Stores the batch as compressed numpy file. Only the values are stored,
+        the hyperparameter definitions come from the configuration space upon
+        loading.
+        """
+        np.savez_compressed(path, values=self.values, active=self.active, names=np.array(self.names))
+
+    @staticmethod
+    def load(path: str, hyperparameters: typing.List) -> 'ConfigurationBatch':
+        """
+        Loads a batch that was stored using `save`, given the hyperparameters
+        of the configuration space it was sampled from.
+        """
+        with np.load(path) as data:
+            names = [str(name) for name in data['names']]
+            if names != [hyperparameter.name for hyperparameter in hyperparameters]:
+                raise ValueError('Stored hyperparameters do not match: %s' % names)
+            return ConfigurationBatch(hyperparameters, data['values'], data['active'])
+
+
+def sample_configurations(hyperparameters: typing.List, conditions: typing.Optional[typing.List],
+                          n_configurations: int, random_state: np.random.RandomState) -> ConfigurationBatch:
+    """
+    Draws a batch of random configurations in a vectorized manner. All
+    hyperparameters are sampled for all configurations, after which the
+    conditions determine which of them are active.
+
+    Parameters
+    ----------
+    hyperparameters: list[ConfigSpace.hyperparameters.Hyperparameter]
+        The hyperparameters to sample
+
+    conditions: list[ConfigSpace.conditions.ConditionComponent] or None
+        The conditions that determine whether a hyperparameter is active
+
+    n_configurations: int
+        The number of configurations to draw
+
+    random_state: np.random.RandomState
+        The random state to sample from
+
+    Returns
+    -------
+    batch: ConfigurationBatch
+        The sampled configurations
+    """
+    names = [hyperparameter.name for hyperparameter in hyperparameters]
+    values = np.zeros(n_configurations, dtype=[(hyperparameter.name, _get_dtype(hyperparameter))
+                                               for hyperparameter in hyperparameters])
+    for hyperparameter in hyperparameters:
+        values[hyperparameter.name] = _sample_column(hyperparameter, n_configurations, random_state)
+    active = _resolve_conditions(hyperparameters, conditions, values)
+
+    # canonical representation of inactive values
+    for idx, name in enumerate(names):
+        values[name][~active[:, idx]] = 0
+    return ConfigurationBatch(hyperparameters, values, active)
+
+
+def _resolve_conditions(hyperparameters: typing.List, conditions: typing.Optional[typing.List],
+                        values: np.ndarray) -> np.ndarray:
+    # determines which hyperparameters are active in which configuration
+    names = [hyperparameter.name for hyperparameter in hyperparameters]
+    hyperparameters_by_name = {hyperparameter.name: hyperparameter for hyperparameter in hyperparameters}
+    active = np.ones((len(values), len(hyperparameters)), dtype=bool)
+
+    # resolve the conditions in topological order, i.e., after the conditions
+    # of the parent have been resolved
+    pending = list(conditions) if conditions is not None else []
+    resolved = set(names) - {get_child_name(condition) for condition in pending}
+    while len(pending) > 0:
+        ready = [condition for condition in pending if get_parent_names(condition) <= resolved]
+        if len(ready) == 0:
+            raise ValueError('Conditions contain a cycle')
+        for condition in ready:
+            child_name = get_child_name(condition)
+            active[:, names.index(child_name)] &= _evaluate_condition(condition, values, active, names,
+                                                                      hyperparameters_by_name)
+            pending.remove(condition)
+        resolved |= {get_child_name(condition) for condition in ready}
+    return active
+
+
+def get_active_configuration(hyperparameters: typing.List, conditions: typing.Optional[typing.List],
+                             configuration: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    """
+    Returns the hyperparameters of a configuration that are active according
+    to the conditions, i.e., the configuration as it would have been sampled.
+    E.g., the parameters of a model (which also hold the values of inactive
+    hyperparameters) can be reduced to the configuration that was set.
+
+    Parameters
+    ----------
+    hyperparameters: list[ConfigSpace.hyperparameters.Hyperparameter]
+        The hyperparameters of the configuration space
+
+    conditions: list[ConfigSpace.conditions.ConditionComponent] or None
+        The conditions that determine whether a hyperparameter is active
+
+    configuration: dict
+        Maps the names of (a superset of) the hyperparameters to their values
+
+    Returns
+    -------
+    configuration: dict
+        The values of the active hyperparameters
+    """
+    hyperparameters = [hyperparameter for hyperparameter in hyperparameters if hyperparameter.name in configuration]
+    values = np.zeros(1, dtype=[(hyperparameter.name, np.float64) for hyperparameter in hyperparameters])
+    for hyperparameter in hyperparameters:
+        value = configuration[hyperparameter.name]
+        if _is_categorical(hyperparameter) or _is_constant(hyperparameter):
+            # values that are not a choice do not satisfy any condition
+            choices = _get_choices(hyperparameter) if _is_categorical(hyperparameter) else [hyperparameter.value]
+            values[hyperparameter.name] = _encode_value(hyperparameter, value) if value in choices else -1
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[hyperparameter.name] = value
+        else:
+            values[hyperparameter.name] = np.nan
+    # conditions on hyperparameters that are not in the configuration do not hold
+    names = {hyperparameter.name for hyperparameter in hyperparameters}
+    if conditions is not None:
+        conditions = [condition for condition in conditions
+                      if get_child_name(condition) in names and get_parent_names(condition) <= names]
+    active = _resolve_conditions(hyperparameters, conditions, values)
+    return {hyperparameter.name: configuration[hyperparameter.name]
+            for idx, hyperparameter in enumerate(hyperparameters) if active[0, idx]}
@@ -0,0 +1,4 @@
+from .cod import CODAccumulator, RunPredictions, compute_cod_matrix, get_run_predictions
+from .export import FILE_FORMATS, ResultsWriter, get_column_types, read_results
+from .incremental import IncrementalResults
+from .setups import SetupResolver, list_setup_results
@@ -0,0 +1,181 @@
+import arff
+import collections
+import concurrent.futures
+import logging
+import numpy as np
+import openml
+import os
+import requests
+import requests.adapters
+import typing
+
+
+# The predictions of a run, a row per (repeat, row id) pair
+RunPredictions = collections.namedtuple('RunPredictions', ['repeat', 'row_id', 'prediction'])
+
+
+def _cache_file(cache_directory: str, run_id: int) -> str:
+    return os.path.join(cache_directory, '%d.npz' % run_id)
+
+
+def _load_predictions(cache_file: str) -> RunPredictions:
+    with np.load(cache_file, allow_pickle=False) as predictions:
+        return RunPredictions(predictions['repeat'], predictions['row_id'], predictions['prediction'])
+
+
+def _download_predictions(session: requests.Session, run_id: int, cache_directory: str) -> RunPredictions:
+    """
+    Downloads the predictions file of a run, and stores the relevant columns
+    in the cache
+    """
+    run = openml.runs.get_run(run_id)
+    response = session.get(run.predictions_url)
+    response.raise_for_status()
+    predictions_arff = arff.loads(response.text)
+    columns = [name for name, _ in predictions_arff['attributes']]
+    data = predictions_arff['data']
+    idx_repeat, idx_row_id, idx_prediction = columns.index('repeat'), columns.index('row_id'), \
+        columns.index('prediction')
+    predictions = RunPredictions(np.array([row[idx_repeat] for row in data], dtype=np.int32),
+                                 np.array([row[idx_row_id] for row in data], dtype=np.int64),
+                                 np.array([str(row[idx_prediction]) for row in data]))
+    # write and rename, so that a cache file is never observed half-written
+    cache_file = _cache_file(cache_directory, run_id)
+    with open(cache_file + '.tmp', 'wb') as fp:
+        np.savez_compressed(fp, **predictions._asdict())
+    os.rename(cache_file + '.tmp', cache_file)
+    return predictions
+
+
+def get_run_predictions(run_ids: typing.List[int], cache_directory: str, n_threads: int = 8) \
+        -> typing.Dict[int, RunPredictions]:
+    """
+    Returns the predictions of OpenML runs. Predictions are cached locally
+    (as compressed numpy arrays); only the predictions that are not in the
+    cache are downloaded, concurrently, over a bounded pool of connections.
+
+    Parameters
+    ----------
+    run_ids: list[int]
+        The OpenML run ids
+
+    cache_directory: str
+        A writable directory in which the predictions are cached
+
+    n_threads: int
+        The number of concurrent downloads (and connections to the server)
+
+    Returns
+    -------
+    predictions: dict[int, RunPredictions]
+        The predictions per run id
+    """
+    os.makedirs(cache_directory, exist_ok=True)
+    predictions = dict()
+    missing = []
+    for run_id in run_ids:
+        if os.path.isfile(_cache_file(cache_directory, run_id)):
+            predictions[run_id] = _load_predictions(_cache_file(cache_directory, run_id))
+        else:
+            missing.append(run_id)
+    if len(missing) == 0:
+        return predictions
+
+    logging.info('Downloading the predictions of %d runs' % len(missing))
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=n_threads, pool_maxsize=n_threads)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+            futures = {executor.submit(_download_predictions, session, run_id, cache_directory): run_id
+                       for run_id in missing}
+            for future in concurrent.futures.as_completed(futures):
+                predictions[futures[future]] = future.result()
+    return predictions
+
+
+def compute_cod_matrix(predictions: typing.List[RunPredictions]) -> np.ndarray:
+    """
+    Computes the classifier output difference (the fraction of instances on
+    which the predictions differ) between all pairs of runs on the same task.
+    The predictions are aligned on (repeat, row id) once, after which the
+    full matrix is obtained with a matrix product per class. Pairs are
+    compared on the instances that both runs predicted.
+
+    Parameters
+    ----------
+    predictions: list[RunPredictions]
+        The predictions of F runs on the same task
+
+    Returns
+    -------
+    cod: np.ndarray
+        The F x F matrix of classifier output differences (symmetric, with a
+        zero diagonal). NaN for pairs without common instances
+    """
+    # align all runs on the union of the (repeat, row id) pairs
+    n_rows = max(int(p.row_id.max()) + 1 if len(p.row_id) > 0 else 0 for p in predictions)
+    keys = [p.repeat.astype(np.int64) * n_rows + p.row_id for p in predictions]
+    all_keys = np.unique(np.concatenate(keys))
+    # and encode the predicted labels of all runs as shared class indices
+    labels, codes = np.unique(np.concatenate([p.prediction for p in predictions]), return_inverse=True)
+    codes = np.split(codes.ravel(), np.cumsum([len(p.prediction) for p in predictions])[:-1])
+
+    # class index per run and instance; -1 where a run has no prediction
+    aligned = np.full((len(predictions), len(all_keys)), -1, dtype=np.int64)
+    for idx, (run_keys, run_codes) in enumerate(zip(keys, codes)):
+        aligned[idx, np.searchsorted(all_keys, run_keys)] = run_codes
+
+    valid = (aligned >= 0).astype(np.float64)
+    n_common = valid @ valid.T
+    n_agree = np.zeros_like(n_common)
+    for label_idx in range(len(labels)):
+        indicator = (aligned == label_idx).astype(np.float64)
+        n_agree += indicator @ indicator.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cod = np.where(n_common > 0, 1.0 - n_agree / n_common, np.nan)
+    np.fill_diagonal(cod, 0.0)
+    return cod
+
+
+class CODAccumulator(object):
+    """
+    Incrementally averages the classifier output differences of flows over
+    tasks. Tasks do not need to contain all flows; every pair is averaged
+    over the tasks on which both flows were compared.
+    """
+
+    def __init__(self):
+        self.flow_ids = []  # type: typing.List[int]
+        self._sum = np.zeros((0, 0))
+        self._count = np.zeros((0, 0))
+
+    def add(self, flow_ids: typing.List[int], cod: np.ndarray):
+        """
+        Adds the classifier output differences of a task.
+
+        Parameters
+        ----------
+        flow_ids: list[int]
+            The flow ids, in the order of the rows and columns of the matrix
+
+        cod: np.ndarray
+            The matrix, as computed by compute_cod_matrix
+        """
+        new_flow_ids = [flow_id for flow_id in flow_ids if flow_id not in self.flow_ids]
+        if len(new_flow_ids) > 0:
+            self.flow_ids = self.flow_ids + new_flow_ids
+            self._sum = np.pad(self._sum, (0, len(new_flow_ids)))
+            self._count = np.pad(self._count, (0, len(new_flow_ids)))
+        positions = np.array([self.flow_ids.index(flow_id) for flow_id in flow_ids])
+        observed = ~np.isnan(cod)
+        self._sum[np.ix_(positions, positions)] += np.where(observed, cod, 0.0)
+        self._count[np.ix_(positions, positions)] += observed
+
+    def mean(self) -> np.ndarray:
+        """
+        Returns the average matrix, in the order of `flow_ids`. NaN for pairs
+        that were never compared
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self._count > 0, self._sum / np.maximum(self._count, 1), np.nan)
@@ -0,0 +1,234 @@
+import ConfigSpace
+import json
+import logging
+import numpy as np
+import os
+import pandas as pd
+import typing
+
+
+FILE_FORMATS = ['feather', 'parquet']
+
+COLUMN_TYPES = ['float', 'string']
+
+# the key of the JSON meta-data in the schema of the written files
+META_KEY = b'openml_meta'
+
+
+def _to_strings(column: pd.Series) -> pd.Series:
+    return column.map(lambda value: None if pd.isnull(value) else str(value)).astype(object)
+
+
+def _normalize(frame: pd.DataFrame, column_types: typing.Dict[str, str]) -> pd.DataFrame:
+    """
+    Converts a chunk to types that are stable across chunks: columns of
+    which the type is given are converted to that type. Otherwise, numbers
+    are stored as floats (as later chunks might contain missing values),
+    except for the task id, and all other values as strings.
+    """
+    frame = frame.copy()
+    for column in frame.columns:
+        if column == 'task_id':
+            frame[column] = frame[column].astype(np.int64)
+        elif column_types.get(column) == 'float':
+            try:
+                frame[column] = pd.to_numeric(frame[column]).astype(np.float64)
+            except (TypeError, ValueError) as e:
+                raise ValueError('Column %s should be numeric (see column_types): %s' % (column, str(e)))
+        elif column_types.get(column) == 'string':
+            frame[column] = _to_strings(frame[column])
+        elif pd.api.types.is_numeric_dtype(frame[column]) or pd.api.types.is_bool_dtype(frame[column]):
+            frame[column] = frame[column].astype(np.float64)
+        else:
+            frame[column] = _to_strings(frame[column])
+    return frame
+
+
+def get_column_types(configuration_space: ConfigSpace.ConfigurationSpace,
+                     measures: typing.List[str]) -> typing.Dict[str, str]:
+    """
+    Derives the types of the hyperparameter and measure columns of a results
+    meta-dataset from the configuration space, to be passed to
+    ResultsWriter: numerical hyperparameters and the measures are floats,
+    categorical and constant hyperparameters strings. This way, the types
+    do not depend on the values in the first chunk (e.g., a hyperparameter
+    that is inactive in all runs of the first task).
+
+    Parameters
+    ----------
+    configuration_space: ConfigSpace.ConfigurationSpace
+        The configuration space of which the hyperparameters are columns
+
+    measures: list[str]
+        The evaluation measures that are columns
+
+    Returns
+    -------
+    column_types: dict
+        Maps the column names to `float` or `string`
+    """
+    column_types = {measure: 'float' for measure in measures}
+    for hyperparameter in configuration_space.get_hyperparameters():
+        if isinstance(hyperparameter, ConfigSpace.hyperparameters.NumericalHyperparameter):
+            column_types[hyperparameter.name] = 'float'
+        else:
+            column_types[hyperparameter.name] = 'string'
+    return column_types
+
+
+class ResultsWriter(object):
+    """
+    Streams a results meta-dataset (e.g., the hyperparameters and performance
+    of runs, a row per run or fold) to a columnar file, a chunk (e.g., the
+    results of a single task) at a time, so that the full dataset never needs
+    to be in memory. The JSON meta-data (flow id, parameter and measure
+    columns, etc.) is stored in the schema of the file. Optionally, the
+    meta-features of the tasks are joined to every chunk.
+
+    Feather files are written uncompressed, so that they can be memory-mapped
+    by the reader (see read_results). The file only appears once it is
+    closed; used as context manager, an incomplete file (due to an
+    exception) is discarded. Requires pyarrow.
+
+    Parameters
+    ----------
+    path: str
+        The file to write to
+
+    json_meta: dict
+        JSON serializable meta-data, stored in the file
+
+    file_format: str
+        Either `feather` (Arrow IPC file) or `parquet`
+
+    meta_features: pd.DataFrame or None
+        If set, the meta-features of the tasks, indexed by task id, that are
+        joined (inner) to every chunk
+
+    column_types: dict or None
+        Maps columns to their type, either `float` or `string` (see
+        get_column_types). The other columns take the type of the first
+        chunk; columns without any value in the first chunk are strings
+    """
+
+    def __init__(self, path: str, json_meta: typing.Dict[str, typing.Any], file_format: str = 'feather',
+                 meta_features: typing.Optional[pd.DataFrame] = None,
+                 column_types: typing.Optional[typing.Dict[str, str]] = None):
+        if file_format not in FILE_FORMATS:
+            raise ValueError('File format not supported: %s' % file_format)
+        column_types = dict(column_types) if column_types is not None else dict()
+        for column, column_type in column_types.items():
+            if column_type not in COLUMN_TYPES:
+                raise ValueError('Column type not supported: %s (column %s)' % (column_type, column))
+        self.path = path
+        self.json_meta = json_meta
+        self.file_format = file_format
+        self.meta_features = meta_features
+        self.column_types = column_types
+        self.n_rows = 0
+        self._schema = None
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            # an incomplete file is not published
+            self._writer.close()
+            self._writer = None
+            os.remove(self.path + '.tmp')
+
+    def _open(self, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        metadata = dict(schema.metadata or {})
+        metadata[META_KEY] = json.dumps(self.json_meta).encode('utf-8')
+        self._schema = schema.with_metadata(metadata)
+        directory = os.path.dirname(self.path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        if self.file_format == 'parquet':
+            self._writer = pq.ParquetWriter(self.path + '.tmp', self._schema)
+        else:
+            self._writer = pa.ipc.new_file(self.path + '.tmp', self._schema)
+
+    def write(self, frame: pd.DataFrame):
+        """
+        Appends a chunk of results. All chunks should have the same columns,
+        which are fixed by the first chunk.
+        """
+        import pyarrow as pa
+
+        if self.meta_features is not None:
+            frame = frame.join(self.meta_features, on='task_id', how='inner')
+        if len(frame) == 0:
+            return
+        frame = _normalize(frame, self.column_types)
+        if self._writer is None:
+            schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            fields = []
+            for field in schema:
+                if pa.types.is_null(field.type):
+                    # without any value in the first chunk, strings (unless the type is given)
+                    field_type = pa.float64() if self.column_types.get(field.name) == 'float' else pa.string()
+                    field = pa.field(field.name, field_type)
+                fields.append(field)
+            self._open(pa.schema(fields, metadata=schema.metadata))
+            # later chunks are converted to the types of the first chunk
+            for field in self._schema:
+                if field.name != 'task_id':
+                    self.column_types.setdefault(field.name, 'string' if pa.types.is_string(field.type) else 'float')
+        frame = frame.reindex(columns=self._schema.names)
+        table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+        self.n_rows += len(frame)
+
+    def close(self):
+        """
+        Finishes the file. Nothing is written if no chunk contained any rows
+        """
+        if self._writer is None:
+            logging.warning('No results to write to %s' % self.path)
+            return
+        self._writer.close()
+        self._writer = None
+        # rename, so that the file is never observed half-written
+        os.rename(self.path + '.tmp', self.path)
+        logging.info('Stored %d rows to %s' % (self.n_rows, self.path))
+
+
+def read_results(path: str, memory_map: bool = True):
+    """
+    Reads a results file that was written by ResultsWriter.
+
+    Parameters
+    ----------
+    path: str
+        The file, either a feather or a parquet file (by extension)
+
+    memory_map: bool
+        If set to true, the file is memory-mapped rather than read into
+        memory (zero-copy for feather files)
+
+    Returns
+    -------
+    table: pyarrow.Table
+        The results (use `to_pandas` to obtain a data frame)
+
+    json_meta: dict
+        The JSON meta-data
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith('.parquet'):
+        table = pq.read_table(path, memory_map=memory_map)
+    else:
+        source = pa.memory_map(path, 'r') if memory_map else pa.OSFile(path, 'rb')
+        table = pa.ipc.open_file(source).read_all()
+    json_meta = json.loads(table.schema.metadata[META_KEY].decode('utf-8'))
+    return table, json_meta
@@ -0,0 +1,194 @@
+import concurrent.futures
+import glob
+import json
+import logging
+import openml
+import os
+import pandas as pd
+import time
+import typing
+import uuid
+
+from sklearnbot.results.export import ResultsWriter, read_results
+
+
+class IncrementalResults(object):
+    """
+    Local store of the runs (or evaluations) of setups or flows on tasks,
+    that can be refreshed incrementally. For every (task, setup) or (task,
+    flow) pair, the highest run id and the number of entries that were seen
+    are recorded in a state file (the watermark). A refresh only lists the
+    entries after those that were seen (using the offset of the listing),
+    and keeps those with a run id above the watermark. The new entries are
+    appended to the store as a new columnar part file (see ResultsWriter),
+    so that the cost of a refresh is proportional to the number of new
+    entries.
+
+    Listings are ordered by run id, so the offset skips the entries that
+    were seen. As entries might be deleted from the server, the offset is
+    reduced by a safety margin (`overlap`); duplicates are filtered using
+    the watermark.
+
+    Layout: `store_directory/state.json` and `store_directory/part-*.<format>`
+
+    Parameters
+    ----------
+    store_directory: str
+        A writable directory in which the results and the state are stored
+
+    evaluation_measure: str or None
+        If set, the evaluations of this measure are stored (e.g.,
+        predictive_accuracy). Otherwise, the runs are stored. A store can
+        only hold a single kind of results
+
+    file_format: str
+        Either `feather` or `parquet`
+
+    overlap: int
+        The number of seen entries per listing that are listed again, in case
+        entries were deleted from the server
+    """
+
+    STATE_FILE = 'state.json'
+
+    def __init__(self, store_directory: str, evaluation_measure: typing.Optional[str] = None,
+                 file_format: str = 'feather', overlap: int = 100):
+        self.store_directory = store_directory
+        self.evaluation_measure = evaluation_measure
+        self.file_format = file_format
+        self.overlap = overlap
+        os.makedirs(store_directory, exist_ok=True)
+        self._state_file = os.path.join(store_directory, IncrementalResults.STATE_FILE)
+        self._watermarks = dict()  # type: typing.Dict[str, typing.List[int]]
+        if os.path.isfile(self._state_file):
+            with open(self._state_file, 'r') as fp:
+                state = json.load(fp)
+            if state['evaluation_measure'] != evaluation_measure:
+                raise ValueError('Store %s contains results of evaluation measure %s' %
+                                 (store_directory, state['evaluation_measure']))
+            self._watermarks = state['watermarks']
+
+    @staticmethod
+    def _key(task_id: int, kind: str, entity_id: int) -> str:
+        return '%d/%s/%d' % (task_id, kind, entity_id)
+
+    def get_watermark(self, task_id: int, setup_id: typing.Optional[int] = None,
+                      flow_id: typing.Optional[int] = None) -> typing.Optional[int]:
+        """
+        Returns the highest run id that was seen of a setup or flow on a
+        task, or None if none was seen
+        """
+        kind, entity_id = ('setup', setup_id) if setup_id is not None else ('flow', flow_id)
+        watermark = self._watermarks.get(self._key(task_id, kind, entity_id))
+        return watermark[0] if watermark is not None else None
+
+    def _list(self, task_id: int, kind: str, entity_ids: typing.List[int]) -> pd.DataFrame:
+        seen = [self._watermarks.get(self._key(task_id, kind, entity_id), [0, 0]) for entity_id in entity_ids]
+        offset = max(0, sum(count for _, count in seen) - self.overlap)
+        if self.evaluation_measure is None:
+            filters = {'task': [task_id], kind: entity_ids}
+            frame = openml.runs.list_runs(offset=offset, output_format='dataframe', **filters)
+        else:
+            filters = {'tasks': [task_id], kind + 's': entity_ids}
+            frame = openml.evaluations.list_evaluations(self.evaluation_measure, offset=offset, size=None,
+                                                        output_format='dataframe', **filters)
+        if len(frame) == 0:
+            return pd.DataFrame()
+        watermarks = frame['%s_id' % kind].map(
+            lambda entity_id: self._watermarks.get(self._key(task_id, kind, entity_id), [0, 0])[0])
+        return frame[frame['run_id'] > watermarks]
+
+    def refresh(self, task_ids: typing.List[int], setup_ids: typing.Optional[typing.List[int]] = None,
+                flow_ids: typing.Optional[typing.List[int]] = None, n_threads: int = 8,
+                chunk_size: int = 100) -> int:
+        """
+        Lists the entries of the setups (or flows) on the tasks that are newer
+        than the watermarks, concurrently, and appends them to the store.
+
+        Parameters
+        ----------
+        task_ids: list[int]
+            The OpenML task ids
+
+        setup_ids: list[int] or None
+            The OpenML setup ids. Either these or the flow ids should be set
+
+        flow_ids: list[int] or None
+            The OpenML flow ids
+
+        n_threads: int
+            The number of concurrent listings
+
+        chunk_size: int
+            The number of setups (or flows) per listing
+
+        Returns
+        -------
+        n_new: int
+            The number of new entries
+        """
+        if (setup_ids is None) == (flow_ids is None):
+            raise ValueError('Either setup_ids or flow_ids should be set')
+        kind, entity_ids = ('setup', sorted(setup_ids)) if setup_ids is not None else ('flow', sorted(flow_ids))
+        chunks = [entity_ids[start:start + chunk_size] for start in range(0, len(entity_ids), chunk_size)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+            futures = [executor.submit(self._list, task_id, kind, chunk) for task_id in task_ids for chunk in chunks]
+            frames = [future.result() for future in futures]
+        frames = [frame for frame in frames if len(frame) > 0]
+        if len(frames) == 0:
+            logging.info('No new results in %s' % self.store_directory)
+            return 0
+        new_results = pd.concat(frames, ignore_index=True)
+
+        # the part is written before the state; an interrupted refresh leads
+        # to duplicates, which are removed when reading
+        part_file = os.path.join(self.store_directory, 'part-%d-%s.%s' %
+                                 (time.time() * 1000, uuid.uuid4(), self.file_format))
+        json_meta = {'evaluation_measure': self.evaluation_measure, 'refresh_time': time.time()}
+        with ResultsWriter(part_file, json_meta, self.file_format) as writer:
+            writer.write(new_results)
+
+        for (task_id, entity_id), group in new_results.groupby(['task_id', '%s_id' % kind]):
+            key = self._key(task_id, kind, entity_id)
+            max_run_id, count = self._watermarks.get(key, [0, 0])
+            self._watermarks[key] = [max(max_run_id, int(group['run_id'].max())), count + len(group)]
+        _write_json({'evaluation_measure': self.evaluation_measure, 'watermarks': self._watermarks},
+                    self._state_file)
+        logging.info('Added %d new results to %s' % (len(new_results), self.store_directory))
+        return len(new_results)
+
+    def _part_files(self) -> typing.List[str]:
+        return sorted(glob.glob(os.path.join(self.store_directory, 'part-*.%s' % self.file_format)))
+
+    def read(self) -> pd.DataFrame:
+        """
+        Returns all stored results
+        """
+        frames = [read_results(part_file)[0].to_pandas() for part_file in self._part_files()]
+        if len(frames) == 0:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).drop_duplicates('run_id', keep='last').reset_index(drop=True)
+
+    def compact(self):
+        """
+        Merges all part files into a single part file
+        """
+        part_files = self._part_files()
+        if len(part_files) < 2:
+            return
+        results = self.read()
+        compacted_file = os.path.join(self.store_directory, 'part-%d-%s.%s' %
+                                      (time.time() * 1000, uuid.uuid4(), self.file_format))
+        json_meta = {'evaluation_measure': self.evaluation_measure, 'refresh_time': time.time()}
+        with ResultsWriter(compacted_file, json_meta, self.file_format) as writer:
+            writer.write(results)
+        for part_file in part_files:
+            os.remove(part_file)
+        logging.info('Compacted %d part files of %s' % (len(part_files), self.store_directory))
+
+
+def _write_json(content: typing.Dict, path: str):
+    # write and rename, so that the file is never observed half-written
+    with open(path + '.tmp', 'w') as fp:
+        json.dump(content, fp)
+    os.rename(path + '.tmp', path)
@@ -0,0 +1,173 @@
+import concurrent.futures
+import logging
+import openml
+import pandas as pd
+import sklearnbot
+import threading
+import typing
+
+from sklearnbot.config_spaces import ConfigSpaceWrapper
+
+
+class SetupResolver(object):
+    """
+    Resolves the OpenML setups of the (default) configurations of
+    configuration spaces on tasks. The flow of a fixed pipeline only depends
+    on the classifier, and its setup only on the classifier and the layout of
+    the feature types of the task. Therefore, tasks are only described once,
+    flows are looked up once per name and version, and setups once per
+    structural signature of the model (see get_estimator_signature). The
+    lookups of the tasks are executed concurrently, by a bounded pool of
+    threads; concurrent lookups of the same flow or setup wait for each
+    other, rather than querying the server twice.
+
+    Parameters
+    ----------
+    n_threads: int
+        The number of concurrent lookups (and connections to the server)
+    """
+
+    def __init__(self, n_threads: int = 8):
+        self.n_threads = n_threads
+        self._lock = threading.Lock()
+        # futures, so that concurrent lookups of the same key are only executed once
+        self._task_layouts = dict()  # type: typing.Dict[int, concurrent.futures.Future]
+        self._server_flows = dict()  # type: typing.Dict[typing.Tuple[str, str], concurrent.futures.Future]
+        self._setup_ids = dict()  # type: typing.Dict[typing.Tuple[str, str], concurrent.futures.Future]
+
+    def _memoize(self, cache: typing.Dict, key, function: typing.Callable, *args):
+        with self._lock:
+            future = cache.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                cache[key] = future
+        if owner:
+            try:
+                future.set_result(function(*args))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    @staticmethod
+    def _get_task_layout(task_id: int) -> typing.Tuple[typing.List[int], typing.List[int]]:
+        # only the feature meta-data is required, not the data itself
+        task = openml.tasks.get_task(task_id)
+        dataset = task.get_dataset()
+        return dataset.get_features_by_type('numeric', [task.target_name]), \
+            dataset.get_features_by_type('nominal', [task.target_name])
+
+    @staticmethod
+    def _get_server_flow(name: str, external_version: str) -> typing.Optional[openml.flows.OpenMLFlow]:
+        flow_id = openml.flows.flow_exists(name, external_version)
+        if flow_id is False:
+            return None
+        return openml.flows.get_flow(flow_id)
+
+    def _get_setup_id(self, classifier) -> typing.Optional[int]:
+        extension = openml.extensions.get_extension_by_model(classifier)
+        flow = extension.model_to_flow(classifier)
+        server_flow = self._memoize(self._server_flows, (flow.name, flow.external_version),
+                                    self._get_server_flow, flow.name, flow.external_version)
+        if server_flow is None:
+            logging.info('Can not find flow %s' % flow.name)
+            return None
+        openml.flows.flow._copy_server_fields(server_flow, flow)
+        try:
+            setup_id = openml.setups.setup_exists(flow)
+        except openml.exceptions.OpenMLServerException as e:
+            logging.warning('Can not resolve setup of flow %d: %s' % (server_flow.flow_id, str(e)))
+            return None
+        return setup_id if setup_id is not False else None
+
+    def _resolve(self, configuration_space_wrapper: ConfigSpaceWrapper, task_id: int,
+                 configuration: typing.Optional[typing.Dict[str, typing.Any]]) -> typing.Optional[int]:
+        numeric_indices, nominal_indices = self._memoize(self._task_layouts, task_id, self._get_task_layout, task_id)
+        configuration_space = configuration_space_wrapper.config_space
+        if configuration_space_wrapper.wrapped_in_pipeline:
+            classifier = sklearnbot.sklearn.as_pipeline(configuration_space, numeric_indices, nominal_indices)
+        else:
+            classifier = sklearnbot.sklearn.as_estimator(configuration_space, False)
+        if configuration is not None:
+            classifier.set_params(**configuration)
+        signature = sklearnbot.sklearn.get_estimator_signature(classifier, include_version=False)
+        setup_id = self._memoize(self._setup_ids, (configuration_space.name, signature),
+                                 self._get_setup_id, classifier)
+        logging.info('Task %d, classifier %s: setup id %s' % (task_id, configuration_space.name, setup_id))
+        return setup_id
+
+    def get_setup_ids(self, configuration_space_wrapper: ConfigSpaceWrapper, task_ids: typing.List[int],
+                      configuration: typing.Optional[typing.Dict[str, typing.Any]] = None) \
+            -> typing.Dict[int, typing.Optional[int]]:
+        """
+        Resolves the setup of a configuration on each of the tasks.
+
+        Parameters
+        ----------
+        configuration_space_wrapper: ConfigSpaceWrapper
+            The configuration space (optionally wrapped in the fixed
+            pipeline)
+
+        task_ids: list[int]
+            The OpenML task ids
+
+        configuration: dict or None
+            The configuration, as accepted by `set_params`. Leave to None to
+            resolve the default configuration
+
+        Returns
+        -------
+        setup_ids: dict[int, int or None]
+            The setup id per task id, or None if the flow or setup does not
+            exist on the server
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            futures = [executor.submit(self._resolve, configuration_space_wrapper, task_id, configuration)
+                       for task_id in task_ids]
+            return {task_id: future.result() for task_id, future in zip(task_ids, futures)}
+
+
+def list_setup_results(task_ids: typing.List[int], setup_ids: typing.List[int],
+                       evaluation_measure: typing.Optional[str] = None, n_threads: int = 8,
+                       chunk_size: int = 100) -> pd.DataFrame:
+    """
+    Lists the runs (or evaluations) of setups on tasks. The setups are
+    listed in chunks, concurrently, and the chunks are combined into a
+    single frame at once.
+
+    Parameters
+    ----------
+    task_ids: list[int]
+        The OpenML task ids
+
+    setup_ids: list[int]
+        The OpenML setup ids
+
+    evaluation_measure: str or None
+        If set, the evaluations of this measure are listed (e.g.,
+        predictive_accuracy). Otherwise, the runs are listed
+
+    n_threads: int
+        The number of concurrent listings
+
+    chunk_size: int
+        The number of setups per listing
+
+    Returns
+    -------
+    results: pd.DataFrame
+        The runs or evaluations
+    """
+    def list_chunk(setups: typing.List[int]) -> pd.DataFrame:
+        if evaluation_measure is None:
+            return openml.runs.list_runs(task=task_ids, setup=setups, output_format='dataframe')
+        return openml.evaluations.list_evaluations(evaluation_measure, tasks=task_ids, setups=setups,
+                                                   output_format='dataframe')
+
+    setup_ids = sorted(setup_ids)
+    chunks = [setup_ids[start:start + chunk_size] for start in range(0, len(setup_ids), chunk_size)]
+    if len(chunks) == 0:
+        return pd.DataFrame()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+        frames = list(executor.map(list_chunk, chunks))
+    return pd.concat(frames, ignore_index=True)
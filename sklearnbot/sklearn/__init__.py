@@ -1 +1,2 @@
-from .deserialize import as_estimator, as_pipeline, as_search_cv
+from .deserialize import as_estimator, as_pipeline, as_search_cv, as_successive_halving_cv, split_fixed_pipeline
+from .signature import get_estimator_signature
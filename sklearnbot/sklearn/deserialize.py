@@ -1,51 +1,200 @@
 import ConfigSpace
 import importlib
+import numpy as np
 import scipy.stats
 import sklearn
+import sklearn.base
 import sklearn.compose
+import sklearn.experimental.enable_halving_search_cv  # noqa: F401
 import sklearn.feature_selection
 import sklearn.impute
 import sklearn.model_selection
+import sklearn.pipeline
+import sklearn.preprocessing
+import sklearn.utils
+import sklearnbot.config_spaces.sampling
+import threading
 import typing
 
 
-def _config_space_to_parameter_distributions(
-        configuration_space: ConfigSpace.ConfigurationSpace) \
-        -> typing.Dict[str, typing.Union[typing.List,
-                                         scipy.stats.rv_discrete,
-                                         scipy.stats.rv_continuous]]:
+# the number of times more candidates are drawn if the drawn candidates
+# contain duplicates, see _sample_candidates
+MAX_CANDIDATE_ROUNDS = 10
+
+
+class _JointSampler(object):
+    """
+    Serves a fixed list of distinct configurations (see _sample_candidates)
+    to the per-hyperparameter distributions of a parameter sampler, in turn.
+    A parameter sampler requests every hyperparameter once per candidate (in
+    any order), so the next configuration is served as soon as a
+    hyperparameter is requested again, or a parameter sampler with a new
+    random state starts. Inactive hyperparameters take the value that they
+    have in the estimator (their default). The position in the list is kept
+    per thread.
+    """
+
+    def __init__(self, candidates: typing.List[typing.Dict[str, typing.Any]],
+                 defaults: typing.Dict[str, typing.Any]):
+        self.candidates = candidates
+        self.defaults = defaults
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def get(self, name: str, random_state) -> typing.Any:
+        local = self._local
+        if getattr(local, 'random_state', None) is not random_state:
+            # a new parameter sampler starts with the first candidate
+            local.random_state = random_state
+            local.index, local.requested = -1, None
+        if local.requested is None or name in local.requested:
+            local.index = (local.index + 1) % len(self.candidates)
+            local.requested = set()
+        local.requested.add(name)
+        candidate = self.candidates[local.index]
+        return candidate[name] if name in candidate else self.defaults[name]
+
+
+class _JointDistribution(scipy.stats.distributions.rv_frozen):
+    """
+    Numeric hyperparameter of a joint sampler. Serialized (e.g., in an
+    OpenML flow) as its marginal scipy distribution.
+    """
+
+    def __init__(self, sampler: _JointSampler, name: str, distribution: scipy.stats.distributions.rv_frozen):
+        super(_JointDistribution, self).__init__(distribution.dist, *distribution.args, **distribution.kwds)
+        self.sampler = sampler
+        self.name = name
+
+    def __deepcopy__(self, memo):
+        # shares the sampler with the other hyperparameters, also when cloned
+        return self
+
+    def rvs(self, size=None, random_state=None):
+        return self.sampler.get(self.name, random_state)
+
+
+class _JointChoices(list):
+    """
+    Categorical (or constant) hyperparameter of a joint sampler. Serialized
+    as the list of its choices.
+    """
+
+    def __init__(self, sampler: _JointSampler, name: str, choices: typing.List):
+        super(_JointChoices, self).__init__(choices)
+        self.sampler = sampler
+        self.name = name
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def rvs(self, size=None, random_state=None):
+        return self.sampler.get(self.name, random_state)
+
+
+def _sample_candidates(hyperparameters: typing.List, conditions: typing.List, n_candidates: int,
+                       random_state: int) -> typing.List[typing.Dict[str, typing.Any]]:
     """
-    Takes a ConfigSpace object and serializes it into a parameter grid, to be
-    used by the scikit-learn interface.
+    Draws up to n_candidates distinct configurations. Configurations that
+    only differ in inactive hyperparameters are equal, and drawn once. If the
+    drawn configurations contain duplicates, more are drawn (up to
+    MAX_CANDIDATE_ROUNDS times), so that fewer are only returned if the
+    configuration space (nearly) has fewer configurations.
+    """
+    random_state = sklearn.utils.check_random_state(random_state)
+    batch = sklearnbot.config_spaces.sampling.sample_configurations(hyperparameters, conditions, n_candidates,
+                                                                    random_state).deduplicate()
+    for _ in range(MAX_CANDIDATE_ROUNDS):
+        if len(batch) >= n_candidates:
+            break
+        extra = sklearnbot.config_spaces.sampling.sample_configurations(hyperparameters, conditions, n_candidates,
+                                                                        random_state)
+        batch = sklearnbot.config_spaces.sampling.ConfigurationBatch(
+            hyperparameters, np.concatenate([batch.values, extra.values]),
+            np.concatenate([batch.active, extra.active])).deduplicate()
+    return [batch.get_dictionary(index) for index in range(min(len(batch), n_candidates))]
+
+
+def _config_space_to_parameter_distributions(configuration_space: ConfigSpace.ConfigurationSpace,
+                                             defaults: typing.Dict[str, typing.Any], n_candidates: int,
+                                             random_state: int, exclude: typing.Optional[typing.List[str]] = None) \
+        -> typing.Tuple[typing.Dict[str, typing.Union[typing.List, scipy.stats.distributions.rv_frozen]], int]:
+    """
+    Takes a ConfigSpace object and serializes it into parameter
+    distributions, to be used by the scikit-learn interface (e.g.,
+    RandomizedSearchCV). The candidates are drawn up front from the
+    configuration space, so that they respect its conditions and
+    log-scales, and are distinct (see _sample_candidates). The
+    distributions serve these candidates in turn, so a parameter sampler
+    that draws as many candidates as there are yields each of them once.
 
     Parameters
     ----------
     configuration_space: ConfigSpace.ConfigurationSpace
         The configuration space describes all hyperparameters and ranges
 
+    defaults: dict
+        The parameters of the estimator (`get_params`), of which inactive
+        hyperparameters take their value
+
+    n_candidates: int
+        The (maximal) number of candidates
+
+    random_state: int
+        The random seed used to draw the candidates
+
+    exclude: list[str] or None
+        Hyperparameters that are not part of the distributions. These can not
+        be the parent of a condition
+
     Returns
     -------
     result: Dict
-        A dict mapping from hyperparameter name to List of Values or distribution
+        A dict mapping from hyperparameter name to a list of values or a
+        distribution (both with an `rvs` method)
+
+    n_candidates: int
+        The number of distinct candidates, to be drawn by the parameter
+        sampler
     """
+    exclude = exclude if exclude is not None else []
+    hyperparameters = [hp for hp in configuration_space.get_hyperparameters() if hp.name not in exclude]
+    conditions = []
+    for condition in configuration_space.get_conditions():
+        if len(sklearnbot.config_spaces.sampling.get_parent_names(condition) & set(exclude)) > 0:
+            raise ValueError('Can not exclude the parent of a condition: %s' % condition)
+        if sklearnbot.config_spaces.sampling.get_child_name(condition) not in exclude:
+            conditions.append(condition)
+    candidates = _sample_candidates(hyperparameters, conditions, n_candidates, random_state)
+    sampler = _JointSampler(candidates, defaults)
     result = dict()
-    for hyperparameter in configuration_space.get_hyperparameters():
-        if isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformFloatHyperparameter):
-            loc = hyperparameter.lower
-            scale = hyperparameter.upper - hyperparameter.lower
-            distribution = scipy.stats.uniform(loc=loc, scale=scale)
-        elif isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformIntegerHyperparameter):
-            distribution = scipy.stats.randint(hyperparameter.lower, hyperparameter.upper + 1)
-        elif isinstance(hyperparameter, ConfigSpace.hyperparameters.CategoricalHyperparameter):
-            distribution = list(hyperparameter.choices)
-        elif isinstance(hyperparameter, ConfigSpace.hyperparameters.UnParametrizedHyperparameter):
-            distribution = [hyperparameter.value]
-        elif isinstance(hyperparameter, ConfigSpace.hyperparameters.Constant):
-            distribution = [hyperparameter.value]
+    for hyperparameter in hyperparameters:
+        if isinstance(hyperparameter, (ConfigSpace.hyperparameters.UniformFloatHyperparameter,
+                                       ConfigSpace.hyperparameters.UniformIntegerHyperparameter)):
+            if hyperparameter.log:
+                marginal = scipy.stats.loguniform(hyperparameter.lower, hyperparameter.upper)
+            elif isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformFloatHyperparameter):
+                marginal = scipy.stats.uniform(loc=hyperparameter.lower,
+                                               scale=hyperparameter.upper - hyperparameter.lower)
+            else:
+                marginal = scipy.stats.randint(hyperparameter.lower, hyperparameter.upper + 1)
+            result[hyperparameter.name] = _JointDistribution(sampler, hyperparameter.name, marginal)
+        elif sklearnbot.config_spaces.sampling._is_categorical(hyperparameter):
+            result[hyperparameter.name] = _JointChoices(
+                sampler, hyperparameter.name, sklearnbot.config_spaces.sampling._get_choices(hyperparameter))
+        elif sklearnbot.config_spaces.sampling._is_constant(hyperparameter):
+            result[hyperparameter.name] = _JointChoices(sampler, hyperparameter.name, [hyperparameter.value])
         else:
             raise ValueError('Hyperparameter type not supported yet: %s' % type(hyperparameter))
-        result[hyperparameter.name] = distribution
-    return result
+    return result, len(candidates)
 
 
 def _seed_models(model):
@@ -131,15 +280,46 @@ def as_pipeline(configuration_space: ConfigSpace.ConfigurationSpace,
     return pipeline
 
 
+def split_fixed_pipeline(model: sklearn.base.BaseEstimator) \
+        -> typing.Optional[typing.Tuple[sklearn.pipeline.Pipeline, sklearn.base.BaseEstimator]]:
+    """
+    Splits a pipeline as created by as_pipeline into its preprocessing prefix
+    (imputer, column transformer and variance threshold) and the classifier.
+    The prefix does not depend on the configuration of the classifier, so its
+    output can be shared across configurations.
+
+    Parameters
+    ----------
+    model: sklearn.BaseEstimator
+        The (untrained) model
+
+    Returns
+    -------
+    split: tuple(sklearn.pipeline.Pipeline, sklearn.BaseEstimator) or None
+        The preprocessing prefix and the classifier, or None if the model is
+        not a fixed pipeline
+    """
+    if not isinstance(model, sklearn.pipeline.Pipeline) or len(model.steps) != 4:
+        return None
+    step_types = (sklearn.impute.SimpleImputer, sklearn.compose.ColumnTransformer,
+                  sklearn.feature_selection.VarianceThreshold)
+    for (_, step), step_type in zip(model.steps[:3], step_types):
+        if not isinstance(step, step_type):
+            return None
+    return sklearn.pipeline.Pipeline(model.steps[:3]), model.steps[3][1]
+
+
 def as_search_cv(configuration_space: ConfigSpace.ConfigurationSpace,
                  numeric_indices: typing.List[int],
-                 nominal_indices: typing.List[int], **kwargs)\
+                 nominal_indices: typing.List[int], n_iter: int = 10, random_state: int = 0, **kwargs)\
         -> sklearn.model_selection.RandomizedSearchCV:
     """
     Takes a ConfigSpace object and deserializes it back to an appropriate
-    scikit-learn Pipeline, wrapping it in a RandomizedSearchCV object.
-    Note that this interface is experimental, and does not contain support for
-    log-scale parameters.
+    scikit-learn Pipeline, wrapping it in a RandomizedSearchCV object. The
+    candidates are drawn up front from the configuration space (respecting
+    conditions and log-scales), and configurations that only differ in
+    inactive hyperparameters are fitted once, see
+    _config_space_to_parameter_distributions.
 
     Parameters
     ----------
@@ -153,17 +333,94 @@ def as_search_cv(configuration_space: ConfigSpace.ConfigurationSpace,
     nominal_indices: list[int]
         A numeric list indicating which attribute indices are nominal
 
+    n_iter: int
+        The number of candidates that are drawn from the configuration space.
+        Fewer are fitted if the configuration space has fewer distinct
+        configurations
+
+    random_state: int
+        The random seed used to draw the candidates
+
     Returns
     -------
     clf: sklearn.BaseEstimator
         The instantiated classifier with default hyperparameters
     """
     classifier = as_pipeline(configuration_space, numeric_indices, nominal_indices)
-    param_dist = _config_space_to_parameter_distributions(configuration_space)
+    param_dist, n_iter = _config_space_to_parameter_distributions(configuration_space, classifier.get_params(),
+                                                                  n_iter, random_state)
     search = sklearn.model_selection.RandomizedSearchCV(
         estimator=classifier,
         param_distributions=param_dist,
-        random_state=0,
+        n_iter=n_iter,
+        random_state=random_state,
+        **kwargs
+    )
+    return search
+
+
+def as_successive_halving_cv(configuration_space: ConfigSpace.ConfigurationSpace,
+                             numeric_indices: typing.List[int],
+                             nominal_indices: typing.List[int],
+                             resource: str = 'n_samples', n_candidates: int = 81, random_state: int = 0,
+                             **kwargs) \
+        -> sklearn.model_selection.HalvingRandomSearchCV:
+    """
+    Takes a ConfigSpace object and deserializes it back to an appropriate
+    scikit-learn Pipeline, wrapping it in a HalvingRandomSearchCV object.
+    Candidates are first evaluated on a small budget, and only the best
+    candidates are evaluated on larger budgets. The candidates are drawn as in
+    as_search_cv (respecting conditions and log-scales, and distinct).
+
+    Parameters
+    ----------
+    configuration_space: ConfigSpace.ConfigurationSpace
+        The configuration space that holds the information to instantiate the
+        classifier
+
+    numeric_indices: list[int]
+        A numeric list indicating which attribute indices are numeric
+
+    nominal_indices: list[int]
+        A numeric list indicating which attribute indices are nominal
+
+    resource: str
+        The budget of the candidates. Either `n_samples` (the number of
+        training observations) or the name of an integer hyperparameter,
+        e.g., `gradientboostingclassifier__n_estimators`. In the latter case,
+        the hyperparameter is removed from the search space, and its range
+        determines the minimal and maximal budget
+
+    n_candidates: int
+        The number of candidates that are drawn from the configuration space.
+        Fewer are evaluated if the configuration space has fewer distinct
+        configurations
+
+    random_state: int
+        The random seed used to draw the candidates and subsample the data
+
+    Returns
+    -------
+    clf: sklearn.BaseEstimator
+        The instantiated classifier with default hyperparameters
+    """
+    classifier = as_pipeline(configuration_space, numeric_indices, nominal_indices)
+    exclude = []
+    if resource != 'n_samples':
+        hyperparameter = configuration_space.get_hyperparameter(resource)
+        if not isinstance(hyperparameter, ConfigSpace.hyperparameters.UniformIntegerHyperparameter):
+            raise ValueError('Resource should be an integer hyperparameter: %s' % resource)
+        exclude.append(resource)
+        kwargs.setdefault('min_resources', hyperparameter.lower)
+        kwargs.setdefault('max_resources', hyperparameter.upper)
+    param_dist, n_candidates = _config_space_to_parameter_distributions(configuration_space, classifier.get_params(),
+                                                                        n_candidates, random_state, exclude)
+    search = sklearn.model_selection.HalvingRandomSearchCV(
+        estimator=classifier,
+        param_distributions=param_dist,
+        n_candidates=n_candidates,
+        resource=resource,
+        random_state=random_state,
         **kwargs
     )
     return search
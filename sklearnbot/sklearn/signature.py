@@ -0,0 +1,50 @@
+import hashlib
+import json
+import numpy as np
+import sklearn
+import sklearn.base
+import typing
+
+
+def _describe(value) -> typing.Any:
+    if isinstance(value, sklearn.base.BaseEstimator):
+        # the parameters of nested estimators are part of the deep parameters
+        return value.__class__.__module__ + '.' + value.__class__.__name__
+    if isinstance(value, (list, tuple)):
+        return [_describe(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _describe(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, type):
+        return str(value)
+    return value
+
+
+def get_estimator_signature(estimator: sklearn.base.BaseEstimator, include_version: bool = True) -> str:
+    """
+    Returns a hash that identifies an (untrained) estimator, based on its
+    class and all its (deep) hyperparameters. Estimators that are configured
+    identically have the same signature.
+
+    Parameters
+    ----------
+    estimator: sklearn.BaseEstimator
+        The estimator
+
+    include_version: bool
+        If set to true, the scikit-learn version is part of the signature
+
+    Returns
+    -------
+    signature: str
+        A hexadecimal hash
+    """
+    params = estimator.get_params(deep=True)
+    description = [[name, _describe(params[name])] for name in sorted(params)]
+    description.append(['class', _describe(estimator)])
+    if include_version:
+        description.append(['sklearn', sklearn.__version__])
+    return hashlib.sha1(json.dumps(description, sort_keys=True, default=str).encode('utf-8')).hexdigest()
@@ -0,0 +1,154 @@
+import collections
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import typing
+
+
+class PhaseTimings(object):
+    """
+    Collects the wall clock time spent in the phases of a single bot run
+    (e.g., obtaining the task, sampling, fitting, storing), and optionally
+    per fold. Phases that occur multiple times are summed.
+    """
+
+    def __init__(self):
+        self.phases = collections.OrderedDict()  # type: typing.Dict[str, float]
+        self.folds = []  # type: typing.List[typing.Dict[str, typing.Any]]
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_fold(self, repeat: int, fold: int, sample: int, **seconds):
+        self.folds.append(dict(repeat=repeat, fold=fold, sample=sample, **seconds))
+
+
+# the timings that phases are currently recorded to, per thread
+_state = threading.local()
+
+
+class _Phase(object):
+    __slots__ = ['timings', 'name', 'start']
+
+    def __init__(self, timings: PhaseTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+
+
+class _NullPhase(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name: str):
+    """
+    Context manager that measures a phase, if timings are being recorded in
+    the current thread (see recording). Otherwise, it does nothing, so that
+    instrumented code has next to no overhead.
+
+    Parameters
+    ----------
+    name: str
+        The name of the phase, e.g., `get_task`
+    """
+    timings = getattr(_state, 'timings', None)
+    if timings is None:
+        return _NULL_PHASE
+    return _Phase(timings, name)
+
+
+def get_active_timings() -> typing.Optional[PhaseTimings]:
+    """
+    Returns the timings that are being recorded in the current thread, if any
+    """
+    return getattr(_state, 'timings', None)
+
+
+@contextlib.contextmanager
+def recording(timings: typing.Optional[PhaseTimings]):
+    """
+    Records all phases that are executed by the current thread (within the
+    context) to the given timings. Does nothing if the timings are None.
+    """
+    if timings is None:
+        yield
+        return
+    previous = getattr(_state, 'timings', None)
+    _state.timings = timings
+    try:
+        yield
+    finally:
+        _state.timings = previous
+
+
+def emit(callback: typing.Optional[typing.Callable[[typing.Dict], None]],
+         timings: typing.Optional[PhaseTimings], **fields):
+    """
+    Passes the timings of a run as structured record (a JSON serializable
+    dict, with the given fields, the phases and the folds) to a callback,
+    and logs a summary.
+
+    Parameters
+    ----------
+    callback: callable or None
+        Function that is called with the record. Nothing happens if None
+
+    timings: PhaseTimings or None
+        The timings of the run. Nothing happens if None
+
+    fields:
+        Additional fields of the record, e.g., the task id
+    """
+    if callback is None or timings is None:
+        return
+    record = collections.OrderedDict([('time', time.time())])
+    record.update(fields)
+    record['phases'] = timings.phases
+    record['folds'] = timings.folds
+    logging.info('Timings (seconds): %s' % ', '.join('%s=%0.3f' % (name, seconds)
+                                                    for name, seconds in timings.phases.items()))
+    callback(record)
+
+
+class TimingFile(object):
+    """
+    Callback that appends timing records as JSON lines to a file. Writers
+    hold an exclusive lock while appending, so multiple processes can write
+    to the same file.
+
+    Parameters
+    ----------
+    path: str
+        The file to append the records to
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, record: typing.Dict):
+        with open(self.path, 'a') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                fp.write(json.dumps(record, default=str) + '\n')
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
@@ -0,0 +1,68 @@
+import numpy as np
+
+import sklearnbot.results.cod
+from sklearnbot.results.cod import CODAccumulator, RunPredictions, compute_cod_matrix, get_run_predictions
+
+
+def _create_predictions(rng, n_rows, n_repeats, labels, fraction=1.0):
+    repeat, row_id = np.meshgrid(np.arange(n_repeats), np.arange(n_rows), indexing='ij')
+    keep = rng.rand(repeat.size) < fraction
+    # the predictions of a run are not ordered by row id
+    order = rng.permutation(keep.sum())
+    return RunPredictions(repeat.ravel()[keep][order].astype(np.int32), row_id.ravel()[keep][order].astype(np.int64),
+                          rng.choice(labels, keep.sum()))
+
+
+def _naive_cod(first, second):
+    first = dict(zip(zip(first.repeat, first.row_id), first.prediction))
+    second = dict(zip(zip(second.repeat, second.row_id), second.prediction))
+    common = set(first) & set(second)
+    if len(common) == 0:
+        return np.nan
+    return np.mean([first[key] != second[key] for key in common])
+
+
+def test_cod_matrix_equals_pairwise_cod():
+    rng = np.random.RandomState(0)
+    predictions = [_create_predictions(rng, 50, 2, ['a', 'b', 'c'], fraction) for fraction in [1.0, 0.8, 0.5, 0.9]]
+    cod = compute_cod_matrix(predictions)
+    for i in range(len(predictions)):
+        assert cod[i, i] == 0.0
+        for j in range(len(predictions)):
+            np.testing.assert_allclose(cod[i, j], _naive_cod(predictions[i], predictions[j]))
+
+
+def test_cod_without_common_instances():
+    first = RunPredictions(np.array([0, 0]), np.array([0, 1]), np.array(['a', 'b']))
+    second = RunPredictions(np.array([0, 0]), np.array([2, 3]), np.array(['a', 'b']))
+    cod = compute_cod_matrix([first, second])
+    assert np.isnan(cod[0, 1])
+    assert np.isnan(cod[1, 0])
+
+
+def test_accumulator_averages_over_common_tasks():
+    accumulator = CODAccumulator()
+    accumulator.add([1, 2], np.array([[0.0, 0.2], [0.2, 0.0]]))
+    accumulator.add([2, 3], np.array([[0.0, np.nan], [np.nan, 0.0]]))
+    accumulator.add([3, 1, 2], np.array([[0.0, 0.5, 0.1], [0.5, 0.0, 0.4], [0.1, 0.4, 0.0]]))
+    assert accumulator.flow_ids == [1, 2, 3]
+    expected = np.array([[0.0, 0.3, 0.5], [0.3, 0.0, 0.1], [0.5, 0.1, 0.0]])
+    np.testing.assert_allclose(accumulator.mean(), expected)
+
+
+def test_cached_predictions_are_not_downloaded(tmp_path, monkeypatch):
+    downloaded = []
+
+    def download_predictions(session, run_id, cache_directory):
+        downloaded.append(run_id)
+        predictions = RunPredictions(np.array([0]), np.array([run_id]), np.array(['a']))
+        np.savez_compressed(str(tmp_path / ('%d.npz' % run_id)), **predictions._asdict())
+        return predictions
+
+    monkeypatch.setattr(sklearnbot.results.cod, '_download_predictions', download_predictions)
+    predictions = get_run_predictions([1, 2], str(tmp_path), n_threads=2)
+    assert sorted(downloaded) == [1, 2]
+    predictions = get_run_predictions([1, 2, 3], str(tmp_path), n_threads=2)
+    assert sorted(downloaded) == [1, 2, 3]
+    assert sorted(predictions) == [1, 2, 3]
+    assert list(predictions[2].row_id) == [2]
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import sklearnbot
+from sklearnbot.bot.cost_model import ConfigurationOverBudgetError, CostBudget, CostModel, create_cost_budget
+from sklearnbot.bot.resource_store import ResourceStore
+
+
+def _get_config_space(pipeline=False):
+    configuration_space_wrapper = sklearnbot.config_spaces.get_config_space('random_forest', 0)
+    if pipeline:
+        configuration_space_wrapper.wrap_in_fixed_pipeline()
+    return configuration_space_wrapper
+
+
+def _fill_store(store_directory, n_records=100):
+    # the cost grows with max_features and the number of instances
+    resource_store = ResourceStore(store_directory)
+    configuration_space_wrapper = _get_config_space()
+    configurations = configuration_space_wrapper.sample_configurations(n_records)
+    for idx, configuration in enumerate(configurations.get_dictionaries()):
+        n_instances = [100, 10000][idx % 2]
+        resource_store.add({'task_id': idx % 2, 'n_instances': n_instances, 'n_features': 10,
+                            'classifier': configuration_space_wrapper.config_space.name, 'parameters': configuration,
+                            'cpu_time': configuration['max_features'] * n_instances / 100})
+    return resource_store
+
+
+def test_cost_model_predicts_cost(tmp_path):
+    cost_model = CostModel.from_store(_fill_store(str(tmp_path)), _get_config_space())
+    assert cost_model.n_records == 100
+    qualities = {'NumberOfInstances': 10000, 'NumberOfFeatures': 10}
+    cheap, expensive = cost_model.predict([{'max_features': 0.1}, {'max_features': 0.9}], qualities)
+    assert cheap < expensive
+    assert cost_model.predict([{'max_features': 0.9}], {'NumberOfInstances': 100, 'NumberOfFeatures': 10})[0] < \
+        expensive
+    # hyperparameters are matched regardless of the fixed pipeline
+    pipeline_model = CostModel.from_store(_fill_store(str(tmp_path / 'pipeline')), _get_config_space(True))
+    assert pipeline_model.predict([{'randomforestclassifier__max_features': 0.9}], qualities)[0] == \
+        pytest.approx(expensive)
+
+
+def test_too_few_records(tmp_path):
+    resource_store = _fill_store(str(tmp_path), 10)
+    assert CostModel.from_store(resource_store, _get_config_space()) is None
+    cost_budget = create_cost_budget(resource_store, ['random_forest'], 0.001)
+    # configuration spaces without cost model are not restricted
+    assert cost_budget.sample_configuration(_get_config_space(), 1, {'NumberOfInstances': 10000}) is not None
+
+
+def test_budget_resamples(tmp_path):
+    cost_budget = create_cost_budget(_fill_store(str(tmp_path)), ['random_forest'], 25.0, max_resamples=100)
+    qualities = {'NumberOfInstances': 10000, 'NumberOfFeatures': 10}
+    configuration_space_wrapper = _get_config_space()
+    for _ in range(5):
+        configuration = cost_budget.sample_configuration(configuration_space_wrapper, 1, qualities)
+        assert configuration['max_features'] < 0.5
+
+
+def test_budget_skips_and_audits(tmp_path):
+    audit_file = str(tmp_path / 'audit' / 'rejected.jsonl')
+    cost_budget = create_cost_budget(_fill_store(str(tmp_path / 'store')), ['random_forest'], 0.001,
+                                     policy='skip', audit_file=audit_file)
+    with pytest.raises(ConfigurationOverBudgetError):
+        cost_budget.sample_configuration(_get_config_space(), 1, {'NumberOfInstances': 10000, 'NumberOfFeatures': 10})
+    with open(audit_file) as fp:
+        records = [json.loads(line) for line in fp]
+    assert len(records) == 1
+    assert records[0]['decision'] == 'skipped'
+    assert records[0]['task_id'] == 1
+    assert records[0]['predicted_cost'] > records[0]['budget']
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        CostBudget([], 1.0, policy='defer')
@@ -0,0 +1,91 @@
+import copy
+
+import openml
+import pytest
+import sklearn.ensemble
+import sklearn.tree
+
+import sklearnbot.bot.evaluation
+
+from sklearnbot.benchmark.synthetic import TaskSpec, make_synthetic_task
+from sklearnbot.bot.evaluation import get_fold_scores, run_model_on_cached_task
+from sklearnbot.bot.run_index import RunExistsLocallyError, RunIndex, get_run_key
+from sklearnbot.bot.task_cache import release_cached_task
+
+
+@pytest.fixture
+def task(tmp_path):
+    task = make_synthetic_task(TaskSpec(100, 5, 0.0, 2, 4), 1, str(tmp_path))
+    yield task
+    release_cached_task(1, str(tmp_path))
+
+
+def test_run_covers_all_folds(task):
+    run = run_model_on_cached_task(sklearn.tree.DecisionTreeClassifier(random_state=0), task,
+                                   avoid_duplicate_runs=False)
+    assert sorted(int(row[3]) for row in run.data_content) == list(range(100))
+    scores = get_fold_scores(run, 'predictive_accuracy')
+    assert len(scores) == 4
+    assert all(0.0 <= score <= 1.0 for score in scores)
+    assert len(run.fold_evaluations['usercpu_time_millis'][0]) == 4
+
+
+@pytest.mark.parametrize('model_n_jobs,n_jobs,backend', [(2, 1, 'loky'), (1, 2, 'threading')])
+def test_cpu_time_is_omitted_if_not_attributable(task, model_n_jobs, n_jobs, backend):
+    model = sklearn.ensemble.RandomForestClassifier(n_estimators=5, n_jobs=model_n_jobs, random_state=0)
+    run = run_model_on_cached_task(model, task, avoid_duplicate_runs=False, n_jobs=n_jobs, backend=backend)
+    assert 'usercpu_time_millis' not in run.fold_evaluations
+    assert 'usercpu_time_millis_training' not in run.fold_evaluations
+    assert len(run.fold_evaluations['wall_clock_time_millis'][0]) == 4
+
+
+def test_folds_in_parallel_are_equal(task):
+    model = sklearn.tree.DecisionTreeClassifier(random_state=0)
+    sequential = run_model_on_cached_task(model, task, avoid_duplicate_runs=False)
+    parallel = run_model_on_cached_task(model, task, avoid_duplicate_runs=False, n_jobs=2)
+    assert sequential.data_content == parallel.data_content
+
+
+def test_run_in_index_is_skipped(task, tmp_path):
+    model = sklearn.tree.DecisionTreeClassifier(random_state=0)
+    run_index = RunIndex(str(tmp_path / 'index'))
+    run = run_model_on_cached_task(model, task, avoid_duplicate_runs=False, run_index=run_index)
+    run_index.add(task.task_id, [get_run_key(run.flow, run.model)])
+    with pytest.raises(RunExistsLocallyError):
+        run_model_on_cached_task(model, task, avoid_duplicate_runs=False, run_index=run_index)
+
+
+def test_duplicate_runs_are_checked_with_server_flow(task, monkeypatch):
+    model = sklearn.ensemble.BaggingClassifier(sklearn.tree.DecisionTreeClassifier(), n_estimators=2, random_state=0)
+    # the flow as obtained from the server: with flow ids, without model
+    server_flow = copy.deepcopy(openml.extensions.get_extension_by_model(model).model_to_flow(model))
+    server_flow.model = None
+    server_flow.flow_id = 5
+    server_flow.components['estimator'].flow_id = 6
+    server_flow.components['estimator'].model = None
+    get_flow_calls = []
+    existing_runs = []
+
+    def get_flow(flow_id):
+        get_flow_calls.append(flow_id)
+        return server_flow
+
+    def setup_exists(flow):
+        assert flow.flow_id == 5 and flow.model is not None
+        return 3
+
+    monkeypatch.setattr(sklearnbot.bot.evaluation, '_server_flows', dict())
+    monkeypatch.setattr(openml.flows, 'flow_exists', lambda name, external_version: 5)
+    monkeypatch.setattr(openml.flows, 'get_flow', get_flow)
+    monkeypatch.setattr(openml.setups, 'setup_exists', setup_exists)
+    monkeypatch.setattr(openml.runs, 'run_exists', lambda task_id, setup_id: set(existing_runs))
+    run = run_model_on_cached_task(model, task)
+    assert run.flow_id == 5
+    assert {setting['oml:component'] for setting in run.parameter_settings} == {5, 6}
+    assert server_flow.model is None
+
+    existing_runs.append(9)
+    with pytest.raises(openml.exceptions.OpenMLRunsExistError):
+        run_model_on_cached_task(model, task)
+    # the flow is only obtained once
+    assert get_flow_calls == [5]
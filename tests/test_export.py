@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+import pytest
+
+import sklearnbot
+
+
+@pytest.mark.parametrize('file_format', sklearnbot.results.FILE_FORMATS)
+def test_column_without_values_in_first_chunk(tmp_path, file_format):
+    path = os.path.join(str(tmp_path), 'results.%s' % file_format)
+    with sklearnbot.results.ResultsWriter(path, {'flow_id': 1}, file_format) as writer:
+        writer.write(pd.DataFrame({'task_id': [1, 1], 'c': [None, None], 'predictive_accuracy': [0.5, 0.6]}))
+        writer.write(pd.DataFrame({'task_id': [2], 'c': [0.5], 'predictive_accuracy': [0.7]}))
+    table, json_meta = sklearnbot.results.read_results(path)
+    assert json_meta == {'flow_id': 1}
+    assert table.num_rows == 3
+    assert table.column('c').to_pylist() == [None, None, '0.5']
+
+
+@pytest.mark.parametrize('file_format', sklearnbot.results.FILE_FORMATS)
+def test_column_types_of_config_space(tmp_path, file_format):
+    configuration_space_wrapper = sklearnbot.config_spaces.get_config_space('svc', 0)
+    configuration_space_wrapper.wrap_in_fixed_pipeline()
+    column_types = sklearnbot.results.get_column_types(configuration_space_wrapper.assemble(),
+                                                       ['predictive_accuracy'])
+    assert column_types['svc__degree'] == 'float'
+    assert column_types['svc__kernel'] == 'string'
+
+    path = os.path.join(str(tmp_path), 'results.%s' % file_format)
+    with sklearnbot.results.ResultsWriter(path, {}, file_format, column_types=column_types) as writer:
+        writer.write(pd.DataFrame({'task_id': [1], 'svc__kernel': ['rbf'], 'svc__degree': [None],
+                                   'predictive_accuracy': [0.5]}))
+        writer.write(pd.DataFrame({'task_id': [2], 'svc__kernel': ['poly'], 'svc__degree': [3],
+                                   'predictive_accuracy': [0.7]}))
+    table, _ = sklearnbot.results.read_results(path)
+    assert table.column('svc__degree').to_pylist() == [None, 3.0]
+
+
+def test_incomplete_file_is_discarded(tmp_path):
+    path = os.path.join(str(tmp_path), 'results.feather')
+    with pytest.raises(RuntimeError):
+        with sklearnbot.results.ResultsWriter(path, {}) as writer:
+            writer.write(pd.DataFrame({'task_id': [1], 'predictive_accuracy': [0.5]}))
+            raise RuntimeError('interrupted')
+    assert os.listdir(str(tmp_path)) == []
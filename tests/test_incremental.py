@@ -0,0 +1,70 @@
+import glob
+import os
+
+import openml
+import pandas as pd
+import pytest
+
+from sklearnbot.results import IncrementalResults
+
+
+class _Server(object):
+    # lists the runs of setups on tasks, ordered by run id, as the OpenML server
+    def __init__(self):
+        self.runs = []
+        self.offsets = []
+
+    def add(self, task_id, setup_id):
+        self.runs.append({'run_id': len(self.runs) + 1, 'task_id': task_id, 'setup_id': setup_id, 'flow_id': 1})
+
+    def list_runs(self, offset, output_format, task, setup):
+        self.offsets.append(offset)
+        runs = [run for run in self.runs if run['task_id'] in task and run['setup_id'] in setup]
+        return pd.DataFrame(runs[offset:])
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = _Server()
+    monkeypatch.setattr(openml.runs, 'list_runs', server.list_runs)
+    return server
+
+
+def test_refresh_only_adds_new_runs(tmp_path, server):
+    for task_id, setup_id in [(1, 10), (1, 11), (2, 10), (1, 10)]:
+        server.add(task_id, setup_id)
+    results = IncrementalResults(str(tmp_path), overlap=1)
+    assert results.refresh([1, 2], setup_ids=[10, 11], n_threads=2) == 4
+    assert results.get_watermark(1, setup_id=10) == 4
+    assert results.get_watermark(3, setup_id=10) is None
+
+    server.add(1, 11)
+    server.add(2, 10)
+    server.offsets = []
+    # the state is persisted
+    results = IncrementalResults(str(tmp_path), overlap=1)
+    assert results.refresh([1, 2], setup_ids=[10, 11]) == 2
+    # the seen runs (minus the overlap) are skipped by the listing
+    assert sorted(server.offsets) == [0, 2]
+    assert results.refresh([1, 2], setup_ids=[10, 11]) == 0
+    assert sorted(results.read()['run_id']) == [1, 2, 3, 4, 5, 6]
+
+
+def test_compact(tmp_path, server):
+    results = IncrementalResults(str(tmp_path), file_format='parquet')
+    for _ in range(3):
+        server.add(1, 10)
+        results.refresh([1], setup_ids=[10])
+    assert len(glob.glob(os.path.join(str(tmp_path), 'part-*'))) == 3
+    results.compact()
+    assert len(glob.glob(os.path.join(str(tmp_path), 'part-*'))) == 1
+    assert sorted(results.read()['run_id']) == [1, 2, 3]
+
+
+def test_store_holds_single_kind_of_results(tmp_path, server):
+    server.add(1, 10)
+    IncrementalResults(str(tmp_path)).refresh([1], setup_ids=[10])
+    with pytest.raises(ValueError):
+        IncrementalResults(str(tmp_path), evaluation_measure='predictive_accuracy')
+    with pytest.raises(ValueError):
+        IncrementalResults(str(tmp_path)).refresh([1], setup_ids=[10], flow_ids=[1])
@@ -0,0 +1,77 @@
+import json
+import time
+
+import numpy as np
+import pytest
+import sklearn.tree
+
+from sklearnbot.bot.isolation import FAILURES_FILE, ResourceLimits, RunLimitExceededError, get_wall_clock_limit, \
+    record_failure, run_isolated
+
+
+# the functions are executed by a child process, so need to be importable
+def _add(a, b):
+    return a + b
+
+
+def _busy():
+    while True:
+        pass
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+
+
+def _allocate(megabytes):
+    return np.ones(megabytes * 1024 * 1024, dtype=np.uint8).sum()
+
+
+def _raise():
+    raise ValueError('in child')
+
+
+def test_result_is_returned():
+    assert run_isolated(_add, (1,), {'b': 2}, ResourceLimits(cpu_time=10)) == 3
+
+
+def test_exception_is_raised():
+    with pytest.raises(ValueError, match='in child'):
+        run_isolated(_raise, (), {}, ResourceLimits(cpu_time=10))
+
+
+@pytest.mark.parametrize('function,args,limits,reason', [
+    (_busy, (), ResourceLimits(cpu_time=1), 'cpu_time'),
+    (_sleep, (60,), ResourceLimits(wall_clock_time=1), 'wall_clock_time'),
+    (_allocate, (1024,), ResourceLimits(memory=512), 'memory'),
+])
+def test_limit_is_enforced(function, args, limits, reason):
+    start = time.time()
+    with pytest.raises(RunLimitExceededError) as e:
+        run_isolated(function, args, {}, limits)
+    assert e.value.reason == reason
+    assert time.time() - start < 30
+
+
+def test_cpu_time_limit_bounds_wall_clock_time():
+    assert get_wall_clock_limit(ResourceLimits(cpu_time=2)) == 6
+    assert get_wall_clock_limit(ResourceLimits(cpu_time=2, wall_clock_time=3)) == 3
+    assert get_wall_clock_limit(ResourceLimits(memory=100)) is None
+    # the child is blocked, rather than using its cpu time
+    with pytest.raises(RunLimitExceededError) as e:
+        run_isolated(_sleep, (60,), {}, ResourceLimits(cpu_time=1))
+    assert e.value.reason == 'wall_clock_time'
+    assert e.value.limits.wall_clock_time == 3
+
+
+def test_failure_is_recorded(tmp_path):
+    error = RunLimitExceededError('cpu_time', ResourceLimits(cpu_time=1), 1.5)
+    record_failure(str(tmp_path), 1, sklearn.tree.DecisionTreeClassifier(max_depth=3), error)
+    record_failure(str(tmp_path), 2, sklearn.tree.DecisionTreeClassifier(), error)
+    with open(str(tmp_path / FAILURES_FILE)) as fp:
+        records = [json.loads(line) for line in fp]
+    assert [record['task_id'] for record in records] == [1, 2]
+    assert records[0]['model'] == 'sklearn.tree._classes.DecisionTreeClassifier'
+    assert records[0]['parameters']['max_depth'] == 3
+    assert records[0]['reason'] == 'cpu_time'
+    assert records[0]['limits']['cpu_time'] == 1
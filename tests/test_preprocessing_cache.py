@@ -0,0 +1,51 @@
+import os
+import time
+
+import sklearn.impute
+import sklearn.pipeline
+
+from sklearnbot.bot.preprocessing_cache import PREPROCESSED_DIRECTORY, evict_preprocessed_folds, \
+    get_preprocessed_fold, get_preprocessing_signature
+from tests.utils import create_task
+
+
+def _preprocessing(strategy):
+    return sklearn.pipeline.Pipeline([('imputer', sklearn.impute.SimpleImputer(strategy=strategy))])
+
+
+def test_preprocessed_fold_is_reused(tmp_path):
+    task = create_task(directory=str(tmp_path))
+    first = get_preprocessed_fold(_preprocessing('mean'), task, 0, 1, 0)
+    second = get_preprocessed_fold(_preprocessing('mean'), task, 0, 1, 0)
+    train, test = task.get_train_test_split_indices(fold=1)
+    assert first.X_train.shape == (len(train), task.X.shape[1])
+    assert first.X_test.shape == (len(test), task.X.shape[1])
+    assert first.timing == second.timing
+
+
+def test_least_recently_used_preprocessing_is_evicted(tmp_path):
+    task = create_task(directory=str(tmp_path))
+    signatures = []
+    for strategy in ['mean', 'median', 'most_frequent']:
+        get_preprocessed_fold(_preprocessing(strategy), task, 0, 0, 0, max_size=None)
+        signatures.append(get_preprocessing_signature(_preprocessing(strategy)))
+        time.sleep(0.01)
+    # using the first pipeline again makes the second the least recently used one
+    get_preprocessed_fold(_preprocessing('mean'), task, 0, 0, 0, max_size=None)
+    preprocessed_directory = os.path.join(str(tmp_path), PREPROCESSED_DIRECTORY)
+    size = sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(os.path.join(preprocessed_directory, signatures[0])) for name in files)
+
+    assert evict_preprocessed_folds(str(tmp_path), 2.5 * size / (1024 * 1024)) == 1
+    assert sorted(os.listdir(preprocessed_directory)) == sorted([signatures[0], signatures[2]])
+    assert evict_preprocessed_folds(str(tmp_path), 0, keep=signatures[0]) == 1
+    assert os.listdir(preprocessed_directory) == [signatures[0]]
+
+
+def test_evicted_fold_is_materialized_again(tmp_path):
+    task = create_task(directory=str(tmp_path))
+    get_preprocessed_fold(_preprocessing('mean'), task, 0, 0, 0)
+    evict_preprocessed_folds(str(tmp_path), 0)
+    assert os.listdir(os.path.join(str(tmp_path), PREPROCESSED_DIRECTORY)) == []
+    preprocessed = get_preprocessed_fold(_preprocessing('mean'), task, 0, 0, 0)
+    assert preprocessed.X_train.shape[0] == len(task.get_train_test_split_indices(fold=0)[0])
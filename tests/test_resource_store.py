@@ -0,0 +1,65 @@
+import pytest
+import sklearn.ensemble
+import sklearn.tree
+
+from sklearnbot.benchmark.synthetic import TaskSpec, make_synthetic_task
+from sklearnbot.bot.evaluation import run_model_on_cached_task
+from sklearnbot.bot.resource_store import ResourceStore, create_resource_record
+from sklearnbot.bot.task_cache import release_cached_task
+
+
+@pytest.fixture
+def task(tmp_path):
+    task = make_synthetic_task(TaskSpec(50, 4, 0.0, 2, 2), 1, str(tmp_path / 'tasks'))
+    yield task
+    release_cached_task(1, str(tmp_path / 'tasks'))
+
+
+def _record(task_id, n_instances, cpu_time, classifier='sklearn.tree.DecisionTreeClassifier'):
+    return {'task_id': task_id, 'n_instances': n_instances, 'classifier': classifier, 'cpu_time': cpu_time,
+            'parameters': {}}
+
+
+@pytest.mark.parametrize('isolated', [False, True])
+def test_record_of_run(task, isolated):
+    model = sklearn.tree.DecisionTreeClassifier(max_depth=2)
+    run = run_model_on_cached_task(model, task, avoid_duplicate_runs=False)
+    record = create_resource_record(task, 'sklearn.tree.DecisionTreeClassifier', model, {'max_depth': 2}, run,
+                                    1.5, 100.0, isolated)
+    assert len(record['folds']) == 2
+    assert record['cpu_time'] == pytest.approx(sum(fold['fit_cpu_time'] + fold['predict_cpu_time']
+                                                   for fold in record['folds']))
+    assert record['wall_time'] == 1.5
+    assert record['parameters'] == {'max_depth': 2}
+    assert record['n_instances'] == 50
+    # the peak memory of a long-lived process does not belong to the run
+    assert record['peak_rss'] == (100.0 if isolated else None)
+
+
+def test_cpu_time_of_multi_threaded_run_is_not_recorded(task):
+    model = sklearn.ensemble.RandomForestClassifier(n_estimators=5, n_jobs=2)
+    run = run_model_on_cached_task(model, task, avoid_duplicate_runs=False)
+    record = create_resource_record(task, 'sklearn.ensemble.RandomForestClassifier', model, {}, run, 1.0, None,
+                                    False)
+    assert record['cpu_time'] is None
+    assert all(fold['fit_cpu_time'] is None for fold in record['folds'])
+    assert record['fit_time'] > 0
+
+
+def test_query(tmp_path):
+    resource_store = ResourceStore(str(tmp_path))
+    for task_id, n_instances, cpu_time in [(1, 100, 1.0), (2, 1000, 2.0), (3, 10000, None)]:
+        resource_store.add(_record(task_id, n_instances, cpu_time))
+    resource_store.add(_record(1, 100, 10.0, 'sklearn.svm.SVC'))
+    # a partially written record
+    with open(str(tmp_path / 'sklearn.tree.DecisionTreeClassifier.jsonl'), 'a') as fp:
+        fp.write('{"task_id": 4')
+
+    assert len(resource_store.query()) == 4
+    # by the short name of the configuration space
+    assert list(resource_store.query('decision_tree')['task_id']) == [1, 2, 3]
+    assert list(resource_store.query('decision_tree', min_instances=1000)['task_id']) == [2, 3]
+    assert list(resource_store.query(task_ids=[1])['classifier']) == ['sklearn.svm.SVC',
+                                                                       'sklearn.tree.DecisionTreeClassifier']
+    assert resource_store.get_percentile('cpu_time', 100, classifier='decision_tree') == 2.0
+    assert resource_store.get_percentile('cpu_time', 50, classifier='decision_tree', min_instances=10000) is None
@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pytest
+import sklearn.tree
+
+import sklearnbot
+from sklearnbot.benchmark.synthetic import TaskSpec, make_synthetic_task
+from sklearnbot.bot.evaluation import run_model_on_cached_task
+from sklearnbot.bot.results_db import ResultsDatabase, get_configuration
+from sklearnbot.bot.task_cache import release_cached_task
+
+
+@pytest.fixture
+def task(tmp_path):
+    task = make_synthetic_task(TaskSpec(50, 4, 0.0, 2, 2), 1, str(tmp_path / 'tasks'))
+    yield task
+    release_cached_task(1, str(tmp_path / 'tasks'))
+
+
+def _add_run(results_db, task, max_depth):
+    model = sklearn.tree.DecisionTreeClassifier(max_depth=max_depth, random_state=0)
+    run = run_model_on_cached_task(model, task, avoid_duplicate_runs=False)
+    return results_db.add(task.task_id, 'sklearn.tree.DecisionTreeClassifier', {'max_depth': max_depth}, run=run,
+                          local_run='run%d' % max_depth, wall_time=1.0)
+
+
+def test_runs_are_recorded(task, tmp_path):
+    results_db = ResultsDatabase(str(tmp_path / 'results.db'))
+    record_id = _add_run(results_db, task, 1)
+    start = time.time()
+    _add_run(results_db, task, 2)
+    results_db.add(2, 'sklearn.tree.DecisionTreeClassifier', None, success=False,
+                   failure_reason='ValueError: failed')
+    results_db.add(1, 'sklearn.svm.SVC', {'C': 1.0}, success=False, failure_reason='ValueError: failed')
+
+    records = results_db.query('decision_tree')
+    assert list(records['success']) == [True, True, False]
+    assert records['configuration'][0] == {'max_depth': 1}
+    assert records['cpu_time'][0] > 0
+    assert list(results_db.query(success=False)['failure_reason']) == ['ValueError: failed'] * 2
+    assert list(results_db.query(task_ids=[1], success=True)['local_run']) == ['run1', 'run2']
+    assert len(results_db.query(since=start)) == 3
+    folds = results_db.get_folds([record_id])
+    assert list(folds['fold']) == [0, 1]
+    assert records['predictive_accuracy'][0] == pytest.approx(folds['predictive_accuracy'].mean())
+    results_db.close()
+
+
+def test_to_frame(task, tmp_path):
+    results_db = ResultsDatabase(str(tmp_path / 'results.db'))
+    for max_depth in [1, 2]:
+        _add_run(results_db, task, max_depth)
+    results_db.add(1, 'sklearn.tree.DecisionTreeClassifier', {'max_depth': 3}, success=False)
+    results = results_db.to_frame('decision_tree')
+    assert list(results.columns) == ['task_id', 'max_depth', 'predictive_accuracy']
+    assert list(results['max_depth']) == [1, 2]
+    results = results_db.to_frame('decision_tree', per_fold=True)
+    assert list(results.columns) == ['task_id', 'max_depth', 'repeat_nr', 'fold_nr', 'predictive_accuracy']
+    assert len(results) == 4
+    results_db.close()
+
+
+def test_database_is_shared(tmp_path):
+    writer = ResultsDatabase(str(tmp_path / 'results.db'))
+    reader = ResultsDatabase(str(tmp_path / 'results.db'))
+    writer.add(1, 'sklearn.svm.SVC', {'C': np.float64(1.0)})
+    assert reader.query()['configuration'][0] == {'C': 1.0}
+    writer.close()
+    reader.close()
+
+
+def test_configuration_without_inactive_hyperparameters():
+    configuration_space_wrapper = sklearnbot.config_spaces.get_config_space('svc', 0)
+    configuration_space_wrapper.wrap_in_fixed_pipeline()
+    model = sklearnbot.sklearn.as_pipeline(configuration_space_wrapper.config_space, [0, 1], [])
+    model.set_params(svc__kernel='rbf', svc__C=np.float64(2.0))
+    configuration = get_configuration(configuration_space_wrapper, model)
+    assert configuration['svc__C'] == 2.0
+    assert type(configuration['svc__C']) is float
+    assert configuration['svc__kernel'] == 'rbf'
+    # only active for the poly kernel
+    assert 'svc__degree' not in configuration
+
+
+def test_unexpected_failure_of_optimizer_is_recorded(task, tmp_path, monkeypatch):
+    def as_search_cv(*args, **kwargs):
+        raise RuntimeError('search failed')
+
+    monkeypatch.setattr(sklearnbot.sklearn, 'as_search_cv', as_search_cv)
+    results_db = ResultsDatabase(str(tmp_path / 'results.db'))
+    with pytest.raises(RuntimeError):
+        sklearnbot.bot.run_optimizer_on_task(task.task_id, sklearnbot.config_spaces.get_config_space('svc', 0),
+                                             str(tmp_path / 'output'), False, str(tmp_path / 'tasks'),
+                                             results_db=results_db)
+    records = results_db.query()
+    assert list(records['success']) == [False]
+    assert list(records['optimizer']) == ['random_search']
+    assert list(records['failure_reason']) == ['RuntimeError: search failed']
+    results_db.close()
@@ -0,0 +1,76 @@
+import openml
+import pandas as pd
+import sklearn.tree
+from openml.setups.setup import OpenMLParameter
+
+from sklearnbot.bot.run_index import RunIndex, get_run_key
+
+
+def _get_flow(model, flow_id=None):
+    flow = openml.extensions.get_extension_by_model(model).model_to_flow(model)
+    flow.flow_id = flow_id
+    return flow
+
+
+def _get_run_key(**parameters):
+    model = sklearn.tree.DecisionTreeClassifier(**parameters)
+    return get_run_key(_get_flow(model), model)
+
+
+def test_run_key_of_configuration():
+    assert _get_run_key(max_depth=3) == _get_run_key(max_depth=3)
+    assert _get_run_key(max_depth=3) != _get_run_key(max_depth=4)
+    # equal to the default value
+    assert _get_run_key(max_depth=None) == _get_run_key()
+
+
+def test_index_is_shared(tmp_path):
+    writer = RunIndex(str(tmp_path))
+    reader = RunIndex(str(tmp_path))
+    assert not reader.contains(1, 'a')
+    writer.add(1, ['a'])
+    assert reader.contains(1, 'a')
+    writer.add(1, ['b'])
+    assert reader.contains(1, 'b')
+    assert not reader.contains(2, 'a')
+
+
+def test_incomplete_line_is_not_consumed(tmp_path):
+    run_index = RunIndex(str(tmp_path))
+    run_index.add(1, ['a'])
+    with open(str(tmp_path / '1.idx'), 'a') as fp:
+        fp.write('bc')
+    assert not run_index.contains(1, 'bc')
+    with open(str(tmp_path / '1.idx'), 'a') as fp:
+        fp.write('d\n')
+    assert run_index.contains(1, 'bcd')
+    assert run_index.contains(1, 'a')
+
+
+def test_import_published_runs(tmp_path, monkeypatch):
+    model = sklearn.tree.DecisionTreeClassifier()
+    flow = _get_flow(model, 10)
+
+    def setup(setup_id, value, name='max_depth'):
+        parameter = OpenMLParameter(setup_id, 10, flow.name, name, name, 'int', 'null', value)
+        return openml.setups.OpenMLSetup(setup_id, 10, {setup_id: parameter})
+
+    # setup 3 has a hyperparameter that does not exist (anymore), so it can not be instantiated
+    setups = {1: setup(1, '3'), 2: setup(2, '4'), 3: setup(3, '1', 'removed')}
+    listed = []
+
+    def list_setups(flow, setup, output_format):
+        listed.append(setup)
+        return {setup_id: setups[setup_id] for setup_id in setup}
+
+    monkeypatch.setattr(openml.runs, 'list_runs', lambda **kwargs: pd.DataFrame({'setup_id': [1, 2, 2, 3]}))
+    monkeypatch.setattr(openml.flows, 'get_flow', lambda flow_id: flow)
+    monkeypatch.setattr(openml.setups, 'list_setups', list_setups)
+
+    run_index = RunIndex(str(tmp_path))
+    assert run_index.import_published_runs(1, 10, batch_size=2) == 2
+    assert listed == [[1, 2], [3]]
+    model.set_params(max_depth=4)
+    assert run_index.contains(1, get_run_key(flow, model))
+    # only new setups are added
+    assert run_index.import_published_runs(1, 10) == 0
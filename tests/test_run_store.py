@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import openml
+import pytest
+import sklearn.tree
+
+from sklearnbot.benchmark.synthetic import TaskSpec, make_synthetic_task
+from sklearnbot.bot.evaluation import run_model_on_cached_task
+from sklearnbot.bot.run_store import RunStore
+from sklearnbot.bot.task_cache import release_cached_task
+
+
+@pytest.fixture
+def task(tmp_path):
+    task = make_synthetic_task(TaskSpec(50, 4, 0.0, 3, 2), 1, str(tmp_path / 'tasks'))
+    yield task
+    release_cached_task(1, str(tmp_path / 'tasks'))
+
+
+def _run(task, max_depth=None):
+    return run_model_on_cached_task(sklearn.tree.DecisionTreeClassifier(max_depth=max_depth, random_state=0), task,
+                                    avoid_duplicate_runs=False)
+
+
+def _get_segment_files(store_directory, task_id):
+    return [name for name in os.listdir(os.path.join(store_directory, str(task_id))) if name.endswith('.npz')]
+
+
+def test_exported_run_equals_run(task, tmp_path):
+    run = _run(task)
+    run_store = RunStore(str(tmp_path / 'store'))
+    run_key = run_store.add(run, task.class_labels, tag='test')
+    assert run_store.export(run_key, str(tmp_path / 'run')) == 'test'
+    exported = openml.runs.OpenMLRun.from_filesystem(str(tmp_path / 'run'), expect_model=False)
+    assert exported.task_id == run.task_id
+    assert exported.flow_name == run.flow_name
+    assert len(exported.data_content) == len(run.data_content)
+    for expected, actual in zip(run.data_content, exported.data_content):
+        assert actual[:6] == expected[:6]
+        np.testing.assert_allclose(actual[6:], expected[6:])
+    assert exported.fold_evaluations['predictive_accuracy'] == run.fold_evaluations['predictive_accuracy']
+
+
+def test_runs_are_buffered_and_compacted(task, tmp_path):
+    store_directory = str(tmp_path / 'store')
+    run_store = RunStore(store_directory, segment_size=2, compaction_threshold=None)
+    run_keys = [run_store.add(_run(task, max_depth), task.class_labels) for max_depth in [1, 2, 3]]
+    assert len(_get_segment_files(store_directory, 1)) == 1
+    assert list(run_store.list_runs()['run_key']) == run_keys[:2]
+    run_store.close()
+    assert len(_get_segment_files(store_directory, 1)) == 2
+    run_store.compact()
+    assert len(_get_segment_files(store_directory, 1)) == 1
+    runs = run_store.list_runs([1])
+    assert list(runs['run_key']) == run_keys
+    assert all(0.0 <= accuracy <= 1.0 for accuracy in runs['predictive_accuracy'])
+    run_store.export(run_keys[2], str(tmp_path / 'run'))
+    with pytest.raises(KeyError):
+        run_store.export('1/unknown', str(tmp_path / 'unknown'))
+
+
+def test_segments_are_compacted_at_threshold(task, tmp_path):
+    store_directory = str(tmp_path / 'store')
+    run_store = RunStore(store_directory, segment_size=1, compaction_threshold=3)
+    for max_depth in [1, 2, 3, 4]:
+        run_store.add(_run(task, max_depth), task.class_labels)
+    assert len(_get_segment_files(store_directory, 1)) == 2
+    assert len(run_store.list_runs()) == 4
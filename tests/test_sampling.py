@@ -0,0 +1,50 @@
+import ConfigSpace
+import numpy as np
+import pytest
+
+import sklearnbot
+from sklearnbot.config_spaces.sampling import ConfigurationBatch, get_active_configuration
+
+
+def _get_config_space():
+    return sklearnbot.config_spaces.get_config_space('svc', 0)
+
+
+def test_sampled_configurations_are_valid():
+    configuration_space_wrapper = _get_config_space()
+    configuration_space = configuration_space_wrapper.assemble()
+    batch = configuration_space_wrapper.sample_configurations(200)
+    assert len(batch) == 200
+    kernels = set()
+    for configuration in batch.get_dictionaries():
+        # raises if inactive hyperparameters are set, or active ones are missing
+        ConfigSpace.Configuration(configuration_space, values=configuration).check_valid_configuration()
+        kernels.add(configuration['kernel'])
+        assert ('degree' in configuration) == (configuration['kernel'] == 'poly')
+    assert len(kernels) > 1
+
+
+def test_active_configuration_equals_sampled_configuration():
+    configuration_space_wrapper = _get_config_space()
+    model = sklearnbot.sklearn.as_estimator(configuration_space_wrapper.config_space, False)
+    for configuration in configuration_space_wrapper.sample_configurations(50).get_dictionaries():
+        model.set_params(**configuration)
+        assert get_active_configuration(configuration_space_wrapper.hyperparameters,
+                                        configuration_space_wrapper.conditions,
+                                        model.get_params(deep=True)) == configuration
+
+
+def test_deduplicate_save_and_load(tmp_path):
+    configuration_space_wrapper = _get_config_space()
+    batch = configuration_space_wrapper.sample_configurations(10)
+    duplicated = batch[np.array([0, 1, 0, 2, 1])]
+    assert duplicated.hashes()[0] == duplicated.hashes()[2]
+    deduplicated = duplicated.deduplicate()
+    assert list(deduplicated.get_dictionaries()) == list(batch[np.array([0, 1, 2])].get_dictionaries())
+
+    path = str(tmp_path / 'batch.npz')
+    batch.save(path)
+    loaded = ConfigurationBatch.load(path, configuration_space_wrapper.hyperparameters)
+    assert loaded.hashes() == batch.hashes()
+    with pytest.raises(ValueError):
+        ConfigurationBatch.load(path, configuration_space_wrapper.hyperparameters[1:])
@@ -0,0 +1,87 @@
+import pickle
+
+import ConfigSpace
+import numpy as np
+import openml
+import sklearn.base
+import sklearn.model_selection
+
+import sklearnbot
+
+
+def _get_config_space(classifier_name):
+    configuration_space_wrapper = sklearnbot.config_spaces.get_config_space(classifier_name, 0)
+    configuration_space_wrapper.wrap_in_fixed_pipeline()
+    return configuration_space_wrapper.assemble()
+
+
+def _sample(search, n_iter=20):
+    return list(sklearn.model_selection.ParameterSampler(search.param_distributions, n_iter, random_state=1))
+
+
+def test_search_cv_respects_conditions():
+    search = sklearnbot.sklearn.as_search_cv(_get_config_space('svc'), [0, 1, 2], [], n_iter=50)
+    assert isinstance(search, sklearn.model_selection.RandomizedSearchCV)
+    degrees = set()
+    for parameters in _sample(search):
+        if parameters['svc__kernel'] != 'poly':
+            # inactive, so the default of the estimator
+            assert parameters['svc__degree'] == search.estimator.get_params()['svc__degree']
+        else:
+            degrees.add(parameters['svc__degree'])
+        assert 2 ** -5 <= parameters['svc__C'] <= 2 ** 15
+    assert len(degrees) > 1
+
+
+def test_search_cv_deduplicates_candidates():
+    # rbf kernels only differ in the (inactive) degree, so there are three
+    # distinct configurations
+    configuration_space = ConfigSpace.ConfigurationSpace(name='sklearn.svm.SVC')
+    kernel = ConfigSpace.CategoricalHyperparameter('svc__kernel', ['rbf', 'poly'])
+    degree = ConfigSpace.UniformIntegerHyperparameter('svc__degree', 2, 3)
+    configuration_space.add([kernel, degree, ConfigSpace.EqualsCondition(degree, kernel, 'poly')])
+    search = sklearnbot.sklearn.as_search_cv(configuration_space, [0, 1, 2], [], n_iter=10)
+    assert search.n_iter == 3
+    candidates = _sample(search, search.n_iter)
+    assert sorted((parameters['svc__kernel'], parameters['svc__degree']) for parameters in candidates) == \
+        [('poly', 2), ('poly', 3), ('rbf', search.estimator.get_params()['svc__degree'])]
+
+
+def test_search_cv_does_not_depend_on_draw_order():
+    search = sklearnbot.sklearn.as_search_cv(_get_config_space('svc'), [0, 1, 2], [])
+    # a parameter sampler that draws the hyperparameters in reverse order
+    candidates = []
+    rng = np.random.RandomState(1)
+    for _ in range(search.n_iter):
+        candidates.append({name: search.param_distributions[name].rvs(random_state=rng)
+                           for name in sorted(search.param_distributions, reverse=True)})
+    assert candidates == _sample(search, search.n_iter)
+
+
+def test_search_cv_samples_jointly_after_cloning():
+    search = sklearnbot.sklearn.as_search_cv(_get_config_space('svc'), [0, 1, 2], [])
+    copies = [sklearn.base.clone(search), pickle.loads(pickle.dumps(search))]
+    for copy in copies:
+        assert _sample(copy) == _sample(search)
+
+
+def test_search_cv_is_serialized_as_flow():
+    search = sklearnbot.sklearn.as_search_cv(_get_config_space('random_forest'), [0, 1, 2], [], n_iter=3, cv=2)
+    flow = openml.extensions.get_extension_by_model(search).model_to_flow(search)
+    assert flow.name.startswith('sklearn.model_selection._search.RandomizedSearchCV(')
+    assert 'rv_frozen' in flow.parameters['param_distributions']
+
+    rng = np.random.RandomState(0)
+    X = rng.rand(40, 3)
+    search.fit(X, (X[:, 0] > 0.5).astype(int))
+    assert len(search.cv_results_['params']) == 3
+
+
+def test_successive_halving_cv_excludes_resource():
+    search = sklearnbot.sklearn.as_successive_halving_cv(_get_config_space('knn'), [0, 1, 2], [],
+                                                         resource='kneighborsclassifier__n_neighbors',
+                                                         n_candidates=4, cv=2)
+    assert isinstance(search, sklearn.model_selection.HalvingRandomSearchCV)
+    assert 'kneighborsclassifier__n_neighbors' not in search.param_distributions
+    assert search.min_resources > 0
+    assert _sample(search) == _sample(sklearn.base.clone(search))
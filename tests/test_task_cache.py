@@ -0,0 +1,116 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse
+
+import sklearnbot
+from sklearnbot.benchmark.synthetic import TaskSpec, make_synthetic_task
+from sklearnbot.bot.run_store import RunStore
+from sklearnbot.bot.task_cache import TaskCache, _to_array, get_cached_task, load_matrix, release_cached_task, save_matrix
+from tests.utils import create_task
+
+
+def _store_task(cache_directory, task_id=1, X=None):
+    task = create_task(task_id=task_id)
+    n_folds = task.split_dimensions[1]
+    splits = [task.get_train_test_split_indices(fold) for fold in range(n_folds)]
+    meta = {'task_id': task_id, 'dataset_id': task.dataset_id, 'name': task.name, 'target_name': task.target_name,
+            'class_labels': task.class_labels, 'nominal_indices': task.nominal_indices,
+            'numeric_indices': task.numeric_indices, 'qualities': task.qualities,
+            'split_dimensions': list(task.split_dimensions)}
+    TaskCache(cache_directory).store(meta, task.X if X is None else X, task.y, [train for train, _ in splits],
+                                     [test for _, test in splits])
+    return task
+
+
+def test_stored_task_is_memory_mapped(tmp_path):
+    task = _store_task(str(tmp_path))
+    cached_task = TaskCache(str(tmp_path)).get(1)
+    assert isinstance(cached_task.X, np.memmap)
+    assert isinstance(cached_task.y, np.memmap)
+    np.testing.assert_array_equal(cached_task.X, task.X)
+    for fold in range(3):
+        for expected, actual in zip(task.get_train_test_split_indices(fold),
+                                    cached_task.get_train_test_split_indices(fold)):
+            np.testing.assert_array_equal(expected, actual)
+    assert cached_task.class_labels == task.class_labels
+    assert cached_task.directory == str(tmp_path / '1')
+
+
+def test_split_out_of_range():
+    with pytest.raises(ValueError):
+        create_task(n_folds=3).get_train_test_split_indices(fold=3)
+
+
+def test_sparse_matrix(tmp_path):
+    X = scipy.sparse.random(10, 5, density=0.3, format='csc', random_state=0)
+    save_matrix(str(tmp_path), 'X', X)
+    loaded = load_matrix(str(tmp_path), 'X')
+    assert scipy.sparse.isspmatrix_csr(loaded)
+    np.testing.assert_array_equal(loaded.toarray(), X.toarray())
+
+
+def test_pickled_cached_task_is_reopened(tmp_path):
+    X = np.random.RandomState(0).rand(60, 2000)
+    _store_task(str(tmp_path), X=X)
+    try:
+        cached_task = get_cached_task(1, str(tmp_path))
+        cached_task._task = 'task'
+        pickled = pickle.dumps(cached_task)
+        # only the reference to the task cache is pickled, not the data
+        assert len(pickled) < X.nbytes / 100
+        release_cached_task(1, str(tmp_path))
+        unpickled = pickle.loads(pickled)
+        assert unpickled is not cached_task
+        assert unpickled._task == 'task'
+        np.testing.assert_array_equal(unpickled.X, X)
+    finally:
+        release_cached_task(1, str(tmp_path))
+
+
+def test_pickled_task_in_memory_is_copied():
+    task = create_task()
+    unpickled = pickle.loads(pickle.dumps(task))
+    np.testing.assert_array_equal(unpickled.X, task.X)
+    np.testing.assert_array_equal(unpickled.get_train_test_split_indices(1)[1], task.get_train_test_split_indices(1)[1])
+
+
+def test_bot_runs_on_synthetic_task(tmp_path):
+    cache_directory = str(tmp_path / 'tasks')
+    task = make_synthetic_task(TaskSpec(60, 4, 0.5, 2, 3), 1, cache_directory)
+    try:
+        assert get_cached_task(1, cache_directory) is task
+        configuration_space_wrappers = [sklearnbot.config_spaces.get_config_space('decision_tree', seed)
+                                        for seed in range(2)]
+        for configuration_space_wrapper in configuration_space_wrappers:
+            configuration_space_wrapper.wrap_in_fixed_pipeline()
+        with RunStore(str(tmp_path / 'runs')) as run_store:
+            # the task does not exist on a server
+            results = sklearnbot.bot.run_bot_on_task_batch(1, configuration_space_wrappers, False,
+                                                           str(tmp_path / 'output'), False,
+                                                           task_cache_directory=cache_directory, run_store=run_store,
+                                                           avoid_duplicate_runs=False)
+        assert [success for success, _, _ in results] == [True, True]
+        assert len(run_store.list_runs([1])) == 2
+    finally:
+        release_cached_task(1, cache_directory)
+
+
+def test_dataframe_is_converted_to_array():
+    X = pd.DataFrame({'numeric': [1.5, np.nan, 3.0],
+                      'nominal': pd.Categorical(['b', None, 'a'], categories=['a', 'b']),
+                      'binary': [True, False, True]})
+    y = pd.Series(pd.Categorical(['yes', 'no', 'yes'], categories=['no', 'yes']))
+    X_array, y_array = _to_array(X, y, ['yes', 'no'])
+    np.testing.assert_array_equal(X_array, [[1.5, 1.0, 1.0], [np.nan, np.nan, 0.0], [3.0, 0.0, 1.0]])
+    # ordered as the class labels of the task
+    np.testing.assert_array_equal(y_array, [0, 1, 0])
+    with pytest.raises(ValueError):
+        _to_array(X, y, ['yes'])
+
+    X = scipy.sparse.random(4, 3, density=0.5, format='csr', random_state=0)
+    X_array, _ = _to_array(pd.DataFrame.sparse.from_spmatrix(X), y.iloc[[0, 1, 2, 0]], ['no', 'yes'])
+    assert scipy.sparse.isspmatrix_csr(X_array)
+    np.testing.assert_array_equal(X_array.toarray(), X.toarray())
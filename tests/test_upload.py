@@ -0,0 +1,200 @@
+import collections
+import http.server
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import openml
+import pytest
+
+import sklearnbot.bot.upload
+from sklearnbot.bot.upload import UploadQueue
+
+
+def _create_run_dirs(output_dir, n_runs):
+    run_dirs = []
+    for idx in range(n_runs):
+        run_dir = os.path.join(str(output_dir), '1', 'run%d' % idx)
+        os.makedirs(run_dir)
+        for name in ['description.xml', 'predictions.arff']:
+            open(os.path.join(run_dir, name), 'w').close()
+        run_dirs.append(run_dir)
+    return run_dirs
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # a local stand-in of the OpenML server, which fails as often as requested
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        call = self.path[len('/api/v1/xml/'):]
+        server.requests.append((call, self.client_address, body))
+        if len(server.failures) > 0:
+            status, code = server.failures.pop(0)
+            self._respond(status, '<oml:error xmlns:oml="http://openml.org/openml"><oml:code>%d</oml:code>'
+                                  '<oml:message>Failure</oml:message></oml:error>' % code)
+        elif call == 'run/':
+            self._respond(200, '<oml:upload_run xmlns:oml="http://openml.org/openml"><oml:run_id>7</oml:run_id>'
+                               '</oml:upload_run>')
+        else:
+            server.tags.append(urllib.parse.parse_qs(body.decode()))
+            self._respond(200, '<oml:run_tag xmlns:oml="http://openml.org/openml"><oml:id>7</oml:id></oml:run_tag>')
+
+    def _respond(self, status, text):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(text)))
+        self.end_headers()
+        self.wfile.write(text.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.requests, server.failures, server.tags = [], [], []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(openml.config, 'server', 'http://127.0.0.1:%d/api/v1/xml' % server.server_address[1])
+    monkeypatch.setattr(openml.config, 'apikey', 'key')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _patch_publish(monkeypatch):
+    # records the published runs, rather than publishing them to a server
+    published = collections.Counter()
+    lock = threading.Lock()
+
+    def publish_entry(entry, entry_file, session):
+        time.sleep(0.01)
+        with lock:
+            published[entry['local_run_dir']] += 1
+        entry['run_id'] = len(published)
+        shutil.rmtree(entry['local_run_dir'])
+
+    monkeypatch.setattr(sklearnbot.bot.upload, '_publish_entry', publish_entry)
+    return published
+
+
+def test_two_queues_publish_every_run_once(tmp_path, monkeypatch):
+    published = _patch_publish(monkeypatch)
+    run_dirs = _create_run_dirs(tmp_path, 50)
+    queue = UploadQueue(str(tmp_path), n_threads=0)
+    for run_dir in run_dirs:
+        assert queue.submit(run_dir)
+    queue.close(wait=False)
+
+    # both queues resume all (pending) entries of the directory
+    first = UploadQueue(str(tmp_path), n_threads=4)
+    second = UploadQueue(str(tmp_path), n_threads=4)
+    first.close()
+    second.close()
+    assert published == collections.Counter({run_dir: 1 for run_dir in run_dirs})
+    assert first.n_uploaded + second.n_uploaded == len(run_dirs)
+    assert sorted(os.listdir(first.queue_directory)) == sorted([UploadQueue.FAILED_DIRECTORY, UploadQueue.LOCK_FILE])
+
+
+def test_submit_skips_queued_run(tmp_path, monkeypatch):
+    _patch_publish(monkeypatch)
+    run_dir, = _create_run_dirs(tmp_path, 1)
+    queue = UploadQueue(str(tmp_path), n_threads=0)
+    assert queue.submit(run_dir)
+    assert not queue.submit(run_dir)
+    assert queue.get_queued_run_dirs() == {run_dir}
+    queue.close(wait=False)
+
+
+def test_stale_claim_is_released(tmp_path, monkeypatch):
+    published = _patch_publish(monkeypatch)
+    run_dir, = _create_run_dirs(tmp_path, 1)
+    queue = UploadQueue(str(tmp_path), n_threads=0)
+    queue.submit(run_dir)
+    queue.close(wait=False)
+    entry_file, = [name for name in os.listdir(queue.queue_directory) if name.endswith('.json')]
+    entry_file = os.path.join(queue.queue_directory, entry_file)
+
+    # claimed by a process that no longer exists
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    claim_file = entry_file + UploadQueue.CLAIM_INFIX + '%s.%d' % (socket.gethostname(), process.pid)
+    os.rename(entry_file, claim_file)
+    with UploadQueue(str(tmp_path), n_threads=1):
+        pass
+    assert published == collections.Counter({run_dir: 1})
+    assert not os.path.exists(claim_file)
+
+
+def test_live_claim_is_kept(tmp_path, monkeypatch):
+    published = _patch_publish(monkeypatch)
+    run_dir, = _create_run_dirs(tmp_path, 1)
+    queue = UploadQueue(str(tmp_path), n_threads=0)
+    queue.submit(run_dir)
+    entry_file = queue._queue.get()
+    claim_file = queue._claim(entry_file)
+    with UploadQueue(str(tmp_path), n_threads=1) as other:
+        assert not other.submit(run_dir)
+    assert len(published) == 0
+    assert os.path.exists(claim_file)
+
+
+def test_concurrent_bulk_publish(tmp_path, monkeypatch):
+    published = _patch_publish(monkeypatch)
+    run_dirs = _create_run_dirs(tmp_path, 30)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        sklearnbot.bot.upload.publish_stored_runs(str(tmp_path), n_threads=2, min_age=0, report_interval=1.0)))
+        for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert published == collections.Counter({run_dir: 1 for run_dir in run_dirs})
+    assert sum(n_uploaded for n_uploaded, _ in results) == len(run_dirs)
+    assert sklearnbot.bot.upload.find_stored_runs(str(tmp_path), min_age=0) == []
+
+
+def test_transient_failure_is_retried(tmp_path, server):
+    run_dir, = _create_run_dirs(tmp_path, 1)
+    # a server-side error, and a failing database connection
+    server.failures = [(500, 0), (412, sklearnbot.bot.upload.DATABASE_CONNECTION_ERROR)]
+    start = time.time()
+    with UploadQueue(str(tmp_path), n_threads=1, backoff_factor=0.1) as queue:
+        queue.submit(run_dir, tag='study_1')
+    # waited 0.1 and 0.2 seconds
+    assert time.time() - start >= 0.3
+    assert queue.n_uploaded == 1
+    assert [call for call, _, _ in server.requests] == ['run/', 'run/', 'run/', 'run/tag']
+    assert b'name="description"' in server.requests[0][2]
+    assert server.tags == [{'run_id': ['7'], 'tag': ['study_1'], 'api_key': ['key']}]
+    # all requests of a thread share a connection
+    assert len(set(client_address for _, client_address, _ in server.requests)) == 1
+    assert not os.path.exists(run_dir)
+    assert os.listdir(queue.failed_directory) == []
+
+
+def test_rejected_run_is_not_retried(tmp_path, server):
+    run_dir, = _create_run_dirs(tmp_path, 1)
+    server.failures = [(412, 205)]
+    with UploadQueue(str(tmp_path), n_threads=1, backoff_factor=0.1) as queue:
+        queue.submit(run_dir)
+    assert queue.n_failed == 1
+    assert len(server.requests) == 1
+    failed_file, = os.listdir(queue.failed_directory)
+    with open(os.path.join(queue.failed_directory, failed_file)) as fp:
+        assert json.load(fp)['failure_reason'].startswith('OpenMLServerException')
+    # not picked up by the next queue
+    with UploadQueue(str(tmp_path), n_threads=1) as queue:
+        assert queue.pending() == 0
+    assert len(server.requests) == 1
+    assert os.path.exists(run_dir)
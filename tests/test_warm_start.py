@@ -0,0 +1,44 @@
+import pandas as pd
+
+import sklearnbot
+from sklearnbot.bot.run import prepare_classifier
+from tests.utils import create_task
+
+
+def _get_results(prefix=''):
+    # two tasks, of which task 2 is most similar to the task of create_task
+    rows = []
+    for task_id, n_instances, C in [(2, 60, 2.0), (3, 100000, 8.0)]:
+        for accuracy, gamma in [(0.9, 0.5), (0.7, 0.25)]:
+            rows.append({'task_id': task_id, prefix + 'C': C, prefix + 'kernel': 'rbf', prefix + 'gamma': gamma,
+                         prefix + 'shrinking': True, prefix + 'tol': 0.001, prefix + 'degree': 3,
+                         prefix + 'coef0': 0.0, 'predictive_accuracy': accuracy,
+                         'NumberOfInstances': n_instances, 'NumberOfFeatures': 5, 'NumberOfClasses': 2,
+                         'NumberOfSymbolicFeatures': 1})
+    return pd.DataFrame(rows)
+
+
+def _get_config_space(pipeline):
+    configuration_space_wrapper = sklearnbot.config_spaces.get_config_space('svc', 0)
+    if pipeline:
+        configuration_space_wrapper.wrap_in_fixed_pipeline()
+    return configuration_space_wrapper
+
+
+def test_warm_start_on_pipeline():
+    warm_start = sklearnbot.bot.WarmStartSampler(_get_config_space(True), _get_results(), n_neighbours=1)
+    classifier = prepare_classifier(_get_config_space(True), create_task(task_id=1), False, warm_start=warm_start)
+    assert classifier.get_params()['svc__C'] == 2.0
+    assert classifier.get_params()['svc__gamma'] == 0.5
+
+
+def test_warm_start_is_named_after_config_space():
+    # a sampler of the vanilla estimator, on results of the pipeline
+    warm_start = sklearnbot.bot.WarmStartSampler(_get_config_space(False), _get_results('svc__'), n_neighbours=2)
+    qualities = create_task(task_id=1).qualities
+    configuration = warm_start.propose(_get_config_space(True), 1, qualities)
+    assert configuration['svc__C'] == 2.0
+    assert all(name.startswith('svc__') for name in configuration)
+    configuration = warm_start.propose(_get_config_space(False), 1, qualities)
+    assert configuration['C'] == 8.0
+    assert all(not name.startswith('svc__') for name in configuration)
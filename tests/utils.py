@@ -0,0 +1,24 @@
+import numpy as np
+
+from sklearnbot.bot.task_cache import CachedTask
+
+
+def create_task(task_id=1, n_instances=60, n_features=4, n_classes=2, n_folds=3, directory=None, random_state=0):
+    """
+    Creates a (numeric) task in memory, with a single repeat of n_folds
+    folds, so that the bot can run on it without an OpenML server
+    """
+    rng = np.random.RandomState(random_state)
+    X = rng.rand(n_instances, n_features)
+    y = (X[:, 0] * n_classes).astype(int)
+    folds = np.arange(n_instances) % n_folds
+    train_splits = [np.where(folds != fold)[0] for fold in range(n_folds)]
+    test_splits = [np.where(folds == fold)[0] for fold in range(n_folds)]
+    qualities = {'NumberOfInstances': float(n_instances), 'NumberOfFeatures': float(n_features + 1),
+                 'NumberOfClasses': float(n_classes), 'NumberOfSymbolicFeatures': 1.0}
+    task = CachedTask(task_id, task_id, 'task%d' % task_id, 'class', ['c%d' % idx for idx in range(n_classes)],
+                      [], list(range(n_features)), qualities, X, y, (1, n_folds, 1),
+                      np.concatenate(train_splits), np.cumsum([0] + [len(split) for split in train_splits]),
+                      np.concatenate(test_splits), np.cumsum([0] + [len(split) for split in test_splits]))
+    task.directory = directory
+    return task